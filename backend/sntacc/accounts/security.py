@@ -121,6 +121,7 @@ class SecurityService:
         Логирование попытки входа
         """
         try:
+            # Синхронно: следующий запрос сразу учитывает попытку в is_ip_blocked
             LoginAttempt.objects.create(
                 user=user,
                 ip_address=ip_address,
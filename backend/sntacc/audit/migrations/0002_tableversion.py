@@ -0,0 +1,89 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:25
+
+import time
+
+from django.db import migrations, models
+
+# Таблицы, ответы по которым кешируются клиентами по ETag (sntacc.conditional).
+# Новая таблица добавляется отдельной миграцией с таким же триггером.
+TRACKED_TABLES = {
+    'plots.plot': 'plots_plot',
+    'plots.plotowner': 'plots_plotowner',
+    'owners.owner': 'owners_owner',
+    'payments.payment': 'payments_payment',
+    'payments.plotbalance': 'payments_plotbalance',
+}
+
+POSTGRESQL_FUNCTION_SQL = (
+    'CREATE OR REPLACE FUNCTION audit_bump_table_version() RETURNS trigger AS $$ '
+    'BEGIN '
+    'UPDATE audit_tableversion SET version = version + 1, updated_at = now() WHERE label = TG_ARGV[0]; '
+    'RETURN NULL; '
+    'END $$ LANGUAGE plpgsql'
+)
+
+
+def create_triggers(apps, schema_editor):
+    TableVersion = apps.get_model('audit', 'TableVersion')
+    start = int(time.time() * 1_000_000)
+    TableVersion.objects.bulk_create(
+        [TableVersion(label=label, version=start) for label in TRACKED_TABLES],
+        ignore_conflicts=True
+    )
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_FUNCTION_SQL)
+        for label, table in TRACKED_TABLES.items():
+            # Один раз на оператор, а не на строку: пакетная вставка - одно обновление счетчика
+            schema_editor.execute(
+                f'CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+                f"FOR EACH STATEMENT EXECUTE FUNCTION audit_bump_table_version('{label}')"
+            )
+    elif vendor == 'sqlite':
+        # SQLite поддерживает только триггеры на строку
+        for label, table in TRACKED_TABLES.items():
+            for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+                schema_editor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN '
+                    f'UPDATE audit_tableversion SET version = version + 1, updated_at = CURRENT_TIMESTAMP '
+                    f"WHERE label = '{label}'; END"
+                )
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for table in TRACKED_TABLES.values():
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_version ON {table}')
+        schema_editor.execute('DROP FUNCTION IF EXISTS audit_bump_table_version()')
+    elif vendor == 'sqlite':
+        for table in TRACKED_TABLES.values():
+            for suffix in ('ai', 'au', 'ad'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_version_{suffix}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0001_initial'),
+        ('owners', '0001_initial'),
+        ('plots', '0003_plotsearchdocument'),
+        ('payments', '0006_remove_payment_status_paid_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия таблицы',
+                'verbose_name_plural': 'Версии таблиц',
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -1,3 +1,4 @@
+import time
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -91,4 +92,41 @@ class AuditLog(models.Model):
     
     @property
     def action_display(self):
-        return self.get_action_display()
\ No newline at end of file
+        return self.get_action_display()
+
+# Модели с триггером счетчика изменений (миграции audit)
+VERSIONED_MODELS = (
+    'plots.plot', 'plots.plotowner', 'owners.owner', 'payments.payment', 'payments.plotbalance',
+)
+
+
+class TableVersion(models.Model):
+    """
+    Счетчик изменений таблицы для условных GET (sntacc.conditional).
+
+    Увеличивается триггером базы в той же транзакции, что и изменение, -
+    в том числе при bulk_create/bulk_update, update() и удалении queryset,
+    которые сигналов не вызывают. Триггеры создаются миграцией для
+    SQLite и PostgreSQL.
+    """
+    label = models.CharField(max_length=100, primary_key=True, verbose_name="Модель")
+    version = models.BigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Версия таблицы"
+        verbose_name_plural = "Версии таблиц"
+
+    def __str__(self):
+        return f"{self.label}: {self.version}"
+
+    @classmethod
+    def create_missing(cls, using='default'):
+        """Строки счетчиков VERSIONED_MODELS, если их нет (после migrate и flush)"""
+        # Начальная версия - время в микросекундах: номера пересозданных
+        # счетчиков не совпадут с версиями в уже выданных ETag
+        start = int(time.time() * 1_000_000)
+        cls.objects.using(using).bulk_create(
+            [cls(label=label, version=start) for label in VERSIONED_MODELS],
+            ignore_conflicts=True
+        )
@@ -6,6 +6,9 @@ class AuditLogSerializer(serializers.ModelSerializer):
     user_display = serializers.SerializerMethodField()
     action_display = serializers.SerializerMethodField()
     timestamp_display = serializers.SerializerMethodField()
+    # IPAddressField DRF 3.14 несовместим с валидаторами Django 5.x,
+    # журнал только читается - достаточно строки
+    ip_address = serializers.CharField(read_only=True, allow_null=True)
     
     class Meta:
         model = AuditLog
@@ -1,6 +1,7 @@
 import json
 from django.utils import timezone
 from django.http import HttpRequest
+from sntacc.writer import write_queue
 from .models import AuditLog
 
 class AuditService:
@@ -16,7 +17,10 @@ class AuditService:
         additional_data=None
     ):
         """
-        Логирование действия пользователя
+        Логирование действия пользователя.
+
+        Возвращает сохраненную запись AuditLog или None, если запись
+        отложена в очередь (sntacc/writer.py) либо не удалась.
         """
         try:
             # Получаем IP адрес и User Agent из запроса
@@ -27,8 +31,8 @@ class AuditService:
                 ip_address = AuditService.get_client_ip(request)
                 user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]  # Ограничиваем длину
             
-            # Создаем запись аудита
-            audit_log = AuditLog.objects.create(
+            # Создаем запись аудита (через очередь записи, см. sntacc/writer.py)
+            audit_log = write_queue.put(AuditLog(
                 user=user,
                 action=action,
                 model_name=model_name,
@@ -38,7 +42,7 @@ class AuditService:
                 ip_address=ip_address,
                 user_agent=user_agent,
                 additional_data=additional_data
-            )
+            ))
             
             return audit_log
             
@@ -170,21 +174,21 @@ class AuditService:
         """
         Получение логов конкретного пользователя
         """
-        return AuditLog.objects.filter(user=user).order_by('-timestamp')[:limit]
+        return AuditLog.objects.filter(user=user).select_related('user').order_by('-timestamp')[:limit]
     
     @staticmethod
     def get_recent_logs(limit=100):
         """
         Получение последних логов
         """
-        return AuditLog.objects.all().order_by('-timestamp')[:limit]
+        return AuditLog.objects.select_related('user').order_by('-timestamp')[:limit]
     
     @staticmethod
     def get_logs_by_action(action, limit=100):
         """
         Получение логов по типу действия
         """
-        return AuditLog.objects.filter(action=action).order_by('-timestamp')[:limit]
+        return AuditLog.objects.filter(action=action).select_related('user').order_by('-timestamp')[:limit]
     
     @staticmethod
     def get_logs_by_date_range(start_date, end_date):
@@ -193,4 +197,4 @@ class AuditService:
         """
         return AuditLog.objects.filter(
             timestamp__range=[start_date, end_date]
-        ).order_by('-timestamp')
\ No newline at end of file
+        ).select_related('user').order_by('-timestamp')
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .models import TableVersion
+
+
+@receiver(post_migrate)
+def create_table_versions(sender, app_config=None, apps=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """flush очищает таблицу счетчиков - строки создаются заново"""
+    if app_config is None or app_config.label != 'audit':
+        return
+    if apps is not None:
+        try:
+            # После отката миграций таблицы может не быть
+            apps.get_model('audit', 'TableVersion')
+        except LookupError:
+            return
+    TableVersion.create_missing(using)
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from backup.services import BackupService
+
+class Command(BaseCommand):
+    help = 'Восстановление данных из резервной копии'
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup_id', type=int, help='ID резервной копии')
+        parser.add_argument(
+            '--app',
+            action='append',
+            dest='apps',
+            help='Восстановить только указанное приложение (можно повторять)'
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Восстановить только указанную модель, например payments.payment'
+        )
+        parser.add_argument(
+            '--plot',
+            type=int,
+            dest='plot_id',
+            help='Восстановить только документы участка'
+        )
+        parser.add_argument(
+            '--no-media',
+            action='store_true',
+            help='Не восстанавливать медиа файлы'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Удалить записи, отсутствующие в резервной копии'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BackupService.RESTORE_BATCH_SIZE,
+            help='Количество объектов в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = BackupService.restore_backup(
+                options['backup_id'],
+                apps=options['apps'],
+                models=options['models'],
+                plot_id=options['plot_id'],
+                restore_media=not options['no_media'],
+                prune=options['prune'],
+                batch_size=options['batch_size']
+            )
+            for label, count in result['objects'].items():
+                self.stdout.write(f'{label}: {count}')
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Восстановление завершено, медиа файлов: {result["media_files"]}'
+                )
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(str(e))
+            )
@@ -1,14 +1,35 @@
+import io
 import os
 import shutil
+import tempfile
 import zipfile
 import json
 from datetime import datetime
+from django.apps import apps as apps_registry
 from django.conf import settings
-from django.core import management
+from django.core import management, serializers
 from django.core.management.base import CommandError
+from django.db import connection, transaction
+from documents.services import DocumentStorageService
+from plots.search import PlotSearchService
+from payments.services import LedgerService
 from .models import Backup
 
 class BackupService:
+    DATABASE_ENTRY = 'database.sql'
+    MEDIA_PREFIX = 'media/'
+    # Служебные каталоги внутри MEDIA_ROOT на время подмены медиафайлов
+    MEDIA_RESTORE_DIR = '.restore'
+    MEDIA_PREVIOUS_DIR = '.previous'
+    MEDIA_SERVICE_DIRS = (MEDIA_RESTORE_DIR, MEDIA_PREVIOUS_DIR)
+    RESTORE_BATCH_SIZE = 500
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    # Служебные таблицы, которые Django пересоздает сам при migrate, и счетчики
+    # изменений: откат версии назад дал бы клиентам устаревшие ответы 304
+    RESTORE_EXCLUDED_MODELS = {
+        'contenttypes.contenttype', 'auth.permission', 'sessions.session', 'audit.tableversion'
+    }
+    
     @staticmethod
     def create_backup(backup_name, backup_type='full', user=None):
         """Создание резервной копии"""
@@ -22,7 +43,7 @@ class BackupService:
             )
             
             # Создаем директорию для бэкапов если не существует
-            backup_dir = os.path.join(settings.BASE_DIR, 'backups')
+            backup_dir = settings.BACKUP_ROOT
             os.makedirs(backup_dir, exist_ok=True)
             
             # Генерируем имя файла
@@ -41,16 +62,19 @@ class BackupService:
                 # Создаем ZIP архив
                 with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                     # Добавляем дамп базы данных
-                    zipf.write(db_dump_path, 'database.sql')
+                    zipf.write(db_dump_path, BackupService.DATABASE_ENTRY)
                     
                     # Добавляем медиа файлы (если есть)
                     media_dir = settings.MEDIA_ROOT
                     if os.path.exists(media_dir):
                         for root, dirs, files in os.walk(media_dir):
+                            if root == media_dir:
+                                # Остатки прерванного восстановления в копию не попадают
+                                dirs[:] = [d for d in dirs if d not in BackupService.MEDIA_SERVICE_DIRS]
                             for file in files:
                                 file_path = os.path.join(root, file)
                                 arc_path = os.path.relpath(file_path, settings.MEDIA_ROOT)
-                                zipf.write(file_path, f'media/{arc_path}')
+                                zipf.write(file_path, f'{BackupService.MEDIA_PREFIX}{arc_path}')
                 
                 # Обновляем информацию о бэкапе
                 backup.file_path = backup_path
@@ -82,8 +106,19 @@ class BackupService:
             raise Exception(f"Ошибка создания резервной копии: {str(e)}")
     
     @staticmethod
-    def restore_backup(backup_id):
-        """Восстановление из резервной копии"""
+    def restore_backup(backup_id, apps=None, models=None, plot_id=None,
+                       restore_media=True, prune=False, batch_size=None):
+        """
+        Восстановление из резервной копии
+
+        Архив не распаковывается целиком: дамп базы читается потоком прямо из ZIP,
+        объекты загружаются пакетами в отдельных транзакциях поверх текущих данных
+        (без flush), медиафайлы подменяются атомарно. apps/models ограничивают
+        восстановление выбранными приложениями ('plots') или моделями
+        ('payments.payment'), plot_id - документами одного участка (вместе
+        с их blob, категориями и тегами).
+        prune=True удаляет записи восстанавливаемых моделей, которых нет в копии.
+        """
         try:
             backup = Backup.objects.get(id=backup_id)
             if backup.status != 'completed':
@@ -92,39 +127,361 @@ class BackupService:
             if not os.path.exists(backup.file_path):
                 raise Exception("Файл резервной копии не найден")
             
-            # Распаковываем архив
-            extract_dir = os.path.join(settings.BASE_DIR, 'temp_restore')
-            os.makedirs(extract_dir, exist_ok=True)
+            selected = BackupService._select_models(apps, models, plot_id)
             
-            with zipfile.ZipFile(backup.file_path, 'r') as zipf:
-                zipf.extractall(extract_dir)
+            result = {'objects': {}, 'media_files': 0}
+            media_files = None
             
-            # Восстанавливаем базу данных
-            db_dump_path = os.path.join(extract_dir, 'database.sql')
-            if os.path.exists(db_dump_path):
-                # Очищаем текущую базу данных
-                management.call_command('flush', interactive=False)
+            with zipfile.ZipFile(backup.file_path, 'r') as zipf:
+                names = set(zipf.namelist())
                 
-                # Загружаем данные
-                with open(db_dump_path, 'r') as f:
-                    management.call_command('loaddata', db_dump_path)
-            
-            # Восстанавливаем медиа файлы
-            media_backup_dir = os.path.join(extract_dir, 'media')
-            if os.path.exists(media_backup_dir):
-                media_dir = settings.MEDIA_ROOT
-                if os.path.exists(media_dir):
-                    shutil.rmtree(media_dir)
-                shutil.copytree(media_backup_dir, media_dir)
+                # Восстанавливаем базу данных
+                if BackupService.DATABASE_ENTRY in names:
+                    result['objects'], media_files = BackupService._restore_database(
+                        zipf, selected, plot_id,
+                        prune=prune and plot_id is None,
+                        batch_size=batch_size or BackupService.RESTORE_BATCH_SIZE
+                    )
+                    # Сигналы при загрузке (raw) не срабатывают - обновляем поиск явно
+                    if {'plots.plot', 'plots.plotowner', 'owners.owner'} & set(result['objects']):
+                        PlotSearchService.refresh()
+                    if {'payments.payment', 'payments.paymenttransaction'} & set(result['objects']):
+                        LedgerService.refresh_balances()
+                
+                # Восстанавливаем медиа файлы (только если затронуты документы)
+                document_model = apps_registry.get_model('documents', 'Document')
+                if restore_media and (selected is None or document_model in selected):
+                    result['media_files'] = BackupService._restore_media(
+                        zipf, only=media_files if plot_id is not None else None
+                    )
+                
+                # Дамп несет ref_count на момент копии - сверяем с восстановленными документами
+                if {'documents.document', 'documents.documentblob'} & set(result['objects']):
+                    DocumentStorageService.recount_references(document_model._meta.get_field('file').storage)
             
-            # Удаляем временные файлы
-            shutil.rmtree(extract_dir)
-            
-            return True
+            return result
             
         except Exception as e:
             raise Exception(f"Ошибка восстановления из резервной копии: {str(e)}")
     
+    @staticmethod
+    def _select_models(apps=None, models=None, plot_id=None):
+        """Набор моделей для выборочного восстановления (None - все модели)"""
+        if plot_id is not None:
+            return {
+                apps_registry.get_model('documents', 'Document'),
+                apps_registry.get_model('documents', 'DocumentBlob'),
+                apps_registry.get_model('documents', 'DocumentCategory'),
+                apps_registry.get_model('documents', 'DocumentTag'),
+            }
+        
+        if not apps and not models:
+            return None
+        
+        selected = set()
+        for app_label in apps or []:
+            selected.update(apps_registry.get_app_config(app_label).get_models())
+        for label in models or []:
+            selected.add(apps_registry.get_model(label))
+        return selected
+    
+    @staticmethod
+    def _iter_fixture(stream):
+        """Потоковый разбор JSON-массива dumpdata без загрузки всего дампа в память"""
+        decoder = json.JSONDecoder()
+        reader = io.TextIOWrapper(stream, encoding='utf-8')
+        buffer = ''
+        
+        while True:
+            chunk = reader.read(BackupService.STREAM_CHUNK_SIZE)
+            buffer += chunk
+            pos = 0
+            
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,[':
+                    pos += 1
+                if pos >= len(buffer) or buffer[pos] == ']':
+                    break
+                try:
+                    obj, pos_end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Объект еще не прочитан целиком - ждем следующий блок
+                    break
+                yield obj
+                pos = pos_end
+            
+            buffer = buffer[pos:]
+            if not chunk:
+                if buffer.strip() not in ('', ']'):
+                    raise Exception("Дамп базы данных поврежден")
+                return
+    
+    @staticmethod
+    def _sort_models(model_list):
+        """Упорядочивание моделей так, чтобы связанные таблицы загружались раньше"""
+        model_set = set(model_list)
+        ordered = []
+        visiting = set()
+        
+        def visit(model):
+            if model in ordered or model in visiting:
+                return
+            visiting.add(model)
+            for field in model._meta.fields + model._meta.many_to_many:
+                related = field.related_model
+                if related is not None and related is not model and related in model_set:
+                    visit(related)
+            visiting.discard(model)
+            ordered.append(model)
+        
+        for model in sorted(model_list, key=lambda m: m._meta.label_lower):
+            visit(model)
+        return ordered
+    
+    @staticmethod
+    def _restore_database(zipf, selected, plot_id=None, prune=False, batch_size=500):
+        """
+        Загрузка дампа пакетами.
+
+        За один проход по архиву объекты раскладываются по временным файлам
+        моделей, затем модели загружаются в порядке зависимостей - каждый пакет
+        в своей транзакции. Возвращает количество объектов по моделям и
+        (для plot_id) список файлов восстановленных документов.
+        """
+        counts = {}
+        media_files = set()
+        referenced = {
+            'documents.documentblob': set(),
+            'documents.documentcategory': set(),
+            'documents.documenttag': set(),
+        }
+        # pk blob из копии -> blob с тем же содержимым, уже существующий в базе
+        existing_blobs = {}
+        
+        with tempfile.TemporaryDirectory(prefix='restore_', dir=settings.BASE_DIR) as spool_dir:
+            spools = {}
+            
+            try:
+                # Проход по архиву: фильтрация и раскладка объектов по моделям
+                with zipf.open(BackupService.DATABASE_ENTRY) as stream:
+                    for obj in BackupService._iter_fixture(stream):
+                        label = obj.get('model', '').lower()
+                        if label in BackupService.RESTORE_EXCLUDED_MODELS:
+                            continue
+                        try:
+                            model = apps_registry.get_model(label)
+                        except (LookupError, ValueError):
+                            continue
+                        if selected is not None and model not in selected:
+                            continue
+                        
+                        if plot_id is not None and label == 'documents.document':
+                            fields = obj.get('fields', {})
+                            if str(fields.get('related_plot')) != str(plot_id):
+                                continue
+                            if fields.get('file'):
+                                media_files.add(fields['file'])
+                            if fields.get('blob') is not None:
+                                referenced['documents.documentblob'].add(str(fields['blob']))
+                            if fields.get('category') is not None:
+                                referenced['documents.documentcategory'].add(str(fields['category']))
+                            referenced['documents.documenttag'].update(
+                                str(tag) for tag in fields.get('tags', [])
+                            )
+                        
+                        if model not in spools:
+                            spools[model] = open(
+                                os.path.join(spool_dir, f'{label}.jsonl'), 'w', encoding='utf-8'
+                            )
+                        spools[model].write(json.dumps(obj, ensure_ascii=False) + '\n')
+            finally:
+                for spool in spools.values():
+                    spool.close()
+            
+            # Загрузка моделей в порядке зависимостей
+            deferred = []
+            restored_pks = {}
+            with connection.constraint_checks_disabled():
+                for model in BackupService._sort_models(spools.keys()):
+                    label = model._meta.label_lower
+                    only_pks = referenced.get(label) if plot_id is not None else None
+                    restored_pks[model] = set()
+                    counts[label] = 0
+                    
+                    for batch in BackupService._read_batches(spools[model].name, batch_size):
+                        if only_pks is not None:
+                            batch = [obj for obj in batch if str(obj.get('pk')) in only_pks]
+                        if plot_id is not None and label == 'documents.documentblob':
+                            batch = BackupService._reuse_blobs(model, batch, existing_blobs, media_files)
+                        elif existing_blobs and label == 'documents.document':
+                            for obj in batch:
+                                blob = existing_blobs.get(str(obj['fields'].get('blob')))
+                                if blob is not None:
+                                    obj['fields']['blob'] = blob.pk
+                                    obj['fields']['file'] = blob.file
+                        with transaction.atomic():
+                            for deserialized in serializers.deserialize(
+                                'python', batch,
+                                ignorenonexistent=True,
+                                handle_forward_references=True
+                            ):
+                                deserialized.save()
+                                if deserialized.deferred_fields:
+                                    deferred.append(deserialized)
+                                restored_pks[model].add(deserialized.object.pk)
+                        counts[label] += len(batch)
+                
+                if deferred:
+                    with transaction.atomic():
+                        for deserialized in deferred:
+                            deserialized.save_deferred_fields()
+                
+                if prune:
+                    for model in reversed(BackupService._sort_models(restored_pks.keys())):
+                        BackupService._prune(model, restored_pks[model], batch_size)
+            
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in restored_pks]
+            )
+        
+        return counts, media_files
+    
+    @staticmethod
+    def _reuse_blobs(model, batch, existing_blobs, media_files):
+        """
+        Blob участка при выборочном восстановлении. Если то же содержимое
+        (sha256) уже хранится под другим pk, запись из копии не загружается -
+        документы перенаправляются на существующий blob (existing_blobs), его
+        файл не перезаписывается. Миниатюры загружаемых blob добавляются
+        к восстанавливаемым файлам.
+        """
+        current = {
+            blob.sha256: blob
+            for blob in model.objects.filter(sha256__in=[obj['fields']['sha256'] for obj in batch])
+        }
+        restored = []
+        for obj in batch:
+            fields = obj['fields']
+            blob = current.get(fields['sha256'])
+            if blob is not None and str(blob.pk) != str(obj['pk']):
+                existing_blobs[str(obj['pk'])] = blob
+                media_files.discard(fields['file'])
+                continue
+            if fields.get('thumbnail'):
+                media_files.add(fields['thumbnail'])
+            restored.append(obj)
+        return restored
+
+    @staticmethod
+    def _prune(model, keep_pks, batch_size):
+        """
+        Удаление записей модели, которых нет в копии, пакетами по batch_size:
+        exclude(pk__in=...) со всеми восстановленными pk упирается в лимит
+        параметров запроса SQLite на больших таблицах.
+        """
+        manager = model._default_manager
+        stale = [
+            pk for pk in manager.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+            if pk not in keep_pks
+        ]
+        for start in range(0, len(stale), batch_size):
+            with transaction.atomic():
+                manager.filter(pk__in=stale[start:start + batch_size]).delete()
+    
+    @staticmethod
+    def _read_batches(path, batch_size):
+        """Чтение временного файла модели пакетами по batch_size объектов"""
+        batch = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    
+    @staticmethod
+    def _restore_media(zipf, only=None):
+        """
+        Восстановление медиафайлов потоком из архива.
+
+        При полном восстановлении файлы собираются в служебном каталоге
+        внутри MEDIA_ROOT (та же файловая система), затем каталоги верхнего
+        уровня подменяются переименованием. Сам MEDIA_ROOT не переименовывается:
+        в docker-compose это точка монтирования тома. При выборочном (only)
+        каждый файл записывается во временный и переименовывается на место.
+        """
+        prefix = BackupService.MEDIA_PREFIX
+        members = [
+            info for info in zipf.infolist()
+            if info.filename.startswith(prefix) and not info.is_dir()
+        ]
+        if only is not None:
+            members = [info for info in members if info.filename[len(prefix):] in only]
+        if not members:
+            return 0
+        
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        os.makedirs(media_root, exist_ok=True)
+        target_root = media_root if only is not None else os.path.join(media_root, BackupService.MEDIA_RESTORE_DIR)
+        if only is None and os.path.exists(target_root):
+            shutil.rmtree(target_root)
+        
+        restored = 0
+        for info in members:
+            name = info.filename[len(prefix):]
+            if name.split('/', 1)[0] in BackupService.MEDIA_SERVICE_DIRS:
+                continue
+            target = os.path.abspath(os.path.join(target_root, name))
+            # Защита от выхода за пределы каталога (zip slip)
+            if not target.startswith(target_root + os.sep):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            partial_path = f'{target}.part'
+            with zipf.open(info) as src, open(partial_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, BackupService.STREAM_CHUNK_SIZE)
+            os.replace(partial_path, target)
+            restored += 1
+        
+        if only is None:
+            BackupService._swap_media(media_root, target_root)
+        
+        return restored
+    
+    @staticmethod
+    def _swap_media(media_root, restored_root):
+        """
+        Подмена содержимого MEDIA_ROOT собранным каталогом: текущие записи
+        верхнего уровня уходят в служебный каталог, собранные встают на их
+        место. При ошибке прежнее содержимое возвращается.
+        """
+        previous_root = os.path.join(media_root, BackupService.MEDIA_PREVIOUS_DIR)
+        if os.path.exists(previous_root):
+            shutil.rmtree(previous_root)
+        os.makedirs(previous_root)
+        
+        moved_out = []
+        moved_in = []
+        try:
+            for name in os.listdir(media_root):
+                if name in BackupService.MEDIA_SERVICE_DIRS:
+                    continue
+                os.replace(os.path.join(media_root, name), os.path.join(previous_root, name))
+                moved_out.append(name)
+            for name in os.listdir(restored_root):
+                os.replace(os.path.join(restored_root, name), os.path.join(media_root, name))
+                moved_in.append(name)
+        except OSError:
+            for name in moved_in:
+                os.replace(os.path.join(media_root, name), os.path.join(restored_root, name))
+            for name in moved_out:
+                os.replace(os.path.join(previous_root, name), os.path.join(media_root, name))
+            raise
+        finally:
+            shutil.rmtree(restored_root, ignore_errors=True)
+        shutil.rmtree(previous_root, ignore_errors=True)
+    
     @staticmethod
     def list_backups():
         """Получение списка резервных копий"""
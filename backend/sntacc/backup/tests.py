@@ -1,3 +1,189 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+from datetime import date
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from documents.models import Document, DocumentBlob
+from owners.models import Owner
+from plots.models import Plot, PlotOwner
+from .models import Backup
+from .services import BackupService
+
+
+class BackupFixtureMixin:
+    """Два участка с документами и резервная копия во временных каталогах"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.backup_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, BACKUP_ROOT=self.backup_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.backup_root, ignore_errors=True)
+
+        self.plot = Plot.objects.create(plot_number='1', address='Линия 1')
+        self.other_plot = Plot.objects.create(plot_number='2', address='Линия 2')
+        owner = Owner.objects.create(full_name='Иванов Иван')
+        PlotOwner.objects.create(plot=self.plot, owner=owner, ownership_start=date(2020, 1, 1))
+        self.document = Document.objects.create(
+            title='План участка', related_plot=self.plot,
+            file=SimpleUploadedFile('plan.txt', b'plan of plot 1')
+        )
+        self.other_document = Document.objects.create(
+            title='План соседа', related_plot=self.other_plot,
+            file=SimpleUploadedFile('plan2.txt', b'plan of plot 2')
+        )
+        self.backup = BackupService.create_backup('test')
+
+    def read(self, name):
+        with open(os.path.join(self.media_root, name), 'rb') as f:
+            return f.read()
+
+
+@override_settings(DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAILS_ASYNC=False)
+class RestoreTests(BackupFixtureMixin, TestCase):
+    """Копия -> изменения -> восстановление: полное, по участку, с prune"""
+
+    def test_full_restore(self):
+        path = self.document.file.name
+        Plot.objects.filter(pk=self.plot.pk).update(address='Изменено')
+        Plot.objects.create(plot_number='3')
+        with open(os.path.join(self.media_root, path), 'wb') as f:
+            f.write(b'damaged')
+        os.makedirs(os.path.join(self.media_root, 'extra'))
+
+        result = BackupService.restore_backup(self.backup.id)
+
+        self.assertEqual(Plot.objects.get(pk=self.plot.pk).address, 'Линия 1')
+        # Без prune записи, появившиеся после копии, остаются
+        self.assertTrue(Plot.objects.filter(plot_number='3').exists())
+        self.assertEqual(self.read(path), b'plan of plot 1')
+        self.assertEqual(result['media_files'], 2)
+        # Содержимое MEDIA_ROOT подменено, сам каталог и служебные не остались
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'extra')))
+        self.assertEqual(sorted(os.listdir(self.media_root)), ['documents'])
+
+    def test_restore_with_prune(self):
+        Plot.objects.create(plot_number='3')
+        BackupService.restore_backup(self.backup.id, apps=['plots'], restore_media=False, prune=True)
+        self.assertEqual(set(Plot.objects.values_list('plot_number', flat=True)), {'1', '2'})
+
+    def test_prune_in_batches(self):
+        for number in range(3, 8):
+            Plot.objects.create(plot_number=str(number))
+        backup = BackupService.create_backup('plots')
+        for number in range(8, 12):
+            Plot.objects.create(plot_number=str(number))
+        with CaptureQueriesContext(connection) as queries:
+            BackupService.restore_backup(backup.id, apps=['plots'], restore_media=False, prune=True, batch_size=2)
+        self.assertEqual(
+            set(Plot.objects.values_list('plot_number', flat=True)), {str(number) for number in range(1, 8)}
+        )
+        # Ни один запрос не перечисляет все pk таблицы (лимит параметров SQLite)
+        lists = [
+            values.split(',')
+            for query in queries.captured_queries
+            for values in re.findall(r' IN \(([^()]*)\)', query['sql'])
+        ]
+        self.assertTrue(lists)
+        self.assertLessEqual(max(len(values) for values in lists), 2)
+
+    def test_plot_restore(self):
+        own_path = self.document.file.name
+        other_path = self.other_document.file.name
+        Document.objects.filter(pk=self.document.pk).update(title='Изменено')
+        Document.objects.filter(pk=self.other_document.pk).update(title='Изменено')
+        for path in (own_path, other_path):
+            with open(os.path.join(self.media_root, path), 'wb') as f:
+                f.write(b'damaged')
+
+        result = BackupService.restore_backup(self.backup.id, plot_id=self.plot.pk)
+
+        self.assertEqual(result['objects']['documents.document'], 1)
+        self.assertEqual(Document.objects.get(pk=self.document.pk).title, 'План участка')
+        self.assertEqual(Document.objects.get(pk=self.other_document.pk).title, 'Изменено')
+        self.assertEqual(self.read(own_path), b'plan of plot 1')
+        self.assertEqual(self.read(other_path), b'damaged')
+
+    def test_api_flags_parsed_as_booleans(self):
+        Plot.objects.create(plot_number='3')
+        response = APIClient().post(
+            f'/api/backup/backups/{self.backup.id}/restore/',
+            {'apps': ['plots'], 'restore_media': 'false', 'prune': 'false'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['media_files'], 0)
+        self.assertTrue(Plot.objects.filter(plot_number='3').exists())
+
+        response = APIClient().post(f'/api/backup/backups/{self.backup.id}/restore/', {'prune': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Backup.objects.count(), 1)
+
+    def test_download(self):
+        with open(self.backup.file_path, 'rb') as f:
+            content = f.read()
+        response = APIClient().get(f'/api/backup/backups/{self.backup.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        response = APIClient().get(f'/api/backup/backups/{self.backup.id}/download/', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[:10])
+
+    async def test_download_under_asgi(self):
+        # Под ASGI архив отдается асинхронным потоком
+        with open(self.backup.file_path, 'rb') as f:
+            content = f.read()
+        response = await AsyncClient().get(f'/api/backup/backups/{self.backup.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), content)
+
+
+@override_settings(DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAILS_ASYNC=False)
+class PlotRestoreTests(BackupFixtureMixin, TransactionTestCase):
+    """
+    Восстановление удаленных документов участка: вместе с документом
+    возвращается его blob, ref_count пересчитывается. TransactionTestCase -
+    проверка внешних ключей выполняется при фиксации, как в работе.
+    """
+
+    def test_restore_deleted_document(self):
+        path = self.document.file.name
+        pk, blob_id = self.document.pk, self.document.blob_id
+        self.document.delete()
+        self.assertFalse(DocumentBlob.objects.filter(pk=blob_id).exists())
+
+        BackupService.restore_backup(self.backup.id, plot_id=self.plot.pk)
+
+        document = Document.objects.get(pk=pk)
+        self.assertEqual(document.blob_id, blob_id)
+        self.assertEqual(document.blob.ref_count, 1)
+        self.assertEqual(self.read(path), b'plan of plot 1')
+
+    def test_restore_onto_existing_content(self):
+        pk, blob_id = self.document.pk, self.document.blob_id
+        self.document.delete()
+        # То же содержимое загружено заново - blob с другим pk
+        duplicate = Document.objects.create(
+            title='Копия плана', related_plot=self.other_plot,
+            file=SimpleUploadedFile('copy.txt', b'plan of plot 1')
+        )
+        self.assertNotEqual(duplicate.blob_id, blob_id)
+
+        BackupService.restore_backup(self.backup.id, plot_id=self.plot.pk)
+
+        document = Document.objects.get(pk=pk)
+        self.assertEqual(document.blob_id, duplicate.blob_id)
+        self.assertEqual(document.file.name, duplicate.file.name)
+        self.assertEqual(DocumentBlob.objects.get(pk=duplicate.blob_id).ref_count, 2)
+        self.assertFalse(DocumentBlob.objects.filter(pk=blob_id).exists())
@@ -1,13 +1,24 @@
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+import os
 from django.http import HttpResponse, FileResponse
 from django.utils import timezone
+from sntacc.downloads import serve_file
 from .models import Backup, BackupSchedule
 from .serializers import BackupSerializer, BackupScheduleSerializer
 from .services import BackupService
 
+def parse_bool(value, default):
+    """Флаг из JSON или формы: строки "false" и "0" - ложь, а не истина"""
+    if value is None:
+        return default
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError:
+        raise ValueError(f'Ожидается true или false, получено {value!r}')
+
 class BackupViewSet(viewsets.ModelViewSet):
     queryset = Backup.objects.all()
     serializer_class = BackupSerializer
@@ -33,7 +44,11 @@ class BackupViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def download(self, request, pk=None):
-        """Скачивание резервной копии"""
+        """
+        Скачивание резервной копии. Под ASGI serve_file отдает архив
+        асинхронным потоком (или через X-Accel-Redirect), и медленный
+        клиент не занимает поток воркера.
+        """
         try:
             backup = self.get_object()
             if backup.status != 'completed':
@@ -44,12 +59,28 @@ class BackupViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Файл резервной копии не найден'}, 
                               status=status.HTTP_404_NOT_FOUND)
             
-            response = FileResponse(
-                open(backup.file_path, 'rb'),
-                as_attachment=True,
-                filename=os.path.basename(backup.file_path)
+            return serve_file(
+                request,
+                backup.file_path,
+                content_type='application/zip'
             )
-            return response
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    def restore(self, request, pk=None):
+        """Восстановление из резервной копии (полное или выборочное)"""
+        try:
+            backup = self.get_object()
+            result = BackupService.restore_backup(
+                backup.id,
+                apps=request.data.get('apps'),
+                models=request.data.get('models'),
+                plot_id=request.data.get('plot_id'),
+                restore_media=parse_bool(request.data.get('restore_media'), True),
+                prune=parse_bool(request.data.get('prune'), False)
+            )
+            return Response({'message': 'Данные восстановлены', **result})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -70,4 +101,4 @@ class BackupViewSet(viewsets.ModelViewSet):
 class BackupScheduleViewSet(viewsets.ModelViewSet):
     queryset = BackupSchedule.objects.all()
     serializer_class = BackupScheduleSerializer
-    permission_classes = [AllowAny]
\ No newline at end of file
+    permission_classes = [AllowAny]
@@ -0,0 +1,203 @@
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Document, DocumentBlob
+from .pdf import pdfium, pdfium_lock
+from .search import DocumentSearchService
+
+logger = logging.getLogger(__name__)
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1251')
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DOCUMENT_TEXT_WORKERS,
+            thread_name_prefix='text-extraction'
+        )
+    return _executor
+
+
+class TextCollector:
+    """Накопление фрагментов текста до DOCUMENT_TEXT_MAX_LENGTH символов"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.length = 0
+
+    @property
+    def full(self):
+        return self.length >= self.limit
+
+    def add(self, text):
+        if text and not self.full:
+            self.parts.append(text)
+            self.length += len(text) + 1
+
+    def text(self):
+        return ' '.join(' '.join(self.parts).split())[:self.limit]
+
+
+class TextExtractionService:
+    """
+    Извлечение текста файлов документов для полнотекстового поиска:
+    PDF (текстовый слой, без OCR), DOCX и XLSX (разбор XML внутри архива
+    потоком, без загрузки документа целиком) и TXT. Текст относится к
+    DocumentBlob - у дубликатов он извлекается один раз.
+    """
+
+    @staticmethod
+    def supports(extension):
+        extension = extension.lower()
+        if extension == '.pdf':
+            return pdfium is not None
+        return extension in ('.docx', '.xlsx', '.txt', '.csv')
+
+    @staticmethod
+    def extract_pdf(path, collector):
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(path)
+            try:
+                for index in range(len(pdf)):
+                    if collector.full:
+                        break
+                    page = pdf[index]
+                    textpage = page.get_textpage()
+                    collector.add(textpage.get_text_bounded())
+                    textpage.close()
+                    page.close()
+            finally:
+                pdf.close()
+
+    @staticmethod
+    def extract_docx(path, collector):
+        with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+            for _, element in iterparse(xml):
+                if element.tag == WORD_NS + 't':
+                    collector.add(element.text)
+                elif element.tag == WORD_NS + 'p':
+                    element.clear()
+                    if collector.full:
+                        break
+
+    @staticmethod
+    def extract_xlsx(path, collector):
+        with zipfile.ZipFile(path) as archive:
+            shared = []
+            if 'xl/sharedStrings.xml' in archive.namelist():
+                with archive.open('xl/sharedStrings.xml') as xml:
+                    for _, element in iterparse(xml):
+                        if element.tag == SHEET_NS + 'si':
+                            shared.append(''.join(t.text or '' for t in element.iter(SHEET_NS + 't')))
+                            element.clear()
+
+            sheets = sorted(
+                name for name in archive.namelist()
+                if name.startswith('xl/worksheets/') and name.endswith('.xml')
+            )
+            for name in sheets:
+                with archive.open(name) as xml:
+                    for _, element in iterparse(xml):
+                        if element.tag == SHEET_NS + 'c':
+                            collector.add(TextExtractionService._cell_text(element, shared))
+                        elif element.tag == SHEET_NS + 'row':
+                            element.clear()
+                            if collector.full:
+                                return
+
+    @staticmethod
+    def _cell_text(cell, shared):
+        cell_type = cell.get('t')
+        if cell_type == 'inlineStr':
+            return ''.join(t.text or '' for t in cell.iter(SHEET_NS + 't'))
+        value = cell.find(SHEET_NS + 'v')
+        if value is None or not value.text or cell_type in ('b', 'e'):
+            return ''
+        if cell_type == 's':
+            index = int(value.text)
+            return shared[index] if index < len(shared) else ''
+        return value.text
+
+    @staticmethod
+    def extract_txt(path, collector):
+        with open(path, 'rb') as f:
+            # Символ в UTF-8 - до 4 байт
+            data = f.read(collector.limit * 4)
+        for encoding in TEXT_ENCODINGS:
+            try:
+                collector.add(data.decode(encoding))
+                return
+            except UnicodeDecodeError:
+                continue
+        collector.add(data.decode('utf-8', errors='replace'))
+
+    @staticmethod
+    def extract_text(path, extension):
+        """Текст файла одной строкой (пробелы и переводы строк схлопываются)"""
+        collector = TextCollector(settings.DOCUMENT_TEXT_MAX_LENGTH)
+        extension = extension.lower()
+        if extension == '.pdf':
+            TextExtractionService.extract_pdf(path, collector)
+        elif extension == '.docx':
+            TextExtractionService.extract_docx(path, collector)
+        elif extension == '.xlsx':
+            TextExtractionService.extract_xlsx(path, collector)
+        else:
+            TextExtractionService.extract_txt(path, collector)
+        return collector.text()
+
+    @staticmethod
+    def extract(blob_id, force=False):
+        """Извлечение текста blob в поисковые документы; возвращает новый text_status"""
+        blob = DocumentBlob.objects.filter(pk=blob_id).first()
+        if blob is None or (blob.text_status != 'pending' and not force):
+            return None
+        storage = Document._meta.get_field('file').storage
+        extension = os.path.splitext(blob.file)[1]
+
+        text = ''
+        if not TextExtractionService.supports(extension) or not storage.exists(blob.file):
+            status = 'unsupported'
+        else:
+            try:
+                text = TextExtractionService.extract_text(storage.path(blob.file), extension)
+                status = 'ready'
+            except Exception as e:
+                logger.warning('Не удалось извлечь текст %s: %s', blob.file, e)
+                status = 'failed'
+
+        with transaction.atomic():
+            DocumentSearchService.set_content(blob.pk, text)
+            DocumentBlob.objects.filter(pk=blob.pk).update(text_status=status)
+        return status
+
+    @staticmethod
+    def run_in_background(blob_id):
+        close_old_connections()
+        try:
+            TextExtractionService.extract(blob_id)
+        except Exception:
+            logger.exception('Ошибка фонового извлечения текста')
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def schedule(blob_id):
+        """Извлечение после коммита: в фоновом потоке или сразу (DOCUMENT_TEXT_EXTRACTION_ASYNC)"""
+        if settings.DOCUMENT_TEXT_EXTRACTION_ASYNC:
+            transaction.on_commit(lambda: get_executor().submit(TextExtractionService.run_in_background, blob_id))
+        else:
+            transaction.on_commit(lambda: TextExtractionService.extract(blob_id))
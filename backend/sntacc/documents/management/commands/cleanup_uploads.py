@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from documents.services import DocumentUploadService
+
+class Command(BaseCommand):
+    help = 'Удаление брошенных загрузок документов частями и их временных файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Срок без новых частей (по умолчанию DOCUMENT_UPLOAD_EXPIRY_HOURS)')
+
+    def handle(self, *args, **options):
+        count = DocumentUploadService.cleanup_expired(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {count}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from documents.services import DocumentStorageService
+
+class Command(BaseCommand):
+    help = 'Перевод файлов документов на хранение по содержимому (SHA-256) с удалением дубликатов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать дубликаты, ничего не менять')
+
+    def handle(self, *args, **options):
+        stats = DocumentStorageService.deduplicate(dry_run=options['dry_run'])
+        freed_mb = stats['bytes_freed'] / (1024 * 1024)
+        self.stdout.write(
+            f'Документов: {stats["documents"]}, дубликатов: {stats["duplicates"]}, '
+            f'файлов не найдено: {stats["missing"]}, blob без документов: {stats["orphans"]}'
+        )
+        message = f'Освобождается {freed_mb:.1f} МБ' if options['dry_run'] else f'Освобождено {freed_mb:.1f} МБ'
+        self.stdout.write(self.style.SUCCESS(message))
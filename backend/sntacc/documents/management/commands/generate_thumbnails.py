@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import DocumentBlob
+from documents.thumbnails import ThumbnailService
+
+class Command(BaseCommand):
+    help = 'Создание миниатюр документов, которые еще не обработаны (например, загруженных до включения миниатюр)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Повторить файлы с ошибкой')
+        parser.add_argument('--force', action='store_true', help='Пересоздать все миниатюры (после смены размера)')
+
+    def handle(self, *args, **options):
+        blobs = DocumentBlob.objects.all()
+        if not options['force']:
+            statuses = ['pending', 'failed'] if options['retry_failed'] else ['pending']
+            blobs = blobs.filter(thumbnail_status__in=statuses)
+
+        counts = {}
+        for blob_id in blobs.values_list('id', flat=True).iterator():
+            status = ThumbnailService.generate(blob_id, force=True)
+            counts[status] = counts.get(status, 0) + 1
+
+        summary = ', '.join(f'{status}: {count}' for status, count in counts.items()) or 'нечего обрабатывать'
+        self.stdout.write(self.style.SUCCESS(f'Миниатюры ({summary})'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from documents.extraction import TextExtractionService
+from documents.models import DocumentBlob
+from documents.search import DocumentSearchService
+
+class Command(BaseCommand):
+    help = 'Поисковый индекс документов: пересборка названий и описаний, извлечение текста необработанных файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Повторить файлы с ошибкой')
+        parser.add_argument('--force', action='store_true', help='Извлечь текст всех файлов заново')
+
+    def handle(self, *args, **options):
+        documents = DocumentSearchService.refresh()
+
+        blobs = DocumentBlob.objects.all()
+        if not options['force']:
+            statuses = ['pending', 'failed'] if options['retry_failed'] else ['pending']
+            blobs = blobs.filter(text_status__in=statuses)
+
+        counts = {}
+        for blob_id in blobs.values_list('id', flat=True).iterator():
+            status = TextExtractionService.extract(blob_id, force=True)
+            counts[status] = counts.get(status, 0) + 1
+
+        summary = ', '.join(f'{status}: {count}' for status, count in counts.items()) or 'нечего обрабатывать'
+        self.stdout.write(self.style.SUCCESS(f'Документов в индексе: {documents}; текст файлов ({summary})'))
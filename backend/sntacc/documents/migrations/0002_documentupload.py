@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('total_size', models.BigIntegerField(verbose_name='Размер файла (байт)')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Получено (байт)')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Тип содержимого')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('metadata', models.JSONField(default=dict, verbose_name='Поля документа')),
+                ('status', models.CharField(choices=[('uploading', 'Загружается'), ('completed', 'Завершена')], default='uploading', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало загрузки')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последняя часть')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Загружает')),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='documents.document', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Загрузка документа',
+                'verbose_name_plural': 'Загрузки документов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
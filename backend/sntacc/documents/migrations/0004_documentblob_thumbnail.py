@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_documentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='thumbnail',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', 'Ожидает'), ('ready', 'Готова'), ('unsupported', 'Не поддерживается'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус миниатюры'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# DDL поискового индекса на момент миграции: код приложения может меняться,
+# миграция - нет
+POSTGRESQL_VECTOR = (
+    "setweight(to_tsvector('russian', title), 'A') || "
+    "setweight(to_tsvector('russian', description), 'B') || "
+    "setweight(to_tsvector('russian', content), 'C')"
+)
+
+POSTGRESQL_INDEX_SQL = (
+    [
+        'CREATE INDEX IF NOT EXISTS documents_documentsearchdocument_fts '
+        f'ON documents_documentsearchdocument USING gin (({POSTGRESQL_VECTOR}))',
+    ],
+    [
+        'DROP INDEX IF EXISTS documents_documentsearchdocument_fts',
+    ],
+)
+
+SQLITE_INDEX_SQL = (
+    [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS documents_documentsearchdocument_fts USING fts5('
+        "title, description, content, content='documents_documentsearchdocument', content_rowid='document_id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TRIGGER IF NOT EXISTS documents_documentsearchdocument_ai '
+        'AFTER INSERT ON documents_documentsearchdocument BEGIN '
+        'INSERT INTO documents_documentsearchdocument_fts(rowid, title, description, content) '
+        'VALUES (new.document_id, new.title, new.description, new.content); END',
+        'CREATE TRIGGER IF NOT EXISTS documents_documentsearchdocument_ad '
+        'AFTER DELETE ON documents_documentsearchdocument BEGIN '
+        'INSERT INTO documents_documentsearchdocument_fts'
+        '(documents_documentsearchdocument_fts, rowid, title, description, content) '
+        "VALUES ('delete', old.document_id, old.title, old.description, old.content); END",
+        'CREATE TRIGGER IF NOT EXISTS documents_documentsearchdocument_au '
+        'AFTER UPDATE ON documents_documentsearchdocument BEGIN '
+        'INSERT INTO documents_documentsearchdocument_fts'
+        '(documents_documentsearchdocument_fts, rowid, title, description, content) '
+        "VALUES ('delete', old.document_id, old.title, old.description, old.content); "
+        'INSERT INTO documents_documentsearchdocument_fts(rowid, title, description, content) '
+        'VALUES (new.document_id, new.title, new.description, new.content); END',
+        "INSERT INTO documents_documentsearchdocument_fts(documents_documentsearchdocument_fts) VALUES ('rebuild')",
+    ],
+    [
+        'DROP TRIGGER IF EXISTS documents_documentsearchdocument_ai',
+        'DROP TRIGGER IF EXISTS documents_documentsearchdocument_ad',
+        'DROP TRIGGER IF EXISTS documents_documentsearchdocument_au',
+        'DROP TABLE IF EXISTS documents_documentsearchdocument_fts',
+    ],
+)
+
+
+def index_sql(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        return POSTGRESQL_INDEX_SQL
+    if vendor == 'sqlite':
+        return SQLITE_INDEX_SQL
+    return ([], [])
+
+
+def index_text(text):
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def create_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor)[0]:
+        schema_editor.execute(sql)
+
+    # Текст файлов извлекается командой index_documents
+    Document = apps.get_model('documents', 'Document')
+    DocumentSearchDocument = apps.get_model('documents', 'DocumentSearchDocument')
+    DocumentSearchDocument.objects.bulk_create([
+        DocumentSearchDocument(document_id=document_id, title=index_text(title), description=index_text(description))
+        for document_id, title, description in Document.objects.values_list('id', 'title', 'description')
+    ], batch_size=500)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor)[1]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_documentblob_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearchDocument',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='documents.document', verbose_name='Документ')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('content', models.TextField(blank=True, verbose_name='Текст файла')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='text_status',
+            field=models.CharField(choices=[('pending', 'Ожидает'), ('ready', 'Извлечен'), ('unsupported', 'Не поддерживается'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус извлечения текста'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
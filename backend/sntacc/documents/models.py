@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 import os
+import uuid
+from .storage import blob_name, content_sha256
 
 def document_upload_path(instance, filename):
     """Путь для загрузки документов"""
@@ -19,6 +22,101 @@ class DocumentCategory(models.Model):
     def __str__(self):
         return self.name
 
+class DocumentBlob(models.Model):
+    """
+    Содержимое файла документа, хранится один раз на SHA-256. Несколько
+    документов с одинаковым файлом ссылаются на один blob; файл удаляется,
+    когда удален последний документ (ref_count).
+    """
+    THUMBNAIL_STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('ready', 'Готова'),
+        ('unsupported', 'Не поддерживается'),
+        ('failed', 'Ошибка'),
+    ]
+    TEXT_STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('ready', 'Извлечен'),
+        ('unsupported', 'Не поддерживается'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    file = models.CharField(max_length=255, verbose_name="Путь в хранилище")
+    size = models.BigIntegerField(verbose_name="Размер (байт)")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Число документов")
+    thumbnail = models.CharField(max_length=255, blank=True, verbose_name="Миниатюра")
+    thumbnail_status = models.CharField(
+        max_length=20,
+        choices=THUMBNAIL_STATUS_CHOICES,
+        default='pending',
+        verbose_name="Статус миниатюры"
+    )
+    text_status = models.CharField(
+        max_length=20,
+        choices=TEXT_STATUS_CHOICES,
+        default='pending',
+        verbose_name="Статус извлечения текста"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    
+    class Meta:
+        verbose_name = "Файл документов"
+        verbose_name_plural = "Файлы документов"
+    
+    def __str__(self):
+        return self.file
+    
+    @classmethod
+    def acquire(cls, content, filename, storage):
+        """Blob для загружаемого содержимого (новый или существующий) с ref_count + 1"""
+        sha256 = content_sha256(content)
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None or not storage.exists(blob.file):
+                # Файл с таким именем - то же содержимое (например, после сбоя)
+                name = blob_name(sha256, filename)
+                if not storage.exists(name):
+                    name = storage.save(name, content)
+                if blob is None:
+                    blob = cls._create_or_lock(sha256, name, content.size, storage)
+                else:
+                    cls.objects.filter(pk=blob.pk).update(file=name)
+                    blob.file = name
+            cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob
+    
+    @classmethod
+    def _create_or_lock(cls, sha256, name, size, storage):
+        """
+        Новый blob; если параллельная загрузка того же содержимого успела
+        создать его раньше - блокировка и возврат существующего. Файл,
+        сохраненный этой загрузкой под другим именем, удаляется.
+        """
+        try:
+            with transaction.atomic():
+                return cls.objects.create(sha256=sha256, file=name, size=size)
+        except IntegrityError:
+            blob = cls.objects.select_for_update().get(sha256=sha256)
+            if blob.file != name:
+                storage.delete(name)
+            return blob
+    
+    @classmethod
+    def release(cls, blob_id, storage):
+        """Уменьшение ref_count; последний документ удаляет файл после коммита"""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=blob_id).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+            for name in (blob.file, blob.thumbnail):
+                if name:
+                    transaction.on_commit(lambda name=name: storage.delete(name))
+
 class Document(models.Model):
     DOCUMENT_TYPE_CHOICES = [
         ('receipt', 'Квитанция'),
@@ -56,6 +154,15 @@ class Document(models.Model):
         upload_to=document_upload_path,
         verbose_name="Файл"
     )
+    original_filename = models.CharField(max_length=255, blank=True, verbose_name="Имя файла")
+    blob = models.ForeignKey(
+        DocumentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Содержимое"
+    )
     file_size = models.BigIntegerField(null=True, blank=True, verbose_name="Размер файла (байт)")
     file_type = models.CharField(max_length=50, blank=True, verbose_name="Тип файла")
     status = models.CharField(
@@ -103,17 +210,39 @@ class Document(models.Model):
         return self.title
     
     def save(self, *args, **kwargs):
+        previous_blob_id = None
+        if self.file and not self.file._committed:
+            # Новый файл: сохраняем по содержимому, одинаковые файлы - один раз
+            previous_blob_id = self.blob_id
+            self.original_filename = os.path.basename(self.file.name)
+            self.blob = DocumentBlob.acquire(self.file.file, self.original_filename, self.file.storage)
+            self.file.name = self.blob.file
+            self.file._committed = True
+            self.file_size = self.blob.size
+            self.file_type = ''
+            self._blob_acquired = True
+        
         if self.file and not self.file_size:
             self.file_size = self.file.size
         
         if self.file and not self.file_type:
-            self.file_type = self.file.name.split('.')[-1].lower()
+            self.file_type = self.get_file_extension().lstrip('.')
         
         super().save(*args, **kwargs)
+        
+        # Ссылка на прежний blob освобождается; если загружено то же
+        # содержимое, это снимает лишнюю ссылку, добавленную acquire
+        if previous_blob_id:
+            DocumentBlob.release(previous_blob_id, self.file.storage)
+    
+    @property
+    def filename(self):
+        """Имя файла для скачивания: исходное, а не путь в хранилище"""
+        return self.original_filename or os.path.basename(self.file.name)
     
     def get_file_extension(self):
         if self.file:
-            return os.path.splitext(self.file.name)[1].lower()
+            return os.path.splitext(self.filename)[1].lower()
         return ''
     
     def get_file_icon(self):
@@ -132,6 +261,26 @@ class Document(models.Model):
         }
         return icon_map.get(ext, 'insert_drive_file')
 
+class DocumentSearchDocument(models.Model):
+    """Поисковый документ: название, описание и текст файла (см. documents.search)"""
+    document = models.OneToOneField(
+        Document,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name="Документ"
+    )
+    title = models.CharField(max_length=200, verbose_name="Название")
+    description = models.TextField(blank=True, verbose_name="Описание")
+    content = models.TextField(blank=True, verbose_name="Текст файла")
+    
+    class Meta:
+        verbose_name = "Поисковый документ"
+        verbose_name_plural = "Поисковые документы"
+    
+    def __str__(self):
+        return self.title
+
 class DocumentTag(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name="Название тега")
     color = models.CharField(max_length=7, default='#007bff', verbose_name="Цвет")
@@ -142,4 +291,53 @@ class DocumentTag(models.Model):
         verbose_name_plural = "Теги документов"
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class DocumentUpload(models.Model):
+    """Загрузка документа частями: файл собирается во временном каталоге до finalize"""
+    STATUS_CHOICES = [
+        ('uploading', 'Загружается'),
+        ('completed', 'Завершена'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    total_size = models.BigIntegerField(verbose_name="Размер файла (байт)")
+    received = models.BigIntegerField(default=0, verbose_name="Получено (байт)")
+    content_type = models.CharField(max_length=100, blank=True, verbose_name="Тип содержимого")
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name="SHA-256")
+    metadata = models.JSONField(default=dict, verbose_name="Поля документа")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='uploading',
+        verbose_name="Статус"
+    )
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Документ"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Загружает"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Начало загрузки")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последняя часть")
+    
+    class Meta:
+        verbose_name = "Загрузка документа"
+        verbose_name_plural = "Загрузки документов"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.total_size})"
+    
+    @property
+    def temp_path(self):
+        return os.path.join(settings.DOCUMENT_UPLOAD_TEMP_DIR, f'{self.id}.part')
\ No newline at end of file
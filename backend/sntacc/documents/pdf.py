@@ -0,0 +1,10 @@
+import threading
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium не потокобезопасен: миниатюры и извлечение текста идут в разных
+# фоновых потоках, поэтому все обращения к библиотеке - под одной блокировкой
+pdfium_lock = threading.Lock()
@@ -0,0 +1,202 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+from plots.search import fts_quote, normalize, table_exists
+
+from .models import Document, DocumentSearchDocument
+
+SEARCH_TABLE = DocumentSearchDocument._meta.db_table
+FTS_TABLE = f'{SEARCH_TABLE}_fts'
+
+# Веса полей: совпадение в названии важнее описания, описание - текста файла
+POSTGRESQL_VECTOR = (
+    "setweight(to_tsvector('russian', title), 'A') || "
+    "setweight(to_tsvector('russian', description), 'B') || "
+    "setweight(to_tsvector('russian', content), 'C')"
+)
+SQLITE_WEIGHTS = '10.0, 4.0, 1.0'
+
+# Границы подсветки в тексте фрагмента: заменяются на <mark> после экранирования
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def search_terms(query):
+    """Слова запроса без знаков препинания: 'Протокол №12-а' -> ['протокол', '12', 'а']"""
+    return re.findall(r'\w+', normalize(query))
+
+
+def index_text(text):
+    """Текст для индекса: токенизатор unicode61 не приводит 'ё' к 'е'"""
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def highlight(fragment):
+    """Экранирование фрагмента и замена границ совпадений на <mark>"""
+    return escape(fragment).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def make_snippet(texts, terms, width=160):
+    """Фрагмент вокруг первого совпадения для СУБД без полнотекстового поиска"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    for text in texts:
+        text = ' '.join(index_text(text).split())
+        match = pattern.search(text)
+        if match is None:
+            continue
+        start = max(0, match.start() - width // 2)
+        fragment = text[start:start + width]
+        fragment = pattern.sub(lambda m: f'{MARK_START}{m.group(0)}{MARK_END}', fragment)
+        return ('…' if start else '') + fragment + ('…' if start + width < len(text) else '')
+    return ''
+
+
+class DocumentSearchService:
+    """
+    Полнотекстовый поиск документов по названию, описанию и тексту файла
+    (documents.extraction). PostgreSQL использует GIN-индекс по tsvector
+    с русской морфологией, SQLite - FTS5, прочие СУБД - icontains.
+    Каждое слово запроса ищется как префикс: "протокол" находит
+    "протоколы" и "протоколом".
+    """
+    RESULTS_LIMIT = 50
+    MAX_RESULTS_LIMIT = 200
+    SNIPPET_WORDS = 24
+
+    @staticmethod
+    def refresh(document_ids=None, reset_content=False):
+        """
+        Обновление названия и описания в поисковых документах (None - всех).
+
+        Текст файла у существующих записей сохраняется; новым записям и
+        при reset_content (у документа сменился файл) он берется из другого
+        документа с тем же содержимым, если текст уже извлечен.
+        """
+        documents = Document.objects.all()
+        search_documents = DocumentSearchDocument.objects.all()
+        if document_ids is not None:
+            document_ids = list(document_ids)
+            documents = documents.filter(pk__in=document_ids)
+            search_documents = search_documents.filter(document_id__in=document_ids)
+        documents = list(documents.values_list('id', 'title', 'description', 'blob_id'))
+
+        existing = set()
+        if not reset_content:
+            existing = set(search_documents.values_list('document_id', flat=True))
+        blob_ids = {row[3] for row in documents if row[0] not in existing and row[3]}
+        contents = {}
+        if blob_ids:
+            for blob_id, content in DocumentSearchDocument.objects.filter(
+                document__blob_id__in=blob_ids
+            ).exclude(content='').values_list('document__blob_id', 'content'):
+                contents.setdefault(blob_id, content)
+
+        DocumentSearchDocument.objects.bulk_create(
+            [
+                DocumentSearchDocument(
+                    document_id=document_id,
+                    title=index_text(title),
+                    description=index_text(description),
+                    content=contents.get(blob_id, '')
+                )
+                for document_id, title, description, blob_id in documents
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['document'],
+            update_fields=['title', 'description', 'content'] if reset_content else ['title', 'description']
+        )
+        return len(documents)
+
+    @staticmethod
+    def set_content(blob_id, text):
+        """Извлеченный текст файла - во все документы с этим содержимым"""
+        return DocumentSearchDocument.objects.filter(document__blob_id=blob_id).update(content=index_text(text))
+
+    @staticmethod
+    def search(query, queryset=None, limit=None):
+        """
+        Поиск среди документов queryset (фильтры по категории, типу,
+        участку). Возвращает [{'id', 'rank', 'snippet'}] по убыванию
+        релевантности; snippet - экранированный HTML с <mark>.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        limit = max(1, min(limit or DocumentSearchService.RESULTS_LIMIT, DocumentSearchService.MAX_RESULTS_LIMIT))
+        queryset = Document.objects.all() if queryset is None else queryset
+
+        if connection.vendor == 'postgresql':
+            results = DocumentSearchService._search_postgresql(terms, queryset, limit)
+        elif connection.vendor == 'sqlite' and DocumentSearchService._has_fts_table():
+            results = DocumentSearchService._search_sqlite(terms, queryset, limit)
+        else:
+            results = DocumentSearchService._search_fallback(terms, queryset, limit)
+        return [
+            {'id': document_id, 'rank': round(rank, 4), 'snippet': highlight(snippet or '')}
+            for document_id, rank, snippet in results
+        ]
+
+    @staticmethod
+    def _has_fts_table():
+        return table_exists(FTS_TABLE)
+
+    @staticmethod
+    def _search_postgresql(terms, queryset, limit):
+        filter_sql, filter_params = queryset.values('pk').query.sql_with_params()
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        options = (
+            f'StartSel={MARK_START}, StopSel={MARK_END}, '
+            f'MaxWords={DocumentSearchService.SNIPPET_WORDS}, MinWords=8, MaxFragments=2, '
+            f'FragmentDelimiter=" … "'
+        )
+        with connection.cursor() as cursor:
+            # Фрагменты строятся только для найденной страницы результатов
+            cursor.execute(
+                f'SELECT d.document_id, r.score, ts_headline('
+                f"'russian', d.title || ' ' || d.description || ' ' || d.content, r.query, %s) "
+                f'FROM ('
+                f'  SELECT document_id, ts_rank({POSTGRESQL_VECTOR}, q) AS score, q AS query '
+                f"  FROM {SEARCH_TABLE}, to_tsquery('russian', %s) q "
+                f'  WHERE ({POSTGRESQL_VECTOR}) @@ q AND document_id IN ({filter_sql}) '
+                f'  ORDER BY score DESC, document_id LIMIT %s'
+                f') r JOIN {SEARCH_TABLE} d ON d.document_id = r.document_id '
+                f'ORDER BY r.score DESC, d.document_id',
+                [options, tsquery, *filter_params, limit]
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def _search_sqlite(terms, queryset, limit):
+        filter_sql, filter_params = queryset.values('pk').query.sql_with_params()
+        expression = ' '.join(fts_quote(term) + '*' for term in terms)
+        with connection.cursor() as cursor:
+            # bm25 отрицательный: чем меньше, тем релевантнее
+            cursor.execute(
+                f'SELECT rowid, -bm25({FTS_TABLE}, {SQLITE_WEIGHTS}) AS score, '
+                f"snippet({FTS_TABLE}, -1, char(2), char(3), '…', {DocumentSearchService.SNIPPET_WORDS}) "
+                f'FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({filter_sql}) '
+                f'ORDER BY score DESC, rowid LIMIT %s',
+                [expression, *filter_params, limit]
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def _search_fallback(terms, queryset, limit):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(content__icontains=term)
+            )
+        rows = DocumentSearchDocument.objects.filter(
+            condition,
+            document_id__in=queryset.values('pk')
+        ).order_by('-document_id').values_list('document_id', 'title', 'description', 'content')[:limit]
+        return [
+            (document_id, 1.0, make_snippet([content, description, title], terms))
+            for document_id, title, description, content in rows
+        ]
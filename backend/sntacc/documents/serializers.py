@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Document, DocumentCategory, DocumentTag
+from sntacc.selection import SelectableFieldsMixin
+from .models import Document, DocumentCategory, DocumentTag, DocumentUpload
 from accounts.models import CustomUser
 from plots.models import Plot
 from owners.models import Owner
@@ -34,7 +36,7 @@ class DocumentTagSerializer(serializers.ModelSerializer):
         model = DocumentTag
         fields = ['id', 'name', 'color', 'created_at']
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     category = DocumentCategorySerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
     related_plot = PlotSerializer(read_only=True)
@@ -44,18 +46,26 @@ class DocumentSerializer(serializers.ModelSerializer):
     file_size_mb = serializers.SerializerMethodField()
     file_extension = serializers.SerializerMethodField()
     file_icon = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Document
         fields = [
             'id', 'title', 'description', 'category', 'document_type', 
-            'file', 'file_url', 'file_size', 'file_size_mb', 'file_type',
-            'file_extension', 'file_icon', 'status', 'related_plot', 
+            'file', 'original_filename', 'file_url', 'file_size', 'file_size_mb', 'file_type',
+            'file_extension', 'file_icon', 'thumbnail_url', 'status', 'related_plot', 
             'related_owner', 'created_by', 'created_at', 'updated_at', 'tags'
         ]
         read_only_fields = [
-            'file_size', 'file_type', 'created_at', 'updated_at', 'created_by'
+            'original_filename', 'file_size', 'file_type', 'created_at', 'updated_at', 'created_by'
         ]
+        field_dependencies = {
+            'file_url': ['file'],
+            'file_size_mb': ['file_size'],
+            'file_extension': ['file', 'original_filename'],
+            'file_icon': ['file', 'original_filename'],
+            'thumbnail_url': ['blob'],
+        }
     
     def get_file_url(self, obj):
         if obj.file:
@@ -74,6 +84,13 @@ class DocumentSerializer(serializers.ModelSerializer):
     
     def get_file_icon(self, obj):
         return obj.get_file_icon()
+    
+    def get_thumbnail_url(self, obj):
+        if obj.blob_id and obj.blob.thumbnail:
+            request = self.context.get('request')
+            url = Document._meta.get_field('file').storage.url(obj.blob.thumbnail)
+            return request.build_absolute_uri(url) if request else url
+        return None
 
 class DocumentCreateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
@@ -124,9 +141,13 @@ class DocumentCreateSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError("Файл обязателен")
         
-        # Проверяем размер файла (максимум 10MB)
-        if hasattr(value, 'size') and value.size > 10 * 1024 * 1024:  # 10MB
-            raise serializers.ValidationError("Размер файла не должен превышать 10MB")
+        # Проверяем размер файла (по умолчанию 10MB; для загрузки частями
+        # ограничение передается в context)
+        max_size = self.context.get('max_file_size', settings.DOCUMENT_MAX_UPLOAD_SIZE)
+        if hasattr(value, 'size') and value.size > max_size:
+            raise serializers.ValidationError(
+                f"Размер файла не должен превышать {max_size // (1024 * 1024)}MB"
+            )
         
         return value
     
@@ -163,4 +184,34 @@ class DocumentCreateSerializer(serializers.ModelSerializer):
         if tags_data is not None:
             instance.tags.set(tags_data)
         
-        return instance
\ No newline at end of file
+        return instance
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    chunk_size = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DocumentUpload
+        fields = [
+            'id', 'filename', 'total_size', 'offset', 'chunk_size', 'content_type',
+            'sha256', 'status', 'document', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['content_type', 'status', 'document']
+    
+    def get_chunk_size(self, obj):
+        return settings.DOCUMENT_UPLOAD_CHUNK_SIZE
+    
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Размер файла должен быть больше нуля")
+        if value > settings.DOCUMENT_CHUNKED_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Размер файла не должен превышать {settings.DOCUMENT_CHUNKED_MAX_SIZE // (1024 * 1024)}MB"
+            )
+        return value
+    
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError("Некорректная контрольная сумма SHA-256")
+        return value
\ No newline at end of file
@@ -0,0 +1,345 @@
+import hashlib
+import logging
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Document, DocumentBlob, DocumentUpload
+from .serializers import DocumentCreateSerializer
+from .storage import blob_name, content_sha256
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+# Сигнатуры начала файла: тип определяется по первой части, а не по расширению
+MAGIC_TYPES = [
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+]
+
+class UploadError(Exception):
+    pass
+
+class UploadOffsetConflict(UploadError):
+    """Часть пришла не с той позиции: клиент должен продолжить с offset"""
+    def __init__(self, offset):
+        super().__init__(f'Ожидается часть с позиции {offset}')
+        self.offset = offset
+
+class ChunkedUploadFile(File):
+    """
+    Собранный файл загрузки. FileSystemStorage перемещает файлы с
+    temporary_file_path() на место вместо копирования.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+class DocumentUploadService:
+    @staticmethod
+    def detect_content_type(head):
+        for signature, content_type in MAGIC_TYPES:
+            if head.startswith(signature):
+                return content_type
+        return 'application/octet-stream'
+
+    @staticmethod
+    def start_upload(upload_serializer, metadata, user=None):
+        """
+        Начало загрузки: проверка полей будущего документа (без файла) и
+        пустой временный файл. Возвращает DocumentUpload.
+        """
+        document_serializer = DocumentCreateSerializer(data=metadata)
+        document_serializer.fields.pop('file')
+        document_serializer.is_valid(raise_exception=True)
+
+        os.makedirs(settings.DOCUMENT_UPLOAD_TEMP_DIR, exist_ok=True)
+        upload = upload_serializer.save(metadata=metadata, created_by=user)
+        open(upload.temp_path, 'wb').close()
+        return upload
+
+    @staticmethod
+    def write_chunk(upload, stream, offset, length, checksum=None):
+        """
+        Запись части с позиции offset потоком (без буферизации в памяти).
+
+        Позиция не может быть дальше уже полученного; повтор части с
+        меньшей позицией перезаписывает байты. Если клиент оборвал
+        передачу или не совпала контрольная сумма части (заголовок
+        X-Chunk-SHA256), offset не сдвигается - часть отправляется заново.
+        """
+        if upload.status != 'uploading':
+            raise UploadError('Загрузка уже завершена')
+        if offset > upload.received:
+            raise UploadOffsetConflict(upload.received)
+        if length <= 0:
+            raise UploadError('Пустая часть')
+        if length > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+            raise UploadError(f'Часть больше {settings.DOCUMENT_UPLOAD_CHUNK_SIZE} байт')
+        if offset + length > upload.total_size:
+            raise UploadError('Часть выходит за объявленный размер файла')
+
+        digest = hashlib.sha256()
+        head = b''
+        written = 0
+        with open(upload.temp_path, 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                if offset == 0 and len(head) < 16:
+                    head += data[:16]
+                f.write(data)
+                digest.update(data)
+                written += len(data)
+
+        if written < length:
+            raise UploadError(f'Получено {written} из {length} байт части')
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise UploadError('Контрольная сумма части не совпадает')
+
+        updates = {'received': Greatest(F('received'), offset + written), 'updated_at': timezone.now()}
+        if offset == 0:
+            updates['content_type'] = DocumentUploadService.detect_content_type(head)
+        DocumentUpload.objects.filter(pk=upload.pk).update(**updates)
+        upload.refresh_from_db()
+        return upload
+
+    @staticmethod
+    def file_sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def finalize_upload(upload, user=None):
+        """Проверка полноты и контрольной суммы, создание документа из собранного файла"""
+        if upload.status != 'uploading':
+            raise UploadError('Загрузка уже завершена')
+        if upload.received != upload.total_size:
+            raise UploadOffsetConflict(upload.received)
+
+        sha256 = DocumentUploadService.file_sha256(upload.temp_path)
+        if upload.sha256 and upload.sha256 != sha256:
+            raise UploadError('Контрольная сумма файла не совпадает, загрузите файл заново')
+
+        file = ChunkedUploadFile(open(upload.temp_path, 'rb'), name=upload.filename)
+        file.sha256 = sha256
+        serializer = DocumentCreateSerializer(
+            data={**upload.metadata, 'file': file},
+            context={'max_file_size': settings.DOCUMENT_CHUNKED_MAX_SIZE}
+        )
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                # Повторный finalize (двойной клик, повтор после таймаута) ждет
+                # первый и видит завершенную загрузку - второй документ не создается
+                locked = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+                if locked.status != 'uploading':
+                    raise UploadError('Загрузка уже завершена')
+                document = serializer.save(created_by=user)
+                upload.sha256 = sha256
+                upload.status = 'completed'
+                upload.document = document
+                upload.save(update_fields=['sha256', 'status', 'document', 'updated_at'])
+        finally:
+            file.close()
+        # Файл перемещается в хранилище; если такое содержимое уже есть - остается здесь
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        return document
+
+    @staticmethod
+    def abort_upload(upload):
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        upload.delete()
+
+    @staticmethod
+    def cleanup_expired(hours=None):
+        """Удаление загрузок без новых частей дольше DOCUMENT_UPLOAD_EXPIRY_HOURS"""
+        hours = settings.DOCUMENT_UPLOAD_EXPIRY_HOURS if hours is None else hours
+        expired = DocumentUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=hours))
+        count = 0
+        for upload in expired:
+            DocumentUploadService.abort_upload(upload)
+            count += 1
+        return count
+
+class DocumentStorageService:
+    @staticmethod
+    def deduplicate(dry_run=False):
+        """
+        Перевод документов, загруженных до хранения по содержимому, в
+        documents/blobs: одинаковые файлы остаются в одном экземпляре,
+        дубликаты удаляются. В конце ref_count сверяется с числом
+        документов, blob без документов удаляются.
+        """
+        storage = Document._meta.get_field('file').storage
+        stats = {'documents': 0, 'duplicates': 0, 'missing': 0, 'bytes_freed': 0, 'orphans': 0}
+        seen = set(DocumentBlob.objects.values_list('sha256', flat=True))
+
+        legacy = Document.objects.filter(blob__isnull=True).exclude(file='').only('id', 'file', 'original_filename')
+        for document in legacy.iterator():
+            old_name = document.file.name
+            if not storage.exists(old_name):
+                stats['missing'] += 1
+                continue
+            with storage.open(old_name, 'rb') as f:
+                sha256 = content_sha256(File(f))
+            size = storage.size(old_name)
+            stats['documents'] += 1
+            if sha256 in seen:
+                stats['duplicates'] += 1
+                stats['bytes_freed'] += size
+            seen.add(sha256)
+            if dry_run:
+                continue
+            DocumentStorageService.migrate_document(document, sha256, size, storage)
+
+        if not dry_run:
+            stats['orphans'] = DocumentStorageService.recount_references(storage)
+        return stats
+
+    @staticmethod
+    def migrate_document(document, sha256, size, storage):
+        old_name = document.file.name
+        moved_to = None
+        try:
+            with transaction.atomic():
+                blob = DocumentBlob.objects.select_for_update().filter(sha256=sha256).first()
+                if blob is None:
+                    name = blob_name(sha256, old_name)
+                    os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+                    file_move_safe(storage.path(old_name), storage.path(name), allow_overwrite=True)
+                    moved_to = name
+                    blob = DocumentBlob.objects.create(sha256=sha256, file=name, size=size)
+                Document.objects.filter(pk=document.pk).update(
+                    blob=blob,
+                    file=blob.file,
+                    original_filename=document.original_filename or os.path.basename(old_name)
+                )
+                DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        except Exception:
+            if moved_to:
+                file_move_safe(storage.path(moved_to), storage.path(old_name))
+            raise
+        # Дубликат: старый файл больше никому не нужен
+        if moved_to is None and not Document.objects.filter(file=old_name).exists():
+            storage.delete(old_name)
+
+    @staticmethod
+    def recount_references(storage):
+        """Сверка ref_count с документами; возвращает число удаленных blob без ссылок"""
+        orphans = 0
+        for blob in DocumentBlob.objects.annotate(documents=Count('document')):
+            if blob.documents == 0:
+                blob.delete()
+                storage.delete(blob.file)
+                orphans += 1
+            elif blob.ref_count != blob.documents:
+                DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=blob.documents)
+        return orphans
+
+class DocumentStatisticsService:
+    """
+    Статистика документов для панели: один запрос с группировкой по
+    категории и условной агрегацией по типам и статусам, результат
+    кешируется до изменения документов (сигналы documents.signals).
+    """
+    CACHE_KEY = 'documents:statistics'
+    RECENT_DAYS = 30
+
+    @staticmethod
+    def get():
+        # Кеш (Redis) недоступен - статистика считается без него, а не 500
+        try:
+            statistics = cache.get(DocumentStatisticsService.CACHE_KEY)
+        except Exception as e:
+            logger.warning('Кеш статистики документов недоступен: %s', e)
+            return DocumentStatisticsService.compute()
+        if statistics is None:
+            statistics = DocumentStatisticsService.compute()
+            DocumentStatisticsService._cache_call(
+                cache.set,
+                DocumentStatisticsService.CACHE_KEY,
+                statistics,
+                settings.DOCUMENT_STATISTICS_CACHE_TIMEOUT
+            )
+        return statistics
+
+    @staticmethod
+    def invalidate():
+        # Повторно после коммита: параллельный запрос мог успеть закешировать
+        # статистику без еще не закоммиченных изменений. Ошибка кеша не
+        # прерывает сохранение документа: устаревшая статистика живет не
+        # дольше DOCUMENT_STATISTICS_CACHE_TIMEOUT
+        DocumentStatisticsService._cache_call(cache.delete, DocumentStatisticsService.CACHE_KEY)
+        transaction.on_commit(
+            lambda: DocumentStatisticsService._cache_call(cache.delete, DocumentStatisticsService.CACHE_KEY)
+        )
+
+    @staticmethod
+    def _cache_call(method, *args):
+        try:
+            method(*args)
+        except Exception as e:
+            logger.warning('Кеш статистики документов недоступен: %s', e)
+
+    @staticmethod
+    def compute():
+        types = [value for value, _ in Document.DOCUMENT_TYPE_CHOICES]
+        statuses = [value for value, _ in Document.STATUS_CHOICES]
+        since = timezone.now() - timedelta(days=DocumentStatisticsService.RECENT_DAYS)
+
+        aggregates = {
+            'count': Count('id'),
+            'total_size': Sum('file_size'),
+            'recent': Count('id', filter=Q(created_at__gte=since)),
+        }
+        for value in types:
+            aggregates[f'type_{value}'] = Count('id', filter=Q(document_type=value))
+        for value in statuses:
+            aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+        # order_by() убирает сортировку Meta.ordering из GROUP BY
+        rows = list(Document.objects.order_by().values('category__name').annotate(**aggregates))
+
+        def totals(prefix, values, field):
+            items = [
+                {field: value, 'count': sum(row[f'{prefix}_{value}'] for row in rows)}
+                for value in values
+            ]
+            return sorted((item for item in items if item['count']), key=lambda item: -item['count'])
+
+        return {
+            'total': sum(row['count'] for row in rows),
+            'recent': sum(row['recent'] for row in rows),
+            'total_size': sum(row['total_size'] or 0 for row in rows),
+            'by_category': sorted(
+                (
+                    {
+                        'category__name': row['category__name'],
+                        'count': row['count'],
+                        'total_size': row['total_size'] or 0,
+                    }
+                    for row in rows
+                ),
+                key=lambda item: -item['count']
+            ),
+            'by_type': totals('type', types, 'document_type'),
+            'by_status': totals('status', statuses, 'status'),
+        }
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .extraction import TextExtractionService
+from .models import Document, DocumentBlob, DocumentCategory
+from .search import DocumentSearchService
+from .services import DocumentStatisticsService
+from .thumbnails import ThumbnailService
+
+
+@receiver(post_delete, sender=Document)
+def release_blob(sender, instance, **kwargs):
+    """Удаление документа освобождает ссылку на файл; последний удаляет его с диска"""
+    if instance.blob_id:
+        DocumentBlob.release(instance.blob_id, instance.file.storage)
+
+
+@receiver(post_save, sender=Document)
+def process_document(sender, instance, raw=False, **kwargs):
+    """
+    Поисковый документ обновляется сразу; для нового содержимого миниатюра
+    и текст файла готовятся в фоне после коммита.
+    """
+    if raw:
+        return
+    new_content = getattr(instance, '_blob_acquired', False)
+    instance._blob_acquired = False
+    DocumentSearchService.refresh([instance.pk], reset_content=new_content)
+    if not new_content:
+        return
+    if instance.blob.thumbnail_status == 'pending':
+        ThumbnailService.schedule(instance.blob_id)
+    if instance.blob.text_status == 'pending':
+        TextExtractionService.schedule(instance.blob_id)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=DocumentCategory)
+@receiver(post_delete, sender=DocumentCategory)
+def invalidate_statistics(sender, raw=False, **kwargs):
+    """Статистика документов считается заново после любого изменения"""
+    if not raw:
+        DocumentStatisticsService.invalidate()
@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+# Файлы документов хранятся по содержимому: documents/blobs/ab/cd/<sha256>.<ext>
+BLOB_PREFIX = 'documents/blobs'
+
+
+def blob_name(sha256, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f'{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def content_sha256(content):
+    """
+    SHA-256 содержимого файла. Загрузчики ниже считают хеш при приеме
+    запроса и кладут его в атрибут sha256; иначе файл читается частями.
+    """
+    sha256 = getattr(content, 'sha256', None)
+    if sha256:
+        return sha256
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class HashingUploadMixin:
+    """Подсчет SHA-256 загружаемого файла по мере приема multipart-запроса"""
+
+    def new_file(self, *args, **kwargs):
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # Обработчик в памяти пропускает большие файлы следующему - не считаем дважды
+        if getattr(self, 'activated', True):
+            self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
@@ -1,3 +1,390 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import Document, DocumentBlob, DocumentCategory, DocumentUpload
+from .search import DocumentSearchService
+from .storage import blob_name
+from .thumbnails import Image, ThumbnailService
+
+
+class TemporaryMediaMixin:
+    """MEDIA_ROOT во временном каталоге, который удаляется после теста"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, TestCase):
+    """Загрузка частями: докачка с последнего offset и сборка документа"""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        settings_override = override_settings(
+            DOCUMENT_UPLOAD_TEMP_DIR=self.temp_dir,
+            DOCUMENT_UPLOAD_CHUNK_SIZE=1024,
+            DOCUMENT_MAX_UPLOAD_SIZE=1024
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.client = APIClient()
+        self.data = b'%PDF-1.4\n' + os.urandom(3000)
+
+    def put_chunk(self, upload_id, offset, chunk, **headers):
+        return self.client.generic(
+            'PUT', f'/api/documents/uploads/{upload_id}/', chunk,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {offset}-{offset + len(chunk) - 1}/{len(self.data)}',
+            **headers
+        )
+
+    def test_resume_and_finalize(self):
+        response = self.client.post('/api/documents/uploads/', {
+            'filename': 'protocol.pdf',
+            'total_size': len(self.data),
+            'sha256': hashlib.sha256(self.data).hexdigest(),
+            'title': 'Протокол собрания',
+            'document_type': 'protocol',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data['id']
+
+        response = self.put_chunk(upload_id, 0, self.data[:1024])
+        self.assertEqual(response.data['offset'], 1024)
+        self.assertEqual(response.data['content_type'], 'application/pdf')
+
+        # Часть с пропуском отклоняется, клиент получает позицию для продолжения
+        response = self.put_chunk(upload_id, 2048, self.data[2048:3072])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1024)
+
+        response = self.put_chunk(upload_id, 1024, self.data[1024:2048], HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/documents/uploads/{upload_id}/').data['offset'], 1024)
+
+        response = self.client.post(f'/api/documents/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 409)
+
+        for offset in range(1024, len(self.data), 1024):
+            response = self.put_chunk(upload_id, offset, self.data[offset:offset + 1024])
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f'/api/documents/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(document.file_size, len(self.data))
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).status, 'completed')
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+        # Повторный finalize не создает второй документ
+        response = self.client.post(f'/api/documents/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_chunk_content_length(self):
+        upload_id = self.client.post('/api/documents/uploads/', {
+            'filename': 'protocol.pdf',
+            'total_size': len(self.data),
+            'sha256': hashlib.sha256(self.data).hexdigest(),
+            'title': 'Протокол собрания',
+        }, format='json').data['id']
+
+        response = self.put_chunk(upload_id, 0, self.data[:1024], CONTENT_LENGTH='1024abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['offset'], 0)
+
+        response = self.put_chunk(upload_id, 0, self.data[:1024], CONTENT_LENGTH='')
+        self.assertEqual(response.status_code, 411)
+
+        response = self.put_chunk(upload_id, 0, self.data[:1024])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['offset'], 1024)
+
+    def test_finalize_existing_content(self):
+        existing = Document.objects.create(
+            title='Загружен раньше', file=SimpleUploadedFile('first.pdf', self.data)
+        )
+        upload = DocumentUpload.objects.create(
+            filename='second.pdf', total_size=len(self.data), received=len(self.data),
+            metadata={'title': 'Повторная загрузка', 'document_type': 'other'}
+        )
+        with open(upload.temp_path, 'wb') as f:
+            f.write(self.data)
+
+        response = self.client.post(f'/api/documents/uploads/{upload.pk}/finalize/')
+
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.data['id'])
+        # Содержимое уже в хранилище: документ ссылается на тот же blob,
+        # а собранный файл не переносится и удаляется из временного каталога
+        self.assertEqual(document.blob_id, existing.blob_id)
+        self.assertEqual(DocumentBlob.objects.get(pk=existing.blob_id).ref_count, 2)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+        self.assertEqual(len(os.listdir(os.path.dirname(existing.file.path))), 1)
+
+
+@override_settings(DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAILS_ASYNC=False)
+class ContentDeduplicationTests(TemporaryMediaMixin, TestCase):
+    """Одинаковое содержимое хранится один раз; файл удаляется с последним документом"""
+
+    def test_identical_files_share_blob(self):
+        first = Document.objects.create(title='Квитанция', file=SimpleUploadedFile('receipt.pdf', b'%PDF receipt'))
+        second = Document.objects.create(title='Копия', file=SimpleUploadedFile('copy.pdf', b'%PDF receipt'))
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(second.original_filename, 'copy.pdf')
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+
+        path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_replace_file(self):
+        document = Document.objects.create(title='Устав', file=SimpleUploadedFile('charter.txt', b'v1'))
+        old_blob = document.blob
+        old_path = document.file.path
+
+        # То же содержимое: ссылка, добавленная при загрузке, снимается
+        document.file = SimpleUploadedFile('charter.txt', b'v1')
+        document.save()
+        self.assertEqual(document.blob_id, old_blob.pk)
+        self.assertEqual(DocumentBlob.objects.get(pk=old_blob.pk).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = SimpleUploadedFile('charter-v2.txt', b'v2')
+            document.save()
+        self.assertFalse(DocumentBlob.objects.filter(pk=old_blob.pk).exists())
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(DocumentBlob.objects.get(pk=document.blob_id).ref_count, 1)
+        self.assertEqual(document.original_filename, 'charter-v2.txt')
+
+    def test_concurrent_upload_of_same_content(self):
+        storage = Document._meta.get_field('file').storage
+        data = b'%PDF same content'
+        competitor_name = storage.save('documents/blobs/competitor.pdf', ContentFile(data))
+        competitor = DocumentBlob.objects.create(
+            sha256=hashlib.sha256(data).hexdigest(), file=competitor_name, size=len(data), ref_count=1
+        )
+        select_for_update = DocumentBlob.objects.select_for_update
+        missed = []
+
+        def lookup():
+            # Первый поиск не видит blob, который параллельная загрузка создала позже
+            if not missed:
+                missed.append(True)
+                return DocumentBlob.objects.none()
+            return select_for_update()
+
+        with patch.object(DocumentBlob.objects, 'select_for_update', side_effect=lookup):
+            document = Document.objects.create(title='Копия', file=SimpleUploadedFile('copy.pdf', data))
+
+        self.assertEqual(document.blob_id, competitor.pk)
+        self.assertEqual(document.file.name, competitor_name)
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 2)
+        # Файл, сохраненный проигравшей загрузкой, не остается в хранилище
+        self.assertFalse(storage.exists(blob_name(competitor.sha256, 'copy.pdf')))
+
+    def test_dedupe_documents(self):
+        storage = Document._meta.get_field('file').storage
+        for name, data in [('a.pdf', b'%PDF same'), ('b.pdf', b'%PDF same'), ('c.pdf', b'%PDF other')]:
+            storage.save(f'documents/legacy/{name}', ContentFile(data))
+        Document.objects.bulk_create([
+            Document(title=name, file=f'documents/legacy/{name}')
+            for name in ('a.pdf', 'b.pdf', 'c.pdf', 'missing.pdf')
+        ])
+
+        call_command('dedupe_documents', '--dry-run', stdout=io.StringIO())
+        self.assertFalse(DocumentBlob.objects.exists())
+
+        output = io.StringIO()
+        call_command('dedupe_documents', stdout=output)
+        self.assertIn('Документов: 3, дубликатов: 1, файлов не найдено: 1', output.getvalue())
+
+        a, b, c = (Document.objects.get(title=name) for name in ('a.pdf', 'b.pdf', 'c.pdf'))
+        self.assertEqual(a.blob_id, b.blob_id)
+        self.assertNotEqual(a.blob_id, c.blob_id)
+        self.assertEqual(a.blob.ref_count, 2)
+        self.assertEqual(b.original_filename, 'b.pdf')
+        with a.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF same')
+        self.assertEqual(os.listdir(storage.path('documents/legacy')), [])
+
+
+@skipUnless(Image, 'Pillow не установлен')
+# Извлечение текста (documents.extraction) тоже выполняется сразу: в фоновом
+# потоке оно обращалось бы к тестовой базе после завершения теста
+@override_settings(DOCUMENT_THUMBNAILS_ASYNC=False, DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAIL_SIZE=64)
+class ThumbnailTests(TemporaryMediaMixin, TestCase):
+    """Миниатюра создается после коммита и отдается в thumbnail_url"""
+
+    def test_image_thumbnail(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            image = Document.objects.create(title='План', file=SimpleUploadedFile('plan.png', buffer.getvalue()))
+            text = Document.objects.create(title='Заметка', file=SimpleUploadedFile('note.txt', b'text'))
+
+        image.blob.refresh_from_db()
+        self.assertEqual(image.blob.thumbnail_status, 'ready')
+        with Image.open(image.file.storage.path(image.blob.thumbnail)) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 32))
+        text.blob.refresh_from_db()
+        self.assertEqual(text.blob.thumbnail_status, 'unsupported')
+
+        response = APIClient().get('/api/documents/', {'fields': 'id,thumbnail_url'})
+        urls = {item['id']: item['thumbnail_url'] for item in response.data}
+        self.assertTrue(urls[image.id].endswith('.thumb.webp'))
+        self.assertIsNone(urls[text.id])
+        self.assertIsNone(ThumbnailService.generate(image.blob_id))
+
+        # Новый размер - новый URL (nginx отдает миниатюры как immutable), прежний файл удаляется
+        old_path = image.file.storage.path(image.blob.thumbnail)
+        with override_settings(DOCUMENT_THUMBNAIL_SIZE=32):
+            self.assertEqual(ThumbnailService.generate(image.blob_id, force=True), 'ready')
+        image.blob.refresh_from_db()
+        self.assertIn('.32-', image.blob.thumbnail)
+        self.assertFalse(os.path.exists(old_path))
+        with Image.open(image.file.storage.path(image.blob.thumbnail)) as thumbnail:
+            self.assertEqual(thumbnail.size, (32, 16))
+
+
+@override_settings(DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAILS_ASYNC=False)
+class DocumentSearchTests(TemporaryMediaMixin, TestCase):
+    """Текст файлов извлекается после коммита и находится поиском с подсветкой"""
+
+    def docx(self, text):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('word/document.xml', (
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>'
+            ))
+        return buffer.getvalue()
+
+    def test_search_file_text(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            protocol = Document.objects.create(
+                title='Протокол собрания',
+                document_type='protocol',
+                file=SimpleUploadedFile('protocol.docx', self.docx('Ремонт дороги у участка 17, вырубка ёлок'))
+            )
+            note = Document.objects.create(
+                title='Заметка',
+                file=SimpleUploadedFile('note.txt', 'Дорогу <b>отремонтировать</b>'.encode('cp1251'))
+            )
+        self.assertEqual(DocumentBlob.objects.get(pk=protocol.blob_id).text_status, 'ready')
+
+        client = APIClient()
+        response = client.get('/api/documents/search/', {'q': 'дорог', 'fields': 'id'})
+        self.assertEqual({item['id'] for item in response.data}, {protocol.id, note.id})
+
+        response = client.get('/api/documents/search/', {'q': 'елок', 'document_type': 'protocol', 'fields': 'id'})
+        self.assertEqual([item['id'] for item in response.data], [protocol.id])
+        self.assertIn('<mark>елок</mark>', response.data[0]['snippet'])
+
+        # Разметка из файла экранируется, подсветка - нет
+        snippet = DocumentSearchService.search('отремонтировать')[0]['snippet']
+        self.assertEqual(snippet, 'Дорогу &lt;b&gt;<mark>отремонтировать</mark>&lt;/b&gt;')
+
+        protocol.title = 'Протокол о газификации'
+        protocol.save()
+        self.assertEqual(DocumentSearchService.search('газификац')[0]['id'], protocol.id)
+        self.assertEqual(DocumentSearchService.search('вырубка')[0]['id'], protocol.id)
+        self.assertEqual(client.get('/api/documents/search/').status_code, 400)
+
+
+@override_settings(DOCUMENT_TEXT_EXTRACTION_ASYNC=False, DOCUMENT_THUMBNAILS_ASYNC=False)
+class DocumentStatisticsTests(TemporaryMediaMixin, TestCase):
+    """Статистика считается одним запросом и сбрасывается при изменении документов"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_statistics_cached_and_invalidated(self):
+        protocols = DocumentCategory.objects.create(name='Протоколы')
+        Document.objects.create(
+            title='Протокол', category=protocols, document_type='protocol',
+            file=SimpleUploadedFile('protocol.pdf', b'%PDF protocol')
+        )
+        Document.objects.create(
+            title='Квитанция', document_type='receipt', status='archived',
+            file=SimpleUploadedFile('receipt.pdf', b'%PDF receipt 2')
+        )
+
+        client = APIClient()
+        with self.assertNumQueries(1):
+            data = client.get('/api/documents/statistics/').data
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['recent'], 2)
+        self.assertEqual(data['total_size'], 27)
+        self.assertEqual(
+            {item['category__name']: item['total_size'] for item in data['by_category']},
+            {'Протоколы': 13, None: 14}
+        )
+        self.assertEqual(
+            {item['status']: item['count'] for item in data['by_status']},
+            {'active': 1, 'archived': 1}
+        )
+        with self.assertNumQueries(0):
+            client.get('/api/documents/statistics/')
+
+        Document.objects.create(
+            title='Акт', category=protocols, document_type='act',
+            file=SimpleUploadedFile('act.pdf', b'%PDF act')
+        )
+        data = client.get('/api/documents/statistics/').data
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['by_category'][0], {'category__name': 'Протоколы', 'count': 2, 'total_size': 21})
+        self.assertEqual({item['document_type'] for item in data['by_type']}, {'protocol', 'receipt', 'act'})
+
+    def test_cache_outage(self):
+        with patch('documents.services.cache') as broken_cache:
+            broken_cache.get.side_effect = ConnectionError('redis недоступен')
+            broken_cache.set.side_effect = ConnectionError('redis недоступен')
+            broken_cache.delete.side_effect = ConnectionError('redis недоступен')
+            client = APIClient()
+            with self.assertLogs('documents.services', 'WARNING'):
+                response = client.post('/api/documents/', {
+                    'title': 'Акт', 'document_type': 'act',
+                    'file': SimpleUploadedFile('act.txt', b'act'),
+                })
+            self.assertEqual(response.status_code, 201)
+
+            with self.assertLogs('documents.services', 'WARNING'):
+                response = client.delete(f'/api/documents/{Document.objects.get(title="Акт").pk}/')
+            self.assertEqual(response.status_code, 204)
+
+            with self.assertLogs('documents.services', 'WARNING'):
+                response = client.get('/api/documents/statistics/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['total'], 0)
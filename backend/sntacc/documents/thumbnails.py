@@ -0,0 +1,149 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from .models import Document, DocumentBlob
+from .pdf import pdfium, pdfium_lock
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+THUMBNAIL_SUFFIX = '.thumb.webp'
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DOCUMENT_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+class ThumbnailService:
+    """
+    Миниатюры документов: изображения и первая страница PDF уменьшаются до
+    DOCUMENT_THUMBNAIL_SIZE по длинной стороне и сохраняются в WebP рядом
+    с файлом: documents/blobs/ab/cd/<sha256>.<размер>-<хеш>.thumb.webp.
+    Миниатюра относится к DocumentBlob, поэтому у дубликатов она общая.
+
+    nginx отдает blobs как immutable, поэтому в имени есть размер и хеш
+    самой миниатюры: после смены DOCUMENT_THUMBNAIL_SIZE или перегенерации
+    у новой миниатюры новый URL, а прежний файл удаляется.
+    """
+
+    @staticmethod
+    def supports(extension):
+        extension = extension.lower()
+        if extension in IMAGE_EXTENSIONS:
+            return Image is not None
+        if extension == '.pdf':
+            return Image is not None and pdfium is not None
+        return False
+
+    @staticmethod
+    def render_image(path, size):
+        with Image.open(path) as image:
+            # JPEG декодируется сразу в уменьшенном виде - быстрее и меньше памяти
+            image.draft('RGB', (size, size))
+            image.thumbnail((size, size))
+            # Копия переживает закрытие файла
+            return image.copy()
+
+    @staticmethod
+    def render_pdf(path, size):
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(path)
+            try:
+                page = pdf[0]
+                width, height = page.get_size()
+                bitmap = page.render(scale=size / max(width, height))
+                # Копия: изображение PIL не должно ссылаться на буфер pdfium после закрытия
+                image = bitmap.to_pil().copy()
+                bitmap.close()
+                page.close()
+            finally:
+                pdf.close()
+        image.thumbnail((size, size))
+        return image
+
+    @staticmethod
+    def render(path, extension, size=None):
+        """Миниатюра в байтах WebP"""
+        size = size or settings.DOCUMENT_THUMBNAIL_SIZE
+        if extension.lower() == '.pdf':
+            image = ThumbnailService.render_pdf(path, size)
+        else:
+            image = ThumbnailService.render_image(path, size)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='WEBP', quality=80)
+        return buffer.getvalue()
+
+    @staticmethod
+    def thumbnail_name(blob_file, size, content):
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        return f'{os.path.splitext(blob_file)[0]}.{size}-{digest}{THUMBNAIL_SUFFIX}'
+
+    @staticmethod
+    def generate(blob_id, force=False):
+        """Создание миниатюры blob; возвращает новый thumbnail_status"""
+        blob = DocumentBlob.objects.filter(pk=blob_id).first()
+        if blob is None or (blob.thumbnail_status != 'pending' and not force):
+            return None
+        storage = Document._meta.get_field('file').storage
+        extension = os.path.splitext(blob.file)[1]
+
+        thumbnail = ''
+        if not ThumbnailService.supports(extension) or not storage.exists(blob.file):
+            status = 'unsupported'
+        else:
+            try:
+                size = settings.DOCUMENT_THUMBNAIL_SIZE
+                content = ThumbnailService.render(storage.path(blob.file), extension, size)
+                thumbnail = ThumbnailService.thumbnail_name(blob.file, size, content)
+                # Имя зависит от содержимого: существующий файл - та же миниатюра
+                if not storage.exists(thumbnail):
+                    thumbnail = storage.save(thumbnail, ContentFile(content))
+                status = 'ready'
+            except Exception as e:
+                logger.warning('Не удалось создать миниатюру %s: %s', blob.file, e)
+                status = 'failed'
+
+        DocumentBlob.objects.filter(pk=blob.pk).update(thumbnail=thumbnail, thumbnail_status=status)
+        if blob.thumbnail and blob.thumbnail != thumbnail:
+            storage.delete(blob.thumbnail)
+        return status
+
+    @staticmethod
+    def run_in_background(blob_id):
+        close_old_connections()
+        try:
+            ThumbnailService.generate(blob_id)
+        except Exception:
+            logger.exception('Ошибка фоновой генерации миниатюры')
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def schedule(blob_id):
+        """Генерация после коммита: в фоновом потоке или сразу (DOCUMENT_THUMBNAILS_ASYNC)"""
+        if settings.DOCUMENT_THUMBNAILS_ASYNC:
+            transaction.on_commit(lambda: get_executor().submit(ThumbnailService.run_in_background, blob_id))
+        else:
+            transaction.on_commit(lambda: ThumbnailService.generate(blob_id))
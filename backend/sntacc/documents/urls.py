@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DocumentViewSet, DocumentCategoryViewSet, DocumentTagViewSet
+from .views import DocumentViewSet, DocumentCategoryViewSet, DocumentTagViewSet, DocumentUploadViewSet
 
 router = DefaultRouter()
+# До DocumentViewSet: иначе uploads/ совпадет с адресом документа
+router.register(r'uploads', DocumentUploadViewSet)
 router.register(r'', DocumentViewSet)
 router.register(r'categories', DocumentCategoryViewSet)
 router.register(r'tags', DocumentTagViewSet)
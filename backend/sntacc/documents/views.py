@@ -1,20 +1,27 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.db.models import Q, Count
-from django.utils import timezone
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 import logging
-from .serializers import DocumentSerializer, DocumentCategorySerializer, DocumentTagSerializer, DocumentCreateSerializer
-from .models import Document, DocumentCategory, DocumentTag
+import os
+from sntacc.downloads import serve_file
+from sntacc.selection import FieldSelectionMixin
+from .serializers import (
+    DocumentSerializer, DocumentCategorySerializer, DocumentTagSerializer,
+    DocumentCreateSerializer, DocumentUploadSerializer
+)
+from .models import Document, DocumentCategory, DocumentTag, DocumentUpload
+from .search import DocumentSearchService
+from .services import DocumentStatisticsService, DocumentUploadService, UploadError, UploadOffsetConflict
 
 logger = logging.getLogger(__name__)
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     queryset = Document.objects.all().select_related(
-        'category', 'created_by', 'related_plot', 'related_owner'
+        'category', 'created_by', 'related_plot', 'related_owner', 'blob'
     ).prefetch_related('tags')
     serializer_class = DocumentSerializer
     permission_classes = [AllowAny]
@@ -126,31 +133,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def statistics(self, request):
-        """Статистика по документам"""
-        total = Document.objects.count()
-        by_category = Document.objects.values(
-            'category__name'
-        ).annotate(count=Count('id')).order_by('-count')
-        
-        by_type = Document.objects.values(
-            'document_type'
-        ).annotate(count=Count('id')).order_by('-count')
-        
-        by_status = Document.objects.values(
-            'status'
-        ).annotate(count=Count('id')).order_by('-count')
-        
-        recent = Document.objects.filter(
-            created_at__gte=timezone.now() - timezone.timedelta(days=30)
-        ).count()
-        
-        return Response({
-            'total': total,
-            'recent': recent,
-            'by_category': list(by_category),
-            'by_type': list(by_type),
-            'by_status': list(by_status)
-        })
+        """Статистика по документам: количество и объем файлов по категориям, типам и статусам"""
+        return Response(DocumentStatisticsService.get())
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def by_plot(self, request):
@@ -159,10 +143,59 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not plot_id:
             return Response({'error': 'Укажите plot_id'}, status=status.HTTP_400_BAD_REQUEST)
         
-        documents = Document.objects.filter(related_plot_id=plot_id)
+        documents = self.get_queryset().filter(related_plot_id=plot_id)
         serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def search(self, request):
+        """
+        Полнотекстовый поиск по названию, описанию и тексту файлов:
+        q - запрос, category, document_type, plot - фильтры, limit.
+        Результаты по релевантности, с фрагментом текста (snippet, <mark>).
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Укажите q'}, status=status.HTTP_400_BAD_REQUEST)
+
+        documents = Document.objects.all()
+        filters = {
+            'category': 'category_id',
+            'document_type': 'document_type',
+            'plot': 'related_plot_id',
+        }
+        try:
+            for param, field in filters.items():
+                value = request.query_params.get(param)
+                if value:
+                    documents = documents.filter(**{field: value})
+            limit = int(request.query_params.get('limit', DocumentSearchService.RESULTS_LIMIT))
+            results = DocumentSearchService.search(query, documents, limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = self.get_queryset().in_bulk([result['id'] for result in results])
+        results = [result for result in results if result['id'] in found]
+        data = self.get_serializer([found[result['id']] for result in results], many=True).data
+        for item, result in zip(data, results):
+            item['snippet'] = result['snippet']
+            item['rank'] = result['rank']
+        return Response(data)
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def download(self, request, pk=None):
+        """Скачивание файла документа"""
+        document = self.get_object()
+        if not document.file or not os.path.exists(document.file.path):
+            return Response({'error': 'Файл документа не найден'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return serve_file(
+            request,
+            document.file.path,
+            filename=document.filename,
+            as_attachment=request.query_params.get('inline') != 'true'
+        )
+
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def by_owner(self, request):
         """Получить документы по собственнику"""
@@ -170,7 +203,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not owner_id:
             return Response({'error': 'Укажите owner_id'}, status=status.HTTP_400_BAD_REQUEST)
         
-        documents = Document.objects.filter(related_owner_id=owner_id)
+        documents = self.get_queryset().filter(related_owner_id=owner_id)
         serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
 
@@ -182,4 +215,104 @@ class DocumentCategoryViewSet(viewsets.ModelViewSet):
 class DocumentTagViewSet(viewsets.ModelViewSet):
     queryset = DocumentTag.objects.all()
     serializer_class = DocumentTagSerializer
-    permission_classes = [AllowAny]
\ No newline at end of file
+    permission_classes = [AllowAny]
+
+class DocumentUploadViewSet(mixins.CreateModelMixin,
+                            mixins.RetrieveModelMixin,
+                            mixins.DestroyModelMixin,
+                            viewsets.GenericViewSet):
+    """
+    Загрузка больших документов частями с докачкой:
+    POST uploads/ (filename, total_size, sha256, поля документа) ->
+    PUT uploads/<id>/ с телом части и заголовком Content-Range ->
+    POST uploads/<id>/finalize/. GET uploads/<id>/ возвращает offset,
+    с которого продолжить после обрыва связи.
+    """
+    queryset = DocumentUpload.objects.all()
+    serializer_class = DocumentUploadSerializer
+    permission_classes = [AllowAny]
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+    UPLOAD_FIELDS = ('filename', 'total_size', 'sha256')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        metadata = {
+            key: value for key, value in request.data.items()
+            if key not in self.UPLOAD_FIELDS and key != 'file'
+        }
+        if hasattr(request.data, 'getlist') and 'tags' in request.data:
+            metadata['tags'] = request.data.getlist('tags')
+        upload = DocumentUploadService.start_upload(
+            serializer,
+            metadata,
+            user=request.user if request.user.is_authenticated else None
+        )
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    def parse_offset(self, request, upload):
+        """Позиция части из Content-Range (bytes start-end/total) или ?offset="""
+        content_range = request.META.get('HTTP_CONTENT_RANGE')
+        if content_range:
+            unit, _, spec = content_range.partition(' ')
+            start = spec.split('-', 1)[0]
+            if unit != 'bytes' or not start.isdigit():
+                raise UploadError('Некорректный заголовок Content-Range')
+            return int(start)
+        offset = request.query_params.get('offset')
+        if offset is None:
+            return upload.received
+        if not offset.isdigit():
+            raise UploadError('Некорректный offset')
+        return int(offset)
+
+    def parse_length(self, request):
+        """Размер части из Content-Length; None, если заголовка нет"""
+        length = request.META.get('CONTENT_LENGTH')
+        if not length:
+            return None
+        if not length.isdigit():
+            raise UploadError('Некорректный заголовок Content-Length')
+        return int(length)
+
+    def update(self, request, *args, **kwargs):
+        """Прием части файла: тело запроса пишется во временный файл потоком"""
+        upload = self.get_object()
+        try:
+            length = self.parse_length(request)
+            if length is None:
+                return Response(
+                    {'error': 'Укажите Content-Length', 'offset': upload.received},
+                    status=status.HTTP_411_LENGTH_REQUIRED
+                )
+            upload = DocumentUploadService.write_chunk(
+                upload,
+                request.stream,
+                self.parse_offset(request, upload),
+                length,
+                checksum=request.META.get('HTTP_X_CHUNK_SHA256')
+            )
+        except UploadOffsetConflict as e:
+            return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'error': str(e), 'offset': upload.received}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    def finalize(self, request, pk=None):
+        """Сборка документа из полученных частей"""
+        upload = self.get_object()
+        try:
+            document = DocumentUploadService.finalize_upload(
+                upload,
+                user=request.user if request.user.is_authenticated else None
+            )
+        except UploadOffsetConflict as e:
+            return Response({'error': 'Файл получен не полностью', 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(DocumentSerializer(document, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        DocumentUploadService.abort_upload(instance)
\ No newline at end of file
@@ -0,0 +1,52 @@
+# Настройки gunicorn (загружаются автоматически из рабочего каталога
+# или явно: gunicorn -c gunicorn.conf.py sntacc.wsgi:application)
+import multiprocessing
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# Профиль ASGI (GUNICORN_ASGI=True): uvicorn-воркеры с sntacc.asgi.
+# Скачивание копий ждет медленных клиентов в цикле событий, поэтому
+# хватает нескольких воркеров. Постоянные соединения с базой под ASGI
+# не переиспользуются между запросами - settings.py в этом профиле
+# по умолчанию ставит DB_CONN_MAX_AGE=0 (для PostgreSQL - пул pgbouncer).
+ASGI = config('GUNICORN_ASGI', default=False, cast=bool)
+
+# Приложение по умолчанию, если не указано в командной строке
+wsgi_app = 'sntacc.asgi:application' if ASGI else 'sntacc.wsgi:application'
+
+# gthread: воркер обслуживает несколько запросов потоками, пока другие
+# ждут базу или диск. Соединение с базой у каждого потока свое и живет
+# DB_CONN_MAX_AGE секунд, поэтому всего соединений workers * threads -
+# это число должно укладываться в max_connections PostgreSQL (или пул pgbouncer).
+worker_class = config(
+    'GUNICORN_WORKER_CLASS',
+    default='uvicorn.workers.UvicornWorker' if ASGI else 'gthread'
+)
+workers = config(
+    'GUNICORN_WORKERS',
+    default=min(multiprocessing.cpu_count() + 1, 4) if ASGI else min(multiprocessing.cpu_count() * 2 + 1, 8),
+    cast=int
+)
+threads = config('GUNICORN_THREADS', default=4, cast=int)
+
+# Перезапуск воркера после N запросов ограничивает рост памяти
+# (pandas в импорте и отчетах); разброс не дает всем воркерам
+# перезапуститься одновременно
+max_requests = config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = config('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# Импорт платежей и генерация отчетов бывают долгими
+timeout = config('GUNICORN_TIMEOUT', default=120, cast=int)
+graceful_timeout = 30
+# Keep-alive за nginx
+keepalive = 5
+
+# Файлы контроля воркеров в памяти: в контейнере /tmp может быть на медленном overlayfs
+worker_tmp_dir = config('GUNICORN_WORKER_TMP_DIR', default='/dev/shm')
+
+accesslog = '-'
+errorlog = '-'
+loglevel = config('GUNICORN_LOG_LEVEL', default='info')
+
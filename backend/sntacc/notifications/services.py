@@ -1,10 +1,31 @@
+import asyncio
+import logging
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.core.mail import EmailMessage
+from django.db import close_old_connections, transaction
 from django.utils import timezone
+from plots.models import Plot, current_owner_prefetch
 from .models import Notification
 
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.NOTIFICATION_SEND_WORKERS,
+            thread_name_prefix='notifications'
+        )
+    return _executor
+
+
 class NotificationService:
     @staticmethod
     def send_email(notification):
@@ -24,7 +45,7 @@ class NotificationService:
         except Exception as e:
             notification.status = 'failed'
             notification.save()
-            print(f"Ошибка отправки email: {e}")
+            logger.error('Ошибка отправки email: %s', e)
             return False
     
     @staticmethod
@@ -53,12 +74,12 @@ class NotificationService:
             else:
                 notification.status = 'failed'
                 notification.save()
-                print(f"Ошибка отправки Telegram: {response.text}")
+                logger.error('Ошибка отправки Telegram: %s', response.text)
                 return False
         except Exception as e:
             notification.status = 'failed'
             notification.save()
-            print(f"Ошибка отправки Telegram: {e}")
+            logger.error('Ошибка отправки Telegram: %s', e)
             return False
     
     @staticmethod
@@ -68,4 +89,140 @@ class NotificationService:
             return NotificationService.send_email(notification)
         elif notification.template.type == 'telegram':
             return NotificationService.send_telegram(notification)
-        return False
\ No newline at end of file
+        return False
+    
+    @staticmethod
+    def create_bulk_notifications(template, plot_ids, notification_type='email', year=None, amount='0'):
+        """Создание уведомлений по шаблону для текущих владельцев участков"""
+        year = year or timezone.now().year
+        plots = Plot.objects.filter(id__in=plot_ids).prefetch_related(current_owner_prefetch())
+        notifications = []
+        for plot in plots:
+            owner = plot.current_owner
+            if not owner:
+                continue
+            notification = Notification(
+                template=template,
+                plot=plot,
+                subject=template.subject,
+                message=template.body.format(
+                    owner_name=owner.full_name,
+                    plot_number=plot.plot_number,
+                    year=year,
+                    amount=amount
+                )
+            )
+            if notification_type == 'email' and owner.email:
+                notification.recipient_email = owner.email
+            elif notification_type == 'telegram' and owner.phone:
+                notification.recipient_phone = owner.phone
+            notifications.append(notification)
+        return Notification.objects.bulk_create(notifications)
+    
+    @staticmethod
+    def send_pending(notification_ids):
+        """Отправка уведомлений по id; результат - в status каждого уведомления"""
+        notifications = list(
+            Notification.objects.filter(id__in=notification_ids, status='pending').select_related('template')
+        )
+        return async_to_sync(NotificationService.asend_many)(notifications)
+    
+    @staticmethod
+    def run_in_background(notification_ids):
+        close_old_connections()
+        try:
+            NotificationService.send_pending(notification_ids)
+        except Exception:
+            logger.exception('Ошибка фоновой отправки уведомлений')
+        finally:
+            close_old_connections()
+    
+    @staticmethod
+    def schedule(notification_ids):
+        """
+        Отправка после коммита: в фоновом потоке (NOTIFICATION_SEND_ASYNC) или
+        сразу. Запрос не ждет SMTP и Telegram - действия send и send_bulk
+        отвечают 202, а статус уведомлений обновляется по мере отправки.
+        """
+        notification_ids = list(notification_ids)
+        if settings.NOTIFICATION_SEND_ASYNC:
+            transaction.on_commit(lambda: get_executor().submit(NotificationService.run_in_background, notification_ids))
+        else:
+            transaction.on_commit(lambda: NotificationService.send_pending(notification_ids))
+    
+    # Асинхронная отправка (send_pending в фоновом потоке). Блокирующие SMTP
+    # и HTTP-вызов к Telegram выполняются в пуле потоков, уведомления пакета
+    # уходят параллельно (NOTIFICATION_SEND_CONCURRENCY); статус сохраняется
+    # через асинхронный ORM.
+    
+    @staticmethod
+    async def asend_email(notification):
+        """Асинхронная отправка email уведомления"""
+        try:
+            email = EmailMessage(
+                subject=notification.subject,
+                body=notification.message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[notification.recipient_email],
+            )
+            await asyncio.to_thread(email.send)
+            notification.status = 'sent'
+            notification.sent_at = timezone.now()
+            await notification.asave()
+            return True
+        except Exception as e:
+            notification.status = 'failed'
+            await notification.asave()
+            logger.error('Ошибка отправки email: %s', e)
+            return False
+    
+    @staticmethod
+    async def asend_telegram(notification):
+        """Асинхронная отправка Telegram уведомления"""
+        try:
+            bot_token = settings.TELEGRAM_BOT_TOKEN
+            if not bot_token:
+                raise Exception("Telegram bot token не настроен")
+            
+            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+            data = {
+                'chat_id': notification.recipient_phone,
+                'text': notification.message
+            }
+            
+            response = await asyncio.to_thread(requests.post, url, data=data, timeout=10)
+            if response.status_code == 200:
+                notification.status = 'sent'
+                notification.sent_at = timezone.now()
+                await notification.asave()
+                return True
+            notification.status = 'failed'
+            await notification.asave()
+            logger.error('Ошибка отправки Telegram: %s', response.text)
+            return False
+        except Exception as e:
+            notification.status = 'failed'
+            await notification.asave()
+            logger.error('Ошибка отправки Telegram: %s', e)
+            return False
+    
+    @staticmethod
+    async def asend_notification(notification):
+        """Асинхронная отправка уведомления; template должен быть загружен (select_related)"""
+        if notification.template.type == 'email':
+            return await NotificationService.asend_email(notification)
+        elif notification.template.type == 'telegram':
+            return await NotificationService.asend_telegram(notification)
+        return False
+    
+    @staticmethod
+    async def asend_many(notifications, concurrency=None):
+        """Параллельная отправка уведомлений; возвращает число отправленных"""
+        semaphore = asyncio.Semaphore(concurrency or settings.NOTIFICATION_SEND_CONCURRENCY)
+        
+        async def send(notification):
+            async with semaphore:
+                return await NotificationService.asend_notification(notification)
+        
+        results = await asyncio.gather(*(send(notification) for notification in notifications))
+        return sum(1 for result in results if result)
\ No newline at end of file
@@ -1,3 +1,114 @@
-from django.test import TestCase
+import time
+from datetime import date
 
-# Create your tests here.
+from django.core import mail
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from owners.models import Owner
+from plots.models import Plot, PlotOwner
+from .models import Notification, NotificationTemplate
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='', NOTIFICATION_SEND_ASYNC=False)
+class NotificationSendTests(TestCase):
+    """Действия send и send_bulk ставят отправку после коммита и отвечают 202"""
+
+    def setUp(self):
+        self.template = NotificationTemplate.objects.create(
+            name='Долг', type='email', subject='Напоминание',
+            body='{owner_name}, участок {plot_number}: долг {amount} за {year}'
+        )
+        self.plots = []
+        for number in range(1, 4):
+            plot = Plot.objects.create(plot_number=str(number))
+            owner = Owner.objects.create(full_name=f'Владелец {number}', email=f'owner{number}@example.com')
+            PlotOwner.objects.create(plot=plot, owner=owner, ownership_start=date(2020, 1, 1))
+            self.plots.append(plot)
+
+    def test_send_bulk(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = APIClient().post('/api/notifications/send_bulk/', {
+                'template_id': self.template.pk,
+                'plot_ids': [plot.pk for plot in self.plots],
+                'year': 2024,
+                'amount': '1500',
+            }, format='json')
+
+        # Ответ не ждет отправки
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        for callback in callbacks:
+            callback()
+        # Письма уходят параллельно, порядок в outbox не определен
+        self.assertEqual(
+            sorted(message.body for message in mail.outbox),
+            [f'Владелец {n}, участок {n}: долг 1500 за 2024' for n in range(1, 4)]
+        )
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 3)
+
+    def test_send_bulk_unknown_template(self):
+        response = APIClient().post('/api/notifications/send_bulk/', {'template_id': 0}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_send_under_asgi(self):
+        notification = await Notification.objects.acreate(
+            template=self.template, plot=self.plots[0], subject='Тема', message='Текст', recipient_email='a@example.com'
+        )
+        response = await AsyncClient().post(f'/api/notifications/{notification.pk}/send/')
+
+        self.assertEqual(response.status_code, 202)
+        await notification.arefresh_from_db()
+        self.assertEqual(notification.status, 'pending')
+
+    def test_send(self):
+        notification = Notification.objects.create(
+            template=self.template, plot=self.plots[0], subject='Тема', message='Текст', recipient_email='a@example.com'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(f'/api/notifications/{notification.pk}/send/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sent')
+
+        # Повторно отправленное уведомление не уходит второй раз
+        response = APIClient().post(f'/api/notifications/{notification.pk}/send/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_telegram_failure_logged(self):
+        template = NotificationTemplate.objects.create(name='Telegram', type='telegram', body='Текст')
+        notification = Notification.objects.create(
+            template=template, plot=self.plots[0], subject='', message='Текст', recipient_phone='123'
+        )
+        with self.assertLogs('notifications.services', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = APIClient().post(f'/api/notifications/{notification.pk}/send/')
+
+        self.assertEqual(response.status_code, 202)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'failed')
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='', NOTIFICATION_SEND_ASYNC=True)
+class BackgroundSendTests(TransactionTestCase):
+    """Отправка в фоновом потоке после коммита запроса"""
+
+    def test_send_in_background(self):
+        template = NotificationTemplate.objects.create(name='Собрание', type='email', subject='Тема', body='Текст')
+        plot = Plot.objects.create(plot_number='1')
+        notification = Notification.objects.create(
+            template=template, plot=plot, subject='Тема', message='Текст', recipient_email='a@example.com'
+        )
+
+        response = APIClient().post(f'/api/notifications/{notification.pk}/send/')
+        self.assertEqual(response.status_code, 202)
+
+        deadline = time.monotonic() + 5
+        while Notification.objects.get(pk=notification.pk).status == 'pending' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(Notification.objects.get(pk=notification.pk).status, 'sent')
+        self.assertEqual(len(mail.outbox), 1)
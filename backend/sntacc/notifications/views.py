@@ -6,8 +6,6 @@ from django.shortcuts import get_object_or_404
 from .models import NotificationTemplate, Notification
 from .serializers import NotificationTemplateSerializer, NotificationSerializer, NotificationCreateSerializer
 from .services import NotificationService
-from plots.models import Plot
-from datetime import timezone
 
 
 class NotificationTemplateViewSet(viewsets.ModelViewSet):
@@ -25,56 +23,30 @@ class NotificationViewSet(viewsets.ModelViewSet):
             return NotificationCreateSerializer
         return NotificationSerializer
 
+    # Отправка идет в фоновом потоке после коммита (NotificationService.schedule):
+    # поток воркера не ждет SMTP и Telegram, действия отвечают 202, результат
+    # виден в status уведомлений (GET notifications/<id>/).
+
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def send_bulk(self, request):
         """Массовая отправка уведомлений"""
+        template = get_object_or_404(NotificationTemplate, id=request.data.get('template_id'))
         try:
-            template_id = request.data.get('template_id')
-            plot_ids = request.data.get('plot_ids', [])
-            notification_type = request.data.get('type', 'email')
-            
-            template = get_object_or_404(NotificationTemplate, id=template_id)
-            
-            notifications = []
-            for plot_id in plot_ids:
-                try:
-                    plot = Plot.objects.get(id=plot_id)
-                    owner = plot.current_owner
-                    
-                    if owner:
-                        notification_data = {
-                            'template': template,
-                            'plot': plot,
-                            'subject': template.subject,
-                            'message': template.body.format(
-                                owner_name=owner.full_name,
-                                plot_number=plot.plot_number,
-                                year=request.data.get('year', timezone.now().year),
-                                amount=request.data.get('amount', '0')
-                            )
-                        }
-                        
-                        if notification_type == 'email' and owner.email:
-                            notification_data['recipient_email'] = owner.email
-                        elif notification_type == 'telegram' and owner.phone:
-                            notification_data['recipient_phone'] = owner.phone
-                        
-                        notification = Notification.objects.create(**notification_data)
-                        notifications.append(notification)
-                except Plot.DoesNotExist:
-                    continue
-            
-            # Отправляем уведомления
-            sent_count = 0
-            for notification in notifications:
-                if NotificationService.send_notification(notification):
-                    sent_count += 1
+            notifications = NotificationService.create_bulk_notifications(
+                template,
+                request.data.get('plot_ids', []),
+                notification_type=request.data.get('type', 'email'),
+                year=request.data.get('year'),
+                amount=request.data.get('amount', '0')
+            )
+            ids = [notification.pk for notification in notifications]
+            NotificationService.schedule(ids)
             
             return Response({
-                'message': f'Отправлено {sent_count} из {len(notifications)} уведомлений',
-                'total': len(notifications),
-                'sent': sent_count
-            })
+                'message': f'Поставлено в очередь на отправку {len(ids)} уведомлений',
+                'total': len(ids),
+                'ids': ids
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -82,9 +54,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def send(self, request, pk=None):
         """Отправка конкретного уведомления"""
         notification = self.get_object()
-        success = NotificationService.send_notification(notification)
-        
-        if success:
-            return Response({'message': 'Уведомление отправлено'})
-        else:
-            return Response({'error': 'Ошибка отправки уведомления'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        if notification.status == 'sent':
+            return Response({'error': 'Уведомление уже отправлено'}, status=status.HTTP_400_BAD_REQUEST)
+        if notification.status == 'failed':
+            # Повторная попытка после ошибки
+            Notification.objects.filter(pk=notification.pk).update(status='pending')
+        NotificationService.schedule([notification.pk])
+        return Response({'message': 'Уведомление поставлено в очередь на отправку'}, status=status.HTTP_202_ACCEPTED)
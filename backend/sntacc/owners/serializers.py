@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from sntacc.fastlist import RowMapper, as_date, as_datetime, as_float
+from sntacc.selection import SelectableFieldsMixin
+from plots.models import PlotOwner
 from .models import Owner
 
 class PlotSerializer(serializers.Serializer):
@@ -14,11 +17,89 @@ class PlotOwnerHistorySerializer(serializers.Serializer):
     ownership_end = serializers.DateField(allow_null=True)
     is_current_owner = serializers.BooleanField()
 
-class OwnerSerializer(serializers.ModelSerializer):
+class OwnerSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    """
+    Собственник: краткий список текущих участков, полная история
+    владения - по ?expand=history (в карточке раскрыта по умолчанию)
+    """
+    current_plots = serializers.SerializerMethodField()
     plots_history = PlotOwnerHistorySerializer(source='plotowner_set', many=True, read_only=True)
     
     class Meta:
         model = Owner
-        fields = ['id', 'full_name', 'phone', 'email', 'plots_history', 
+        fields = ['id', 'full_name', 'phone', 'email', 'current_plots', 'plots_history',
                  'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['created_at', 'updated_at']
+        expandable_fields = {'history': 'plots_history'}
+        field_dependencies = {'current_plots': ['plotowner_set']}
+    
+    def get_current_plots(self, obj):
+        # current_ownerships - предзагрузка текущих владений (OwnerViewSet),
+        # иначе берем из полной истории
+        if hasattr(obj, 'current_ownerships'):
+            ownerships = obj.current_ownerships
+        else:
+            ownerships = [o for o in obj.plotowner_set.all() if o.ownership_end is None]
+        return [
+            {'id': ownership.plot_id, 'plot_number': ownership.plot.plot_number}
+            for ownership in ownerships
+        ]
+
+class FastOwnerListSerializer:
+    """Список собственников из values_list() (формат OwnerSerializer)"""
+    expandable = ('history',)
+    mapper = RowMapper([
+        ('id', 'id', None),
+        ('full_name', 'full_name', None),
+        ('phone', 'phone', None),
+        ('email', 'email', None),
+        ('current_plots', 'id', None),
+        ('created_at', 'created_at', as_datetime),
+        ('updated_at', 'updated_at', as_datetime),
+    ])
+    history_mapper = RowMapper([
+        ('id', 'id', None),
+        ('plot', 'plot_id', None),
+        ('ownership_start', 'ownership_start', as_date),
+        ('ownership_end', 'ownership_end', as_date),
+        ('is_current_owner', 'ownership_end', lambda end: end is None),
+    ])
+    plot_mapper = RowMapper([
+        ('id', 'plot_id', None),
+        ('plot_number', 'plot__plot_number', None),
+        ('address', 'plot__address', None),
+        ('area', 'plot__area', as_float),
+    ])
+
+    @classmethod
+    def serialize(cls, queryset, fields=None, expand=()):
+        expand_history = 'history' in expand
+        if fields is not None and 'current_plots' not in fields and 'plots_history' not in fields:
+            # Владения не запрошены - только колонки собственника
+            return [cls.mapper(row) for row in cls.mapper.rows(queryset)]
+
+        ownerships = PlotOwner.objects.filter(owner_id__in=queryset.order_by().values('pk'))
+        if not expand_history:
+            ownerships = ownerships.filter(ownership_end__isnull=True)
+
+        history = {}
+        width = len(cls.history_mapper.fields)
+        for row in ownerships.order_by('owner_id', '-ownership_start', 'id').values_list(
+            'owner_id', *cls.history_mapper.fields, *cls.plot_mapper.fields
+        ):
+            item = cls.history_mapper(row[1:width + 1])
+            item['plot'] = cls.plot_mapper(row[width + 1:])
+            history.setdefault(row[0], []).append(item)
+
+        data = []
+        for row in cls.mapper.rows(queryset):
+            item = cls.mapper(row)
+            owner_history = history.get(item['current_plots'], [])
+            item['current_plots'] = [
+                {'id': entry['plot']['id'], 'plot_number': entry['plot']['plot_number']}
+                for entry in owner_history if entry['is_current_owner']
+            ]
+            if expand_history:
+                item['plots_history'] = owner_history
+            data.append(item)
+        return data
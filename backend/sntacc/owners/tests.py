@@ -1,3 +1,63 @@
+from datetime import date
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from plots.models import Plot, PlotOwner
+from .models import Owner
+
+
+class OwnerChangeTests(TestCase):
+    """Смена владельца участка в списках и карточках собственников"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Owner.objects.create(full_name='Продавцов Петр')
+        cls.buyer = Owner.objects.create(full_name='Смирнов Иван')
+        cls.plot = Plot.objects.create(plot_number='8', address='Лесная улица')
+        cls.kept_plot = Plot.objects.create(plot_number='9', address='Полевая улица')
+        PlotOwner.objects.create(plot=cls.plot, owner=cls.seller, ownership_start=date(2015, 1, 1))
+        PlotOwner.objects.create(plot=cls.kept_plot, owner=cls.seller, ownership_start=date(2015, 1, 1))
+
+    def setUp(self):
+        self.client = APIClient()
+        response = self.client.post(
+            f'/api/plots/{self.plot.pk}/add_owner/',
+            {'owner_id': self.buyer.pk, 'ownership_start': '2024-06-01'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def owners(self, **params):
+        response = self.client.get('/api/owners/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.data}
+
+    def test_list_shows_current_plots_only(self):
+        owners = self.owners()
+        self.assertEqual(owners[self.seller.pk]['current_plots'], [{'id': self.kept_plot.pk, 'plot_number': '9'}])
+        self.assertEqual(owners[self.buyer.pk]['current_plots'], [{'id': self.plot.pk, 'plot_number': '8'}])
+        self.assertNotIn('plots_history', owners[self.seller.pk])
+
+    def test_history_keeps_previous_ownership(self):
+        history = self.owners(expand='history')[self.seller.pk]['plots_history']
+        ended = [item for item in history if item['plot']['id'] == self.plot.pk]
+        self.assertEqual(len(ended), 1)
+        self.assertEqual(ended[0]['ownership_end'], '2024-06-01')
+        self.assertFalse(ended[0]['is_current_owner'])
+
+    def test_list_matches_detail(self):
+        # Список идет через values(), карточка - через сериализатор
+        listed = self.owners(expand='history')
+        for owner in (self.seller, self.buyer):
+            detail = self.client.get(f'/api/owners/{owner.pk}/').data
+            self.assertEqual(listed[owner.pk]['current_plots'], detail['current_plots'])
+            self.assertEqual(
+                [(item['plot']['id'], item['ownership_end']) for item in listed[owner.pk]['plots_history']],
+                [(item['plot']['id'], str(item['ownership_end']) if item['ownership_end'] else None)
+                 for item in detail['plots_history']]
+            )
 
-# Create your tests here.
+    def test_search_follows_current_owner(self):
+        self.assertEqual(set(self.owners(search='лесная')), {self.buyer.pk})
+        self.assertEqual(set(self.owners(search='полевая')), {self.seller.pk})
@@ -1,15 +1,21 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from .models import Owner
-from .serializers import OwnerSerializer
+from plots.models import PlotOwner
+from plots.search import PlotSearchService
+from sntacc.fastlist import FastListMixin
+from sntacc.selection import FieldSelectionMixin
+from .serializers import OwnerSerializer, FastOwnerListSerializer
 
-class OwnerViewSet(viewsets.ModelViewSet):
+class OwnerViewSet(FieldSelectionMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Owner.objects.all()
     serializer_class = OwnerSerializer
     permission_classes = [AllowAny]
+    fast_serializer_class = FastOwnerListSerializer
+    # Полная история владения: в карточке и ответах на изменение, в списке - по ?expand=history
+    default_expand = {action: ['history'] for action in ('retrieve', 'create', 'update', 'partial_update')}
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -22,7 +28,12 @@ class OwnerViewSet(viewsets.ModelViewSet):
         plot_number = self.request.query_params.get('plot_number', None)
         
         if search:
+            # Текущие владельцы найденных участков + собственники без участков
+            current_owner_ids = PlotSearchService.filter_queryset(
+                PlotOwner.objects.filter(ownership_end__isnull=True), search, field='plot_id'
+            ).values('owner_id')
             queryset = queryset.filter(
+                Q(pk__in=current_owner_ids) |
                 Q(full_name__icontains=search) |
                 Q(phone__icontains=search) |
                 Q(email__icontains=search)
@@ -40,11 +51,18 @@ class OwnerViewSet(viewsets.ModelViewSet):
         if plot_number:
             queryset = queryset.filter(plotowner__plot__plot_number__icontains=plot_number).distinct()
         
-        return queryset
+        # Владения с участками одним запросом на весь список
+        if 'history' in self.get_requested_expand():
+            return queryset.prefetch_related(
+                Prefetch('plotowner_set', queryset=PlotOwner.objects.select_related('plot'))
+            )
+        return queryset.prefetch_related(Prefetch(
+            'plotowner_set',
+            queryset=PlotOwner.objects.filter(ownership_end__isnull=True).select_related('plot'),
+            to_attr='current_ownerships'
+        ))
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def search(self, request):
         """Поиск собственников"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.fast_response(self.get_queryset())
\ No newline at end of file
@@ -0,0 +1,60 @@
+import json
+from django.core.management.base import BaseCommand
+from payments.services import ChargeGenerationService
+
+class Command(BaseCommand):
+    help = 'Начисление взносов за год всем участкам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help='Год начисления')
+        parser.add_argument(
+            '--tariff',
+            type=str,
+            choices=ChargeGenerationService.TARIFF_CHOICES,
+            default='flat',
+            help='Тариф: flat - с участка, per_sotka - за сотку'
+        )
+        parser.add_argument('--rate', type=str, required=True, help='Ставка (рубли, больше нуля)')
+        parser.add_argument(
+            '--overrides',
+            type=str,
+            help='JSON-файл с индивидуальными суммами {"номер участка": сумма}'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только расчет, без записи')
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Обновить сумму у уже существующих платежей года'
+        )
+
+    def handle(self, *args, **options):
+        overrides = None
+        if options['overrides']:
+            with open(options['overrides'], encoding='utf-8') as f:
+                overrides = json.load(f)
+
+        try:
+            result = ChargeGenerationService.generate_charges(
+                year=options['year'],
+                tariff=options['tariff'],
+                rate=options['rate'],
+                overrides=overrides,
+                dry_run=options['dry_run'],
+                overwrite=options['overwrite']
+            )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Ошибка начисления: {str(e)}'))
+            return
+
+        if result['skipped']:
+            self.stdout.write(
+                self.style.WARNING(f"Нет площади, пропущены участки: {', '.join(result['skipped'])}")
+            )
+        prefix = 'Предварительный расчет' if result['dry_run'] else 'Начисление выполнено'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}: участков {result['plots']}, новых {result['created']}, "
+                f"обновлено {result['updated']}, без изменений {result['unchanged']}, "
+                f"сумма {result['total_amount']}"
+            )
+        )
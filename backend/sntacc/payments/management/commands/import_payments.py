@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from payments.services import PaymentImportService
+
+class Command(BaseCommand):
+    help = 'Массовый импорт платежей из CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='Путь к файлу CSV или XLSX')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только проверить файл, без записи в базу'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], 'rb') as f:
+                report = PaymentImportService.import_payments(
+                    f,
+                    filename=options['file'],
+                    dry_run=options['dry_run']
+                )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Ошибка импорта: {str(e)}'))
+            return
+
+        for error in report['errors']:
+            self.stdout.write(
+                self.style.WARNING(f"Строка {error['row']}: {'; '.join(error['errors'])}")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Всего строк: {report['total']}, импортировано: {report['imported']} "
+                f"(новых: {report['created']}, обновлено: {report['updated']}), "
+                f"ошибок: {report['failed']}"
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from payments.models import Payment
+from payments.services import LedgerService
+
+class Command(BaseCommand):
+    help = 'Пересчет сальдо и давности задолженности всех участков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payments',
+            action='store_true',
+            help='Сначала пересчитать оплаченные суммы и статусы начислений по журналу поступлений'
+        )
+
+    def handle(self, *args, **options):
+        if options['payments']:
+            payments = LedgerService.recalculate(
+                Payment.objects.filter(transactions__isnull=False).values_list('id', flat=True).distinct()
+            )
+            self.stdout.write(f'Пересчитано начислений: {len(payments)}')
+
+        count = LedgerService.refresh_balances()
+        self.stdout.write(self.style.SUCCESS(f'Сальдо пересчитано для {count} участков'))
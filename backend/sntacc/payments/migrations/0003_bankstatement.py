@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_payment_payment_year_status_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Файл выписки')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('1c', '1С: Клиент-Банк')], max_length=10, verbose_name='Формат')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Загружено')),
+            ],
+            options={
+                'verbose_name': 'Банковская выписка',
+                'verbose_name_plural': 'Банковские выписки',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BankTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True, verbose_name='Отпечаток операции')),
+                ('number', models.CharField(blank=True, max_length=50, verbose_name='Номер документа')),
+                ('date', models.DateField(verbose_name='Дата операции')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('payer', models.CharField(blank=True, max_length=255, verbose_name='Плательщик')),
+                ('purpose', models.TextField(blank=True, verbose_name='Назначение платежа')),
+                ('match_score', models.FloatField(default=0, verbose_name='Оценка сопоставления')),
+                ('match_method', models.CharField(blank=True, max_length=50, verbose_name='Способ сопоставления')),
+                ('status', models.CharField(choices=[('unmatched', 'Не сопоставлена'), ('matched', 'Сопоставлена'), ('applied', 'Проведена'), ('ignored', 'Пропущена')], default='unmatched', max_length=20, verbose_name='Статус')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_transactions', to='payments.payment', verbose_name='Платеж')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='payments.bankstatement', verbose_name='Выписка')),
+            ],
+            options={
+                'verbose_name': 'Банковская операция',
+                'verbose_name_plural': 'Банковские операции',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['statement', 'status'], name='banktx_statement_status_idx')],
+            },
+        ),
+    ]
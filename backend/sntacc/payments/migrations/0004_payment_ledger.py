@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Оплаченные начисления получают поступление на полную сумму, по ним считается сальдо участков"""
+    Payment = apps.get_model('payments', 'Payment')
+    PaymentTransaction = apps.get_model('payments', 'PaymentTransaction')
+    PlotBalance = apps.get_model('payments', 'PlotBalance')
+
+    paid = Payment.objects.filter(status='paid')
+    PaymentTransaction.objects.bulk_create([
+        PaymentTransaction(
+            payment_id=payment.pk,
+            amount=payment.amount,
+            date=payment.date_paid or payment.updated_at.date(),
+            source='migration'
+        )
+        for payment in paid.only('id', 'amount', 'date_paid', 'updated_at')
+    ], batch_size=1000)
+    paid.update(paid_total=models.F('amount'))
+
+    balances = {}
+    for plot_id, amount, paid_total in Payment.objects.values_list('plot_id', 'amount', 'paid_total'):
+        balance = balances.setdefault(plot_id, PlotBalance(plot_id=plot_id))
+        balance.charged_total += amount
+        balance.paid_total += paid_total
+        balance.debt += max(amount - paid_total, 0)
+    PlotBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_bankstatement'),
+        ('plots', '0003_plotsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Оплачено'),
+        ),
+        migrations.CreateModel(
+            name='PlotBalance',
+            fields=[
+                ('plot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='plots.plot', verbose_name='Участок')),
+                ('charged_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Начислено')),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Оплачено')),
+                ('debt', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Задолженность')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Сальдо участка',
+                'verbose_name_plural': 'Сальдо участков',
+                'indexes': [models.Index(fields=['debt'], name='plotbalance_debt_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма')),
+                ('date', models.DateField(verbose_name='Дата поступления')),
+                ('source', models.CharField(choices=[('manual', 'Вручную'), ('bank', 'Банковская выписка'), ('import', 'Импорт'), ('migration', 'Перенос остатков')], default='manual', max_length=20, verbose_name='Источник')),
+                ('comment', models.CharField(blank=True, max_length=255, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('bank_transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entry', to='payments.banktransaction', verbose_name='Банковская операция')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='payments.payment', verbose_name='Начисление')),
+            ],
+            options={
+                'verbose_name': 'Поступление',
+                'verbose_name_plural': 'Поступления',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['payment', 'date'], name='paymenttx_payment_date_idx'), models.Index(fields=['date'], name='paymenttx_date_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
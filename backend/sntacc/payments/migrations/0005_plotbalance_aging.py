@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payment_ledger'),
+        ('plots', '0003_plotsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plotbalance',
+            name='as_of_year',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Год расчета давности'),
+        ),
+        migrations.AddField(
+            model_name='plotbalance',
+            name='debt_1_year',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Долг прошлого года'),
+        ),
+        migrations.AddField(
+            model_name='plotbalance',
+            name='debt_2_years_plus',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Долг 2 года и более'),
+        ),
+        migrations.AddField(
+            model_name='plotbalance',
+            name='debt_current',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Долг текущего года'),
+        ),
+        migrations.AddField(
+            model_name='plotbalance',
+            name='oldest_debt_year',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Самый ранний год долга'),
+        ),
+        migrations.AddIndex(
+            model_name='plotbalance',
+            index=models.Index(fields=['oldest_debt_year', 'debt'], name='plotbalance_aging_idx'),
+        ),
+    ]
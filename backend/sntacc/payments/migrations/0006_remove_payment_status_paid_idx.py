@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_plotbalance_aging'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_status_paid_idx',
+        ),
+    ]
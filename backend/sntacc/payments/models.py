@@ -1,6 +1,27 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from plots.models import Plot
 
+class PaymentQuerySet(models.QuerySet):
+    def delete(self):
+        """Удаление пакетом: сальдо участков пересчитывается один раз, а не на каждую строку"""
+        from .services import LedgerService
+        plot_ids = set(self.order_by().values_list('plot_id', flat=True).distinct())
+        with transaction.atomic():
+            result = super().delete()
+            LedgerService.refresh_balances(plot_ids)
+        return result
+
+class PaymentTransactionQuerySet(models.QuerySet):
+    def delete(self):
+        """Удаление поступлений пакетом: начисления пересчитываются одним запросом"""
+        from .services import LedgerService
+        payment_ids = set(self.order_by().values_list('payment_id', flat=True).distinct())
+        with transaction.atomic():
+            result = super().delete()
+            LedgerService.recalculate(payment_ids)
+        return result
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('paid', 'Оплачен'),
@@ -11,21 +32,179 @@ class Payment(models.Model):
     plot = models.ForeignKey(Plot, on_delete=models.CASCADE, verbose_name="Участок")
     year = models.IntegerField(verbose_name="Год")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
+    paid_total = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Оплачено")
     date_paid = models.DateField(verbose_name="Дата оплаты", null=True, blank=True)
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, 
                             default='not_paid', verbose_name="Статус")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = PaymentQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
         unique_together = ['plot', 'year']
         ordering = ['-year', 'plot__plot_number']
+        indexes = [
+            models.Index(fields=['year', 'status'], name='payment_year_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.plot.plot_number} - {self.year} - {self.amount} руб."
 
     @property
     def is_paid(self):
-        return self.status == 'paid'
\ No newline at end of file
+        return self.status == 'paid'
+
+    @property
+    def debt(self):
+        return max(self.amount - self.paid_total, 0)
+
+class PaymentTransaction(models.Model):
+    """Поступление по начислению: одно начисление может оплачиваться частями"""
+    SOURCE_CHOICES = [
+        ('manual', 'Вручную'),
+        ('bank', 'Банковская выписка'),
+        ('import', 'Импорт'),
+        ('migration', 'Перенос остатков'),
+    ]
+
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='transactions',
+        verbose_name="Начисление"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
+    date = models.DateField(verbose_name="Дата поступления")
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual', verbose_name="Источник")
+    bank_transaction = models.OneToOneField(
+        'BankTransaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ledger_entry',
+        verbose_name="Банковская операция"
+    )
+    comment = models.CharField(max_length=255, blank=True, verbose_name="Комментарий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    objects = PaymentTransactionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Поступление"
+        verbose_name_plural = "Поступления"
+        ordering = ['date', 'id']
+        indexes = [
+            models.Index(fields=['payment', 'date'], name='paymenttx_payment_date_idx'),
+            models.Index(fields=['date'], name='paymenttx_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.payment} - {self.amount} руб. ({self.date})"
+
+class PlotBalance(models.Model):
+    """
+    Сальдо участка по всем начислениям с разбивкой долга по давности
+    (пересчитывается LedgerService). Корзины считаются относительно
+    as_of_year и пересобираются при смене года.
+    """
+    plot = models.OneToOneField(
+        Plot,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance',
+        verbose_name="Участок"
+    )
+    charged_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Начислено")
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Оплачено")
+    debt = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Задолженность")
+    debt_current = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Долг текущего года")
+    debt_1_year = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Долг прошлого года")
+    debt_2_years_plus = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name="Долг 2 года и более"
+    )
+    oldest_debt_year = models.IntegerField(null=True, blank=True, verbose_name="Самый ранний год долга")
+    as_of_year = models.IntegerField(null=True, blank=True, verbose_name="Год расчета давности")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Сальдо участка"
+        verbose_name_plural = "Сальдо участков"
+        indexes = [
+            models.Index(fields=['debt'], name='plotbalance_debt_idx'),
+            models.Index(fields=['oldest_debt_year', 'debt'], name='plotbalance_aging_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plot.plot_number}: долг {self.debt} руб."
+
+class BankStatement(models.Model):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('1c', '1С: Клиент-Банк'),
+    ]
+
+    name = models.CharField(max_length=255, verbose_name="Файл выписки")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Формат")
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Загружено"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
+
+    class Meta:
+        verbose_name = "Банковская выписка"
+        verbose_name_plural = "Банковские выписки"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class BankTransaction(models.Model):
+    STATUS_CHOICES = [
+        ('unmatched', 'Не сопоставлена'),
+        ('matched', 'Сопоставлена'),
+        ('applied', 'Проведена'),
+        ('ignored', 'Пропущена'),
+    ]
+
+    statement = models.ForeignKey(
+        BankStatement,
+        on_delete=models.CASCADE,
+        related_name='transactions',
+        verbose_name="Выписка"
+    )
+    fingerprint = models.CharField(max_length=64, unique=True, verbose_name="Отпечаток операции")
+    number = models.CharField(max_length=50, blank=True, verbose_name="Номер документа")
+    date = models.DateField(verbose_name="Дата операции")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    payer = models.CharField(max_length=255, blank=True, verbose_name="Плательщик")
+    purpose = models.TextField(blank=True, verbose_name="Назначение платежа")
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='bank_transactions',
+        verbose_name="Платеж"
+    )
+    match_score = models.FloatField(default=0, verbose_name="Оценка сопоставления")
+    match_method = models.CharField(max_length=50, blank=True, verbose_name="Способ сопоставления")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='unmatched', verbose_name="Статус")
+
+    class Meta:
+        verbose_name = "Банковская операция"
+        verbose_name_plural = "Банковские операции"
+        ordering = ['date', 'id']
+        indexes = [
+            models.Index(fields=['statement', 'status'], name='banktx_statement_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.amount} руб. - {self.payer}"
@@ -0,0 +1,319 @@
+import hashlib
+import io
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from django.db import transaction
+
+from plots.models import Plot, current_owner_prefetch
+from plots.search import normalize, similarity, trigrams
+from .models import BankStatement, BankTransaction, Payment, PaymentTransaction
+from .services import LedgerService
+
+PLOT_NUMBER_RE = re.compile(
+    r'(?:участ\w*|уч\.?|уч-к|№)\s*№?\s*(\d+[а-яa-z]?(?:/\d+)?)\b',
+    re.IGNORECASE
+)
+YEAR_RE = re.compile(r'\b(20\d{2})\s*(?:г\.?|год\w*)?', re.IGNORECASE)
+
+
+class BankStatementParser:
+    """Разбор выписок: CSV и формат обмена 1С:Клиент-Банк"""
+
+    CSV_ALIASES = {
+        'number': ['number', 'номер', 'номер документа', '№ документа'],
+        'date': ['date', 'дата', 'дата операции', 'дата проводки'],
+        'amount': ['amount', 'сумма', 'сумма по кредиту', 'кредит', 'поступление'],
+        'payer': ['payer', 'плательщик', 'контрагент', 'наименование плательщика'],
+        'purpose': ['purpose', 'назначение платежа', 'назначение'],
+    }
+
+    @staticmethod
+    def decode(content):
+        if isinstance(content, str):
+            return content
+        for encoding in ('utf-8-sig', 'cp1251'):
+            try:
+                return content.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        return content.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def detect_format(text):
+        return '1c' if text.lstrip().startswith('1CClientBankExchange') else 'csv'
+
+    @staticmethod
+    def parse(file):
+        """Возвращает (формат, список операций-словарей)"""
+        text = BankStatementParser.decode(file.read())
+        statement_format = BankStatementParser.detect_format(text)
+        if statement_format == '1c':
+            return statement_format, BankStatementParser.parse_1c(text)
+        return statement_format, BankStatementParser.parse_csv(text)
+
+    @staticmethod
+    def parse_amount(value):
+        try:
+            cleaned = re.sub(r'[\s\xa0]', '', str(value)).replace(',', '.')
+            return Decimal(cleaned).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            return None
+
+    @staticmethod
+    def parse_date(value):
+        for date_format in ('%d.%m.%Y', '%Y-%m-%d', '%d.%m.%y', '%d/%m/%Y'):
+            try:
+                return datetime.strptime(str(value).strip()[:10], date_format).date()
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def parse_1c(text):
+        """
+        Формат 1CClientBankExchange: строки "Ключ=Значение", документы между
+        "СекцияДокумент=..." и "КонецДокумента". Берутся только поступления на
+        расчетный счет из заголовка (если он указан).
+        """
+        account = None
+        documents = []
+        current = None
+        for line in text.splitlines():
+            key, _, value = line.strip().partition('=')
+            if key == 'РасчСчет' and current is None:
+                account = value.strip()
+            elif key == 'СекцияДокумент':
+                current = {}
+            elif key == 'КонецДокумента':
+                if current is not None:
+                    documents.append(current)
+                current = None
+            elif current is not None and key:
+                current[key] = value.strip()
+
+        rows = []
+        for document in documents:
+            if account and document.get('ПолучательСчет') and document['ПолучательСчет'] != account:
+                continue
+            rows.append({
+                'number': document.get('Номер', ''),
+                'date': BankStatementParser.parse_date(
+                    document.get('ДатаПоступило') or document.get('Дата', '')
+                ),
+                'amount': BankStatementParser.parse_amount(document.get('Сумма', '')),
+                'payer': document.get('Плательщик1') or document.get('Плательщик', ''),
+                'purpose': document.get('НазначениеПлатежа', ''),
+            })
+        return [row for row in rows if row['date'] and row['amount']]
+
+    @staticmethod
+    def parse_csv(text):
+        df = pd.read_csv(io.StringIO(text), dtype=str, sep=None, engine='python').fillna('')
+        aliases = {
+            alias: column
+            for column, names in BankStatementParser.CSV_ALIASES.items()
+            for alias in names
+        }
+        df = df.rename(columns=lambda c: aliases.get(str(c).strip().lower(), str(c).strip().lower()))
+        df = df.loc[:, ~df.columns.duplicated()]
+        for column in BankStatementParser.CSV_ALIASES:
+            if column not in df.columns:
+                df[column] = ''
+
+        rows = []
+        for row in df.itertuples(index=False):
+            amount = BankStatementParser.parse_amount(row.amount)
+            date = BankStatementParser.parse_date(row.date)
+            # Списания и пустые строки пропускаем
+            if not date or not amount or amount <= 0:
+                continue
+            rows.append({
+                'number': str(row.number).strip(),
+                'date': date,
+                'amount': amount,
+                'payer': str(row.payer).strip(),
+                'purpose': str(row.purpose).strip(),
+            })
+        return rows
+
+    @staticmethod
+    def fingerprint(row):
+        key = '|'.join([
+            str(row['date']), str(row['amount']), row['number'],
+            normalize(row['payer']), normalize(row['purpose'])
+        ])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class PaymentMatcher:
+    """
+    Сопоставление операций с неоплаченными платежами.
+
+    Индексы строятся один раз на выписку: номер участка -> платежи и
+    триграммы ФИО текущих владельцев -> участки, поэтому сопоставление
+    операции - несколько обращений к словарям, а не запросы к базе.
+    """
+    NAME_THRESHOLD = 0.6
+
+    def __init__(self):
+        self.payments_by_plot = defaultdict(list)
+        for payment in Payment.objects.exclude(status='paid').order_by('year'):
+            self.payments_by_plot[payment.plot_id].append(payment)
+
+        self.plot_ids = {}
+        self.owner_names = {}
+        self.name_index = defaultdict(set)
+        for plot in Plot.objects.only('id', 'plot_number').prefetch_related(current_owner_prefetch()):
+            self.plot_ids[normalize(plot.plot_number)] = plot.id
+            owner = plot.current_owner
+            if owner:
+                name = normalize(owner.full_name)
+                self.owner_names[plot.id] = name
+                for trigram in trigrams(name):
+                    self.name_index[trigram].add(plot.id)
+
+    def plots_by_name(self, payer):
+        payer = normalize(payer)
+        if not payer:
+            return []
+        candidates = defaultdict(int)
+        for trigram in trigrams(payer):
+            for plot_id in self.name_index.get(trigram, ()):
+                candidates[plot_id] += 1
+        scored = []
+        for plot_id in candidates:
+            score = max(
+                similarity(self.owner_names[plot_id], payer),
+                similarity(payer, self.owner_names[plot_id])
+            )
+            if score >= self.NAME_THRESHOLD:
+                scored.append((score, plot_id))
+        return sorted(scored, reverse=True)
+
+    def choose_payment(self, plot_id, amount, years):
+        """Платеж участка: год из назначения, затем совпадение суммы, затем самый старый"""
+        payments = self.payments_by_plot.get(plot_id)
+        if not payments:
+            return None, False
+        # Сумма сравнивается с остатком долга: начисление могло быть оплачено частично
+        for payment in payments:
+            if payment.year in years:
+                return payment, payment.debt == amount
+        for payment in payments:
+            if payment.debt == amount:
+                return payment, True
+        return payments[0], False
+
+    def match(self, row):
+        """Возвращает (payment, score, method) для операции"""
+        purpose = row['purpose']
+        years = {int(year) for year in YEAR_RE.findall(purpose)}
+        name_matches = self.plots_by_name(row['payer'])
+        name_plots = {plot_id for _, plot_id in name_matches}
+
+        for plot_number in PLOT_NUMBER_RE.findall(purpose):
+            plot_id = self.plot_ids.get(normalize(plot_number))
+            payment, amount_match = self.choose_payment(plot_id, row['amount'], years)
+            if payment:
+                score = 0.6 + (0.3 if amount_match else 0) + (0.1 if plot_id in name_plots else 0)
+                return payment, round(score, 2), 'plot_number'
+
+        for name_score, plot_id in name_matches:
+            payment, amount_match = self.choose_payment(plot_id, row['amount'], years)
+            if payment:
+                score = 0.5 * name_score + (0.3 if amount_match else 0)
+                return payment, round(score, 2), 'owner_name'
+
+        return None, 0, ''
+
+
+class ReconciliationService:
+    # Операции с оценкой ниже порога остаются на ручную проверку
+    AUTO_MATCH_SCORE = 0.6
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def upload_statement(file, name='', user=None):
+        """Загрузка выписки: разбор, отсев уже загруженных операций и сопоставление"""
+        statement_format, rows = BankStatementParser.parse(file)
+        for row in rows:
+            row['fingerprint'] = BankStatementParser.fingerprint(row)
+
+        known = set(BankTransaction.objects.filter(
+            fingerprint__in=[row['fingerprint'] for row in rows]
+        ).values_list('fingerprint', flat=True))
+
+        matcher = PaymentMatcher()
+        transactions = []
+        seen = set()
+        for row in rows:
+            if row['fingerprint'] in known or row['fingerprint'] in seen:
+                continue
+            seen.add(row['fingerprint'])
+            payment, score, method = matcher.match(row)
+            transactions.append(BankTransaction(
+                fingerprint=row['fingerprint'],
+                number=row['number'][:50],
+                date=row['date'],
+                amount=row['amount'],
+                payer=row['payer'][:255],
+                purpose=row['purpose'],
+                payment=payment,
+                match_score=score,
+                match_method=method,
+                status='matched' if payment and score >= ReconciliationService.AUTO_MATCH_SCORE else 'unmatched'
+            ))
+
+        with transaction.atomic():
+            statement = BankStatement.objects.create(
+                name=name or getattr(file, 'name', '') or 'statement',
+                format=statement_format,
+                uploaded_by=user
+            )
+            for bank_transaction in transactions:
+                bank_transaction.statement = statement
+            BankTransaction.objects.bulk_create(transactions, batch_size=ReconciliationService.BATCH_SIZE)
+
+        return statement, {
+            'total': len(rows),
+            'new': len(transactions),
+            'duplicates': len(rows) - len(transactions),
+            'matched': sum(1 for t in transactions if t.status == 'matched'),
+        }
+
+    @staticmethod
+    def apply(statement, transaction_ids=None):
+        """
+        Проведение подтвержденных операций одним пакетом.
+
+        transaction_ids - подтвержденные операции (по умолчанию все
+        сопоставленные). Каждая операция становится поступлением в журнале
+        (PaymentTransaction), статусы начислений пересчитываются по сумме
+        всех поступлений: полная оплата - 'paid', меньше начисления - 'partial'.
+        """
+        queryset = statement.transactions.filter(status='matched', payment__isnull=False)
+        if transaction_ids is not None:
+            queryset = queryset.filter(id__in=transaction_ids)
+        transactions = list(queryset)
+
+        with transaction.atomic():
+            payments = LedgerService.add_transactions(
+                PaymentTransaction(
+                    payment_id=bank_transaction.payment_id,
+                    amount=bank_transaction.amount,
+                    date=bank_transaction.date,
+                    source='bank',
+                    bank_transaction=bank_transaction,
+                    comment=bank_transaction.payer[:255]
+                )
+                for bank_transaction in transactions
+            )
+            BankTransaction.objects.filter(
+                id__in=[t.id for t in transactions]
+            ).update(status='applied')
+
+        return {'applied': len(transactions), 'payments': len(payments)}
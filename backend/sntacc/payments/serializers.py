@@ -1,19 +1,37 @@
 from rest_framework import serializers
-from .models import Payment
+from sntacc.fastlist import RowMapper, as_date, as_datetime, as_decimal
+from sntacc.selection import SelectableFieldsMixin
+from plots.serializers import current_owners_by_plot
+from .models import Payment, PaymentTransaction, PlotBalance, BankStatement, BankTransaction
 from plots.models import Plot
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentTransactionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PaymentTransaction
+        fields = ['id', 'payment', 'amount', 'date', 'source', 'bank_transaction', 'comment', 'created_at']
+        read_only_fields = ['payment', 'bank_transaction', 'created_at']
+        extra_kwargs = {'date': {'required': False}}
+
+class PaymentSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     plot_id = serializers.PrimaryKeyRelatedField(
         queryset=Plot.objects.all(), 
         source='plot', 
         write_only=True
     )
     plot = serializers.SerializerMethodField(read_only=True)
+    transactions = PaymentTransactionSerializer(many=True, read_only=True)
     
     class Meta:
         model = Payment
-        fields = ['id', 'plot', 'plot_id', 'year', 'amount', 'date_paid', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = [
+            'id', 'plot', 'plot_id', 'year', 'amount', 'paid_total', 'debt',
+            'date_paid', 'status', 'created_at', 'updated_at', 'transactions'
+        ]
+        # Статус считается по журналу поступлений (LedgerService.recalculate)
+        read_only_fields = ['paid_total', 'debt', 'status', 'created_at', 'updated_at']
+        # ?expand=transactions - поступления по платежу из журнала
+        expandable_fields = {'transactions': 'transactions'}
+        field_dependencies = {'plot': ['plot'], 'debt': ['amount', 'paid_total']}
     
     def get_plot(self, obj):
         if obj.plot:
@@ -30,6 +48,49 @@ class PaymentSerializer(serializers.ModelSerializer):
             }
         return None
 
+class FastPaymentListSerializer:
+    """Список платежей из values_list() (формат PaymentSerializer без раскрытий)"""
+    expandable = ()
+    mapper = RowMapper([
+        ('id', 'id', None),
+        ('plot', 'plot_id', None),
+        ('year', 'year', None),
+        ('amount', 'amount', None),
+        ('paid_total', 'paid_total', None),
+        ('debt', 'id', None),
+        ('date_paid', 'date_paid', as_date),
+        ('status', 'status', None),
+        ('created_at', 'created_at', as_datetime),
+        ('updated_at', 'updated_at', as_datetime),
+    ])
+    plot_mapper = RowMapper([
+        ('id', 'plot_id', None),
+        ('plot_number', 'plot__plot_number', None),
+        ('address', 'plot__address', None),
+    ])
+
+    @classmethod
+    def serialize(cls, queryset, fields=None, expand=()):
+        if fields is None or 'plot' in fields:
+            owners = current_owners_by_plot(queryset.order_by().values('plot_id'))
+        else:
+            owners = {}
+        rows = cls.mapper.rows(queryset, *cls.plot_mapper.fields)
+        width = len(cls.mapper.fields)
+        data = []
+        for row in rows:
+            item = cls.mapper(row)
+            plot = cls.plot_mapper(row[width:])
+            plot['current_owner'] = owners.get(plot['id'])
+            item['plot'] = plot
+            amount, paid_total = item['amount'], item['paid_total']
+            # debt - свойство модели, DRF отдает его числом
+            item['debt'] = float(max(amount - paid_total, 0))
+            item['amount'] = as_decimal(amount)
+            item['paid_total'] = as_decimal(paid_total)
+            data.append(item)
+        return data
+
 class PaymentCreateSerializer(serializers.ModelSerializer):
     plot_id = serializers.PrimaryKeyRelatedField(
         queryset=Plot.objects.all(), 
@@ -49,4 +110,56 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         if Payment.objects.filter(plot=plot, year=year).exists():
             raise serializers.ValidationError(f"Платеж за {year} год для участка {plot.plot_number} уже существует")
         
-        return data
\ No newline at end of file
+        return data
+
+class PlotBalanceSerializer(serializers.ModelSerializer):
+    plot_number = serializers.CharField(source='plot.plot_number', read_only=True)
+    owner = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PlotBalance
+        fields = [
+            'plot', 'plot_number', 'owner', 'charged_total', 'paid_total', 'debt',
+            'debt_current', 'debt_1_year', 'debt_2_years_plus', 'oldest_debt_year',
+            'as_of_year', 'updated_at'
+        ]
+
+    def get_owner(self, obj):
+        owner = obj.plot.current_owner
+        if owner:
+            return {
+                'id': owner.id,
+                'full_name': owner.full_name,
+                'phone': owner.phone,
+                'email': owner.email
+            }
+        return None
+
+class BankTransactionSerializer(serializers.ModelSerializer):
+    plot_number = serializers.CharField(source='payment.plot.plot_number', read_only=True, default=None)
+    payment_year = serializers.IntegerField(source='payment.year', read_only=True, default=None)
+
+    class Meta:
+        model = BankTransaction
+        fields = [
+            'id', 'statement', 'number', 'date', 'amount', 'payer', 'purpose',
+            'payment', 'plot_number', 'payment_year', 'match_score', 'match_method', 'status'
+        ]
+        read_only_fields = [
+            'statement', 'number', 'date', 'amount', 'payer', 'purpose',
+            'match_score', 'match_method'
+        ]
+
+class BankStatementSerializer(serializers.ModelSerializer):
+    uploaded_by_name = serializers.CharField(source='uploaded_by.username', read_only=True, default=None)
+    transactions_count = serializers.IntegerField(read_only=True, default=0)
+    matched_count = serializers.IntegerField(read_only=True, default=0)
+    applied_count = serializers.IntegerField(read_only=True, default=0)
+
+    class Meta:
+        model = BankStatement
+        fields = [
+            'id', 'name', 'format', 'uploaded_by', 'uploaded_by_name', 'created_at',
+            'transactions_count', 'matched_count', 'applied_count'
+        ]
+        read_only_fields = ['format', 'uploaded_by', 'created_at']
@@ -0,0 +1,565 @@
+import io
+import pandas as pd
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Payment, PaymentTransaction, PlotBalance
+from plots.models import Plot, current_owner_prefetch
+
+class LedgerService:
+    """
+    Журнал поступлений по начислениям.
+
+    Поступления добавляются пакетами; после вставки одним агрегирующим
+    запросом пересчитываются paid_total/status/date_paid затронутых
+    начислений и сальдо их участков (PlotBalance), так что отчеты читают
+    готовые суммы, а не складывают поступления на каждый запрос.
+    """
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def status_for(amount, paid_total):
+        if amount > 0 and paid_total >= amount:
+            return 'paid'
+        if paid_total > 0:
+            return 'partial'
+        return 'not_paid'
+
+    @staticmethod
+    def add_transactions(entries):
+        """
+        Запись поступлений.
+
+        entries - несохраненные PaymentTransaction. Возвращает список
+        пересчитанных начислений.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        with transaction.atomic():
+            PaymentTransaction.objects.bulk_create(entries, batch_size=LedgerService.BATCH_SIZE)
+            return LedgerService.recalculate({entry.payment_id for entry in entries})
+
+    @staticmethod
+    def add_payment(payment, amount, date=None, source='manual', comment=''):
+        """Одно поступление по начислению"""
+        amount = Decimal(str(amount))
+        if amount <= 0:
+            raise Exception("Сумма поступления должна быть больше нуля")
+        LedgerService.add_transactions([PaymentTransaction(
+            payment=payment,
+            amount=amount,
+            date=date or timezone.localdate(),
+            source=source,
+            comment=comment
+        )])
+        payment.refresh_from_db()
+        return payment
+
+    @staticmethod
+    def settle(payment_ids, source='manual'):
+        """
+        Доводит журнал до статуса, выставленного вручную или импортом: для
+        начислений со статусом 'paid' и неполной суммой поступлений
+        записывается поступление на остаток.
+        """
+        return LedgerService.pay_remainder(
+            Payment.objects.filter(pk__in=list(payment_ids), status='paid'), source
+        )
+
+    @staticmethod
+    def pay_remainder(payments, source='manual'):
+        """Поступление на непогашенный остаток начислений queryset payments"""
+        payments = payments.filter(
+            paid_total__lt=F('amount')
+        ).only('id', 'amount', 'paid_total', 'date_paid')
+        return LedgerService.add_transactions(
+            PaymentTransaction(
+                payment_id=payment.pk,
+                amount=payment.amount - payment.paid_total,
+                date=payment.date_paid or timezone.localdate(),
+                source=source
+            )
+            for payment in payments
+        )
+
+    @staticmethod
+    def recalculate(payment_ids):
+        """Пересчет paid_total, статуса и даты оплаты начислений по журналу"""
+        payment_ids = list(payment_ids)
+        totals = {
+            row['payment_id']: row
+            for row in PaymentTransaction.objects.filter(payment_id__in=payment_ids)
+            .values('payment_id')
+            .annotate(total=Sum('amount'), last_date=Max('date'))
+        }
+
+        payments = list(Payment.objects.filter(pk__in=payment_ids).only(
+            'id', 'plot_id', 'year', 'amount', 'paid_total', 'status', 'date_paid'
+        ))
+        # bulk_update не выставляет auto_now
+        now = timezone.now()
+        for payment in payments:
+            payment.updated_at = now
+            row = totals.get(payment.pk)
+            payment.paid_total = row['total'] if row else Decimal('0')
+            payment.status = LedgerService.status_for(payment.amount, payment.paid_total)
+            payment.date_paid = row['last_date'] if row else None
+
+        with transaction.atomic():
+            Payment.objects.bulk_update(
+                payments, ['paid_total', 'status', 'date_paid', 'updated_at'],
+                batch_size=LedgerService.BATCH_SIZE
+            )
+            LedgerService.refresh_balances({payment.plot_id for payment in payments})
+        return payments
+
+    @staticmethod
+    def refresh_balances(plot_ids=None):
+        """
+        Пересчет сальдо и давности долга участков (None - всех) одним
+        агрегирующим запросом по начислениям.
+        """
+        payments = Payment.objects.all()
+        plots = Plot.objects.all()
+        if plot_ids is not None:
+            plot_ids = list(plot_ids)
+            payments = payments.filter(plot_id__in=plot_ids)
+            plots = plots.filter(pk__in=plot_ids)
+
+        as_of_year = timezone.localdate().year
+        money = DecimalField(max_digits=12, decimal_places=2)
+        zero = Value(Decimal('0'), output_field=money)
+
+        def debt_sum(**year_filter):
+            return Coalesce(Sum(Case(
+                When(amount__gt=F('paid_total'), then=F('amount') - F('paid_total'), **year_filter),
+                default=zero,
+                output_field=money
+            )), zero)
+
+        totals = {
+            row['plot_id']: row
+            for row in payments.values('plot_id').annotate(
+                charged=Sum('amount'),
+                paid=Sum('paid_total'),
+                debt=debt_sum(),
+                debt_current=debt_sum(year__gte=as_of_year),
+                debt_1_year=debt_sum(year=as_of_year - 1),
+                debt_2_years_plus=debt_sum(year__lte=as_of_year - 2),
+                oldest_debt_year=Min(Case(When(amount__gt=F('paid_total'), then=F('year'))))
+            )
+        }
+
+        balances = []
+        for plot_id in plots.values_list('id', flat=True):
+            row = totals.get(plot_id, {})
+            balances.append(PlotBalance(
+                plot_id=plot_id,
+                charged_total=row.get('charged') or 0,
+                paid_total=row.get('paid') or 0,
+                debt=row.get('debt') or 0,
+                debt_current=row.get('debt_current') or 0,
+                debt_1_year=row.get('debt_1_year') or 0,
+                debt_2_years_plus=row.get('debt_2_years_plus') or 0,
+                oldest_debt_year=row.get('oldest_debt_year'),
+                as_of_year=as_of_year
+            ))
+        PlotBalance.objects.bulk_create(
+            balances,
+            batch_size=LedgerService.BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['plot'],
+            update_fields=[
+                'charged_total', 'paid_total', 'debt', 'debt_current', 'debt_1_year',
+                'debt_2_years_plus', 'oldest_debt_year', 'as_of_year', 'updated_at'
+            ]
+        )
+        return len(balances)
+
+    @staticmethod
+    def ensure_balances_current():
+        """
+        Пересборка сальдо, если давность считалась в прошлом году (или еще не
+        считалась): корзины сдвигаются при смене года.
+        """
+        as_of_year = timezone.localdate().year
+        if PlotBalance.objects.exclude(as_of_year=as_of_year).exists():
+            return LedgerService.refresh_balances()
+        return 0
+
+    @staticmethod
+    def aging(min_years=None, min_debt=None):
+        """
+        Должники по давности долга.
+
+        min_years - долг не моложе N лет (oldest_debt_year <= текущий - N),
+        min_debt - минимальная сумма долга. Возвращает (сводка, queryset сальдо).
+        """
+        LedgerService.ensure_balances_current()
+        balances = PlotBalance.objects.filter(debt__gt=0)
+        if min_years is not None:
+            balances = balances.filter(oldest_debt_year__lte=timezone.localdate().year - int(min_years))
+        if min_debt is not None:
+            balances = balances.filter(debt__gte=Decimal(str(min_debt)))
+
+        summary = balances.aggregate(
+            plots=Count('plot'),
+            debt=Coalesce(Sum('debt'), Value(Decimal('0'))),
+            debt_current=Coalesce(Sum('debt_current'), Value(Decimal('0'))),
+            debt_1_year=Coalesce(Sum('debt_1_year'), Value(Decimal('0'))),
+            debt_2_years_plus=Coalesce(Sum('debt_2_years_plus'), Value(Decimal('0')))
+        )
+        balances = balances.select_related('plot').prefetch_related(
+            current_owner_prefetch('plot__plotowner_set')
+        ).order_by('-debt', 'plot__plot_number')
+        return summary, balances
+
+class PaymentImportService:
+    """
+    Массовый импорт платежей из CSV/XLSX.
+
+    Файл проверяется целиком средствами pandas (без запроса на строку),
+    участки ищутся по plot_number одним запросом, платежи записываются
+    пакетами через bulk_create с обновлением по (plot, year).
+
+    Статус начисления определяет журнал поступлений: "оплачен" в файле
+    записывает поступление на остаток, прочие статусы поступлений не
+    отменяют. Строки, где статус файла и журнала расходятся, попадают
+    в отчет (status_mismatches).
+    """
+    BATCH_SIZE = 1000
+    MIN_YEAR = 1990
+    MAX_YEAR = 2100
+
+    # Допустимые заголовки колонок (выгрузки банков и таблицы)
+    COLUMN_ALIASES = {
+        'plot_number': ['plot_number', 'plot', 'участок', 'номер участка', '№ участка'],
+        'year': ['year', 'год'],
+        'amount': ['amount', 'сумма', 'сумма платежа'],
+        'date_paid': ['date_paid', 'дата оплаты', 'дата платежа', 'дата'],
+        'status': ['status', 'статус'],
+    }
+    REQUIRED_COLUMNS = ['plot_number', 'year', 'amount']
+
+    @staticmethod
+    def read_file(file, filename=None):
+        """Чтение CSV или XLSX в DataFrame со строковыми значениями"""
+        filename = (filename or getattr(file, 'name', '') or '').lower()
+
+        if filename.endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(file, dtype=str)
+        else:
+            content = file.read()
+            if isinstance(content, bytes):
+                # Выгрузки банков часто в cp1251
+                try:
+                    content = content.decode('utf-8-sig')
+                except UnicodeDecodeError:
+                    content = content.decode('cp1251')
+            df = pd.read_csv(io.StringIO(content), dtype=str, sep=None, engine='python')
+
+        return PaymentImportService._normalize_columns(df)
+
+    @staticmethod
+    def _normalize_columns(df):
+        aliases = {
+            alias: column
+            for column, names in PaymentImportService.COLUMN_ALIASES.items()
+            for alias in names
+        }
+        df = df.rename(columns=lambda c: aliases.get(str(c).strip().lower(), str(c).strip().lower()))
+        df = df.loc[:, ~df.columns.duplicated()]
+        for column in PaymentImportService.COLUMN_ALIASES:
+            if column not in df.columns:
+                df[column] = None
+        df = df.fillna('')
+        return df.apply(lambda column: column.astype(str).str.strip())
+
+    @staticmethod
+    def validate(df):
+        """
+        Векторная проверка строк.
+
+        Возвращает (valid, errors): DataFrame корректных строк с колонками
+        plot_id/year/amount/date_paid/status и список ошибок по строкам.
+        """
+        status_labels = {}
+        for code, label in Payment.PAYMENT_STATUS_CHOICES:
+            status_labels[code] = code
+            status_labels[label.lower()] = code
+
+        # Номер строки в файле: заголовок - первая строка
+        row_numbers = pd.Series(df.index + 2, index=df.index)
+
+        plot_numbers = df['plot_number']
+        plot_map = dict(
+            Plot.objects.filter(plot_number__in=plot_numbers.unique().tolist())
+            .values_list('plot_number', 'id')
+        )
+        plot_id = plot_numbers.map(plot_map)
+
+        year = pd.to_numeric(df['year'], errors='coerce')
+        amount = pd.to_numeric(
+            df['amount'].str.replace(' ', '').str.replace('\xa0', '').str.replace(',', '.'),
+            errors='coerce'
+        )
+        date_paid = pd.to_datetime(df['date_paid'], errors='coerce', dayfirst=True)
+        status = df['status'].str.lower().map(status_labels)
+        # Без статуса: есть дата оплаты - оплачен, иначе не оплачен
+        status = status.where(df['status'] != '', date_paid.notna().map({True: 'paid', False: 'not_paid'}))
+
+        checks = [
+            (plot_numbers == '', 'Не указан номер участка'),
+            ((plot_numbers != '') & plot_id.isna(), 'Участок не найден'),
+            (year.isna() | (year % 1 != 0) | (year < PaymentImportService.MIN_YEAR)
+             | (year > PaymentImportService.MAX_YEAR), 'Некорректный год'),
+            (amount.isna() | (amount < 0), 'Некорректная сумма'),
+            ((df['date_paid'] != '') & date_paid.isna(), 'Некорректная дата оплаты'),
+            (status.isna(), 'Неизвестный статус'),
+            (df.duplicated(['plot_number', 'year'], keep=False) & (plot_numbers != ''),
+             'Повтор участка и года в файле'),
+        ]
+
+        invalid = pd.Series(False, index=df.index)
+        for mask, _ in checks:
+            invalid |= mask
+
+        errors = []
+        for index in df.index[invalid]:
+            errors.append({
+                'row': int(row_numbers[index]),
+                'plot_number': plot_numbers[index],
+                'errors': [message for mask, message in checks if mask[index]],
+            })
+
+        valid = pd.DataFrame({
+            'plot_id': plot_id,
+            'year': year,
+            'amount': amount.round(2),
+            'date_paid': date_paid,
+            'status': status,
+        })[~invalid]
+
+        return valid, errors
+
+    @staticmethod
+    def import_payments(file, filename=None, dry_run=False):
+        """Импорт платежей с отчетом по строкам"""
+        df = PaymentImportService.read_file(file, filename)
+
+        missing = [
+            column for column in PaymentImportService.REQUIRED_COLUMNS
+            if (df[column] == '').all()
+        ]
+        if len(df) and missing:
+            raise Exception(f"В файле нет колонок: {', '.join(missing)}")
+
+        valid, errors = PaymentImportService.validate(df)
+
+        payments = [
+            Payment(
+                plot_id=int(row.plot_id),
+                year=int(row.year),
+                amount=Decimal(f'{row.amount:.2f}'),
+                date_paid=row.date_paid.date() if pd.notna(row.date_paid) else None,
+                status=row.status,
+            )
+            for row in valid.itertuples(index=False)
+        ]
+
+        existing = set()
+        if payments:
+            existing = set(Payment.objects.filter(
+                plot_id__in={p.plot_id for p in payments},
+                year__in={p.year for p in payments}
+            ).values_list('plot_id', 'year'))
+        updated = sum(1 for p in payments if (p.plot_id, p.year) in existing)
+
+        mismatches = []
+        if not dry_run and payments:
+            with transaction.atomic():
+                # Статус не пишется из файла: его определяет журнал поступлений
+                Payment.objects.bulk_create(
+                    payments,
+                    batch_size=PaymentImportService.BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['plot', 'year'],
+                    update_fields=['amount', 'date_paid', 'updated_at']
+                )
+                imported = {
+                    (plot_id, year): payment_id
+                    for payment_id, plot_id, year in Payment.objects.filter(
+                        plot_id__in={p.plot_id for p in payments},
+                        year__in={p.year for p in payments}
+                    ).values_list('id', 'plot_id', 'year')
+                }
+                file_statuses = {imported[(p.plot_id, p.year)]: p.status for p in payments}
+                # "Оплачен" в файле - поступление на остаток; поступления, уже
+                # записанные в журнал (банк, вручную), импорт не отменяет
+                LedgerService.pay_remainder(
+                    Payment.objects.filter(pk__in=[
+                        payment_id for payment_id, file_status in file_statuses.items() if file_status == 'paid'
+                    ]),
+                    source='import'
+                )
+                for payment in LedgerService.recalculate(file_statuses):
+                    if payment.status != file_statuses[payment.pk]:
+                        mismatches.append({
+                            'plot_id': payment.plot_id,
+                            'year': payment.year,
+                            'status': file_statuses[payment.pk],
+                            'ledger_status': payment.status,
+                        })
+
+        return {
+            'total': len(df),
+            'imported': len(payments),
+            'created': len(payments) - updated,
+            'updated': updated,
+            'failed': len(errors),
+            'errors': errors,
+            # Статус в файле расходится с поступлениями в журнале
+            'status_mismatches': mismatches,
+            'dry_run': dry_run,
+        }
+
+
+class ChargeGenerationService:
+    """
+    Начисление взносов за год всем участкам.
+
+    Суммы считаются в Decimal за один проход по участкам (округление до
+    копеек по правилам бухгалтерии, ROUND_HALF_UP), платежи вставляются
+    пакетами; повторный запуск не создает дублей (plot, year).
+    """
+    BATCH_SIZE = 1000
+    TARIFF_CHOICES = ['flat', 'per_sotka']
+    CENT = Decimal('0.01')
+
+    @staticmethod
+    def to_decimal(value, name):
+        try:
+            result = Decimal(str(value).strip().replace(',', '.'))
+        except (InvalidOperation, TypeError):
+            raise Exception(f"Некорректное значение {name}: {value}")
+        if not result.is_finite():
+            raise Exception(f"Некорректное значение {name}: {value}")
+        return result
+
+    @staticmethod
+    def calculate(year, tariff='flat', rate=None, overrides=None):
+        """
+        Расчет начислений без записи в базу.
+
+        tariff='flat' - rate с участка, 'per_sotka' - rate за сотку (Plot.area);
+        overrides - {plot_number: сумма} для отдельных участков. Возвращает
+        (список {plot_id, plot_number, area, amount, exists}, пропущенные номера).
+        """
+        if tariff not in ChargeGenerationService.TARIFF_CHOICES:
+            raise Exception(f"Неизвестный тариф: {tariff}")
+        if rate is None or rate == '':
+            raise Exception("Не указана ставка")
+        rate = ChargeGenerationService.to_decimal(rate, 'ставки')
+        if rate <= 0:
+            raise Exception("Ставка должна быть больше нуля")
+
+        override_amounts = {}
+        for number, value in (overrides or {}).items():
+            amount = ChargeGenerationService.to_decimal(value, f'суммы участка {number}')
+            if amount < 0:
+                raise Exception(f"Отрицательная сумма участка {number}")
+            override_amounts[str(number)] = amount
+
+        existing = set(Payment.objects.filter(year=year).values_list('plot_id', flat=True))
+        charges = []
+        skipped = []
+        for plot_id, plot_number, area in Plot.objects.values_list('id', 'plot_number', 'area'):
+            if plot_number in override_amounts:
+                amount = override_amounts[plot_number]
+            elif tariff == 'flat':
+                amount = rate
+            elif area is not None:
+                # Площадь хранится во float: str() дает десятичную запись без хвоста двоичной дроби
+                amount = Decimal(str(area)) * rate
+            else:
+                # Участки без площади при тарифе за сотку начислить нельзя
+                skipped.append(plot_number)
+                continue
+            charges.append({
+                'plot_id': plot_id,
+                'plot_number': plot_number,
+                'area': area,
+                'amount': amount.quantize(ChargeGenerationService.CENT, rounding=ROUND_HALF_UP),
+                'exists': plot_id in existing,
+            })
+        return charges, skipped
+
+    @staticmethod
+    def generate_charges(year, tariff='flat', rate=None, overrides=None, dry_run=False, overwrite=False):
+        """
+        Создание платежей за год.
+
+        Существующие платежи года не меняются; overwrite=True обновляет у них
+        сумму (статус и дата оплаты сохраняются). dry_run возвращает только
+        предварительный расчет.
+        """
+        year = int(year)
+        charges, skipped = ChargeGenerationService.calculate(year, tariff, rate, overrides)
+        to_create = charges if overwrite else [charge for charge in charges if not charge['exists']]
+        updated = sum(1 for charge in to_create if charge['exists'])
+
+        result = {
+            'year': year,
+            'tariff': tariff,
+            'rate': float(ChargeGenerationService.to_decimal(rate, 'ставки')),
+            'plots': len(charges),
+            'created': len(to_create) - updated,
+            'updated': updated,
+            'unchanged': len(charges) - len(to_create),
+            'skipped': skipped,
+            'total_amount': float(sum((charge['amount'] for charge in charges), Decimal('0'))),
+            'dry_run': dry_run,
+        }
+
+        if dry_run:
+            result['preview'] = [
+                {
+                    'plot_number': charge['plot_number'],
+                    'area': charge['area'],
+                    'amount': float(charge['amount']),
+                    'exists': charge['exists'],
+                }
+                for charge in charges
+            ]
+            return result
+
+        payments = [
+            Payment(plot_id=charge['plot_id'], year=year, amount=charge['amount'])
+            for charge in to_create
+        ]
+        with transaction.atomic():
+            if overwrite:
+                Payment.objects.bulk_create(
+                    payments,
+                    batch_size=ChargeGenerationService.BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['plot', 'year'],
+                    update_fields=['amount', 'updated_at']
+                )
+                # Новая сумма начисления меняет статус уже оплаченных
+                LedgerService.recalculate(
+                    Payment.objects.filter(year=year, transactions__isnull=False)
+                    .values_list('id', flat=True).distinct()
+                )
+            else:
+                Payment.objects.bulk_create(
+                    payments,
+                    batch_size=ChargeGenerationService.BATCH_SIZE,
+                    ignore_conflicts=True
+                )
+            LedgerService.refresh_balances(charge['plot_id'] for charge in to_create)
+
+        return result
@@ -0,0 +1,29 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Payment, PaymentTransaction
+from .services import LedgerService
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_plot_balance(sender, instance, raw=False, origin=None, **kwargs):
+    """
+    Пересчет сальдо участка при изменении начисления.
+
+    Пакетные операции (bulk_create/update) сигналов не вызывают и
+    обновляют сальдо сами через LedgerService; удаление queryset
+    пересчитывает сальдо один раз в PaymentQuerySet.delete.
+    """
+    # При каскадном удалении участка сальдо удаляется вместе с ним
+    if raw or isinstance(origin, QuerySet) or (origin is not None and not isinstance(origin, Payment)):
+        return
+    LedgerService.refresh_balances([instance.plot_id])
+
+
+@receiver(post_delete, sender=PaymentTransaction)
+def recalculate_payment(sender, instance, origin=None, **kwargs):
+    """Удаление поступления (например, ошибочного) возвращает долг"""
+    # Удаление queryset пересчитывает начисления в PaymentTransactionQuerySet.delete
+    if isinstance(origin, PaymentTransaction):
+        LedgerService.recalculate([instance.payment_id])
@@ -1,3 +1,425 @@
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from owners.models import Owner
+from payments.models import Payment, PaymentTransaction, PlotBalance
+from payments.reconciliation import BankStatementParser, PaymentMatcher, ReconciliationService
+from payments.services import LedgerService, PaymentImportService
+from plots.models import Plot, PlotOwner
+
+
+class QueryPlanTests(TestCase):
+    """
+    Регрессионные тесты планов запросов: запросы, которые реально выполняют
+    списки и отчеты, должны идти по своим индексам. Запросы перехватываются
+    при обращении к API, и для каждого проверяется EXPLAIN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = Owner.objects.create(full_name='Иванов Иван Иванович')
+        for number in range(1, 21):
+            plot = Plot.objects.create(plot_number=str(number))
+            PlotOwner.objects.create(plot=plot, owner=owner, ownership_start=date(2020, 1, 1))
+            for year in (2023, 2024):
+                Payment.objects.create(
+                    plot=plot,
+                    year=year,
+                    amount=1000,
+                    status='paid' if number % 2 else 'not_paid',
+                    date_paid=date(year, 5, 1) if number % 2 else None
+                )
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На маленьких таблицах PostgreSQL всегда выбирает seq scan
+                cursor.execute('SET enable_seqscan = off')
+                try:
+                    cursor.execute(f'EXPLAIN {sql}')
+                finally:
+                    cursor.execute('SET enable_seqscan = on')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+    def assertRequestUsesIndex(self, url, model, index_name):
+        """Все запросы с WHERE к таблице model при GET url идут по index_name"""
+        table = connection.ops.quote_name(model._meta.db_table)
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if f'FROM {table}' in query['sql'] and ' WHERE ' in query['sql']
+        ]
+        self.assertTrue(queries, f'{url} не обращается к {table}')
+        for sql in queries:
+            plan = self.explain(sql)
+            self.assertIn(index_name, plan, f'{url}: запрос не использует {index_name}\n{sql}\n{plan}')
+
+    def test_payment_list_by_year_and_status(self):
+        self.assertRequestUsesIndex('/api/payments/?year=2024&status=paid', Payment, 'payment_year_status_idx')
+
+    def test_payment_statistics_by_year(self):
+        self.assertRequestUsesIndex('/api/payments/statistics/?year=2024', Payment, 'payment_year_status_idx')
+
+    def test_payment_summary_report(self):
+        self.assertRequestUsesIndex('/api/reports/payment_summary/?year=2024', Payment, 'payment_year_status_idx')
+
+    def test_debt_report(self):
+        self.assertRequestUsesIndex('/api/reports/debt_report/?year=2024', Payment, 'payment_year_status_idx')
+
+    def test_debt_report_current_owners(self):
+        self.assertRequestUsesIndex('/api/reports/debt_report/?year=2024', PlotOwner, 'plotowner_current_idx')
+
+    def test_financial_report(self):
+        self.assertRequestUsesIndex('/api/reports/financial_report/', PaymentTransaction, 'paymenttx_date_idx')
+
+
+class PaymentImportTests(TestCase):
+    """Разбор файлов импорта: заголовки, кодировки, форматы чисел и дат, ошибки по строкам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plot = Plot.objects.create(plot_number='12')
+        cls.other_plot = Plot.objects.create(plot_number='12а')
+
+    def upload(self, content, name='payments.csv', **data):
+        return APIClient().post(
+            '/api/payments/import/',
+            {'file': SimpleUploadedFile(name, content), **data},
+            format='multipart'
+        )
+
+    def test_russian_headers_cp1251_and_semicolons(self):
+        content = (
+            '№ участка;Год;Сумма;Дата оплаты;Статус\n'
+            '12;2024;1 500,50;15.03.2024;\n'
+            '12а;2024;2000;;Не оплачен\n'
+        ).encode('cp1251')
+        df = PaymentImportService.read_file(io.BytesIO(content), 'payments.csv')
+        valid, errors = PaymentImportService.validate(df)
+
+        self.assertEqual(errors, [])
+        rows = {int(row.plot_id): row for row in valid.itertuples(index=False)}
+        self.assertEqual(rows[self.plot.pk].amount, 1500.5)
+        self.assertEqual(rows[self.plot.pk].date_paid.date(), date(2024, 3, 15))
+        # Без статуса, но с датой оплаты - оплачен
+        self.assertEqual(rows[self.plot.pk].status, 'paid')
+        self.assertEqual(rows[self.other_plot.pk].status, 'not_paid')
+
+    def test_row_errors(self):
+        content = (
+            'plot_number,year,amount,date_paid,status\n'
+            '12,2024,1000,,\n'
+            '99,2024,1000,,\n'
+            '12а,20x4,-5,31.02.2024,в обработке\n'
+            '12,2024,1000,,\n'
+            ',2024,1000,,\n'
+        ).encode()
+        df = PaymentImportService.read_file(io.BytesIO(content), 'payments.csv')
+        _, errors = PaymentImportService.validate(df)
+
+        errors = {error['row']: error['errors'] for error in errors}
+        self.assertEqual(errors[2], ['Повтор участка и года в файле'])
+        self.assertEqual(errors[3], ['Участок не найден'])
+        self.assertEqual(errors[4], [
+            'Некорректный год', 'Некорректная сумма', 'Некорректная дата оплаты', 'Неизвестный статус'
+        ])
+        self.assertEqual(errors[5], ['Повтор участка и года в файле'])
+        self.assertEqual(errors[6], ['Не указан номер участка'])
+
+    def test_dry_run_and_import(self):
+        content = 'Участок,Год,Сумма\n12,2024,1000\n12а,2024,abc\n'.encode()
+
+        response = self.upload(content, dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['imported'], response.data['failed']), (1, 1))
+        self.assertFalse(Payment.objects.exists())
+
+        response = self.upload(content)
+        self.assertEqual(response.data['created'], 1)
+        payment = Payment.objects.get()
+        self.assertEqual((payment.plot_id, payment.year, payment.amount), (self.plot.pk, 2024, Decimal('1000')))
+
+        response = self.upload(content)
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+
+    def test_reimport_not_paid_keeps_receipts(self):
+        payment = Payment.objects.create(plot=self.plot, year=2024, amount=1000)
+        LedgerService.add_payment(payment, 1000, date=date(2024, 4, 1), source='bank')
+
+        response = self.upload('Участок,Год,Сумма,Статус\n12,2024,1000,Не оплачен\n'.encode())
+        self.assertEqual(response.status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid_total), ('paid', Decimal('1000.00')))
+        self.assertEqual(payment.date_paid, date(2024, 4, 1))
+        self.assertEqual(response.data['status_mismatches'], [
+            {'plot_id': self.plot.pk, 'year': 2024, 'status': 'not_paid', 'ledger_status': 'paid'}
+        ])
+
+    def test_import_partial(self):
+        payment = Payment.objects.create(plot=self.plot, year=2024, amount=1000)
+        LedgerService.add_payment(payment, 400, date=date(2024, 4, 1))
+
+        content = 'Участок,Год,Сумма,Статус\n12,2024,1000,partial\n12а,2024,1000,partial\n'.encode()
+        response = self.upload(content)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid_total), ('partial', Decimal('400.00')))
+        # Без поступлений частичная оплата не подтверждена
+        other = Payment.objects.get(plot=self.other_plot, year=2024)
+        self.assertEqual((other.status, other.paid_total), ('not_paid', Decimal('0.00')))
+        self.assertEqual(
+            [(row['plot_id'], row['ledger_status']) for row in response.data['status_mismatches']],
+            [(self.other_plot.pk, 'not_paid')]
+        )
+
+        # "Оплачен" доплачивает остаток поступлением из импорта
+        self.upload('Участок,Год,Сумма,Дата оплаты\n12,2024,1000,10.05.2024\n'.encode())
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid_total, payment.date_paid), ('paid', Decimal('1000.00'), date(2024, 5, 10)))
+        self.assertEqual(
+            list(payment.transactions.order_by('date').values_list('amount', 'source')),
+            [(Decimal('400.00'), 'manual'), (Decimal('600.00'), 'import')]
+        )
+
+    def test_missing_columns(self):
+        response = self.upload('Участок,Дата\n12,01.01.2024\n'.encode())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('year', response.data['error'])
+
+
+class ChargeGenerationTests(TestCase):
+    """Начисление взносов: тарифы, индивидуальные суммы, округление, проверка ставки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = Plot.objects.create(plot_number='1', area=6.15)
+        cls.half_cent = Plot.objects.create(plot_number='2', area=0.5)
+        cls.no_area = Plot.objects.create(plot_number='3')
+
+    def generate(self, **data):
+        return APIClient().post('/api/payments/generate_charges/', {'year': 2025, **data}, format='json')
+
+    def amounts(self):
+        return dict(Payment.objects.filter(year=2025).values_list('plot__plot_number', 'amount'))
+
+    def test_flat_tariff(self):
+        response = self.generate(rate='1500.50')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(self.amounts(), {'1': Decimal('1500.50'), '2': Decimal('1500.50'), '3': Decimal('1500.50')})
+
+    def test_per_sotka_tariff_rounds_half_up(self):
+        response = self.generate(tariff='per_sotka', rate='0.05')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['skipped'], ['3'])
+        # 6.15 * 0.05 = 0.3075, 0.5 * 0.05 = 0.025: половина копейки - вверх
+        self.assertEqual(self.amounts(), {'1': Decimal('0.31'), '2': Decimal('0.03')})
+
+    def test_per_sotka_without_float_error(self):
+        response = self.generate(tariff='per_sotka', rate='333.33', dry_run=True)
+        preview = {row['plot_number']: row['amount'] for row in response.data['preview']}
+        # 6.15 * 333.33 = 2049.9795
+        self.assertEqual(preview['1'], 2049.98)
+        self.assertEqual(response.data['total_amount'], 2049.98 + 166.67)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_overrides(self):
+        response = self.generate(tariff='per_sotka', rate='100', overrides={'3': '2500,5', '2': 0})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['skipped'], [])
+        self.assertEqual(self.amounts(), {'1': Decimal('615.00'), '2': Decimal('0.00'), '3': Decimal('2500.50')})
+
+        response = self.generate(rate='100', overrides={'1': '-1'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_overwrite_keeps_receipts(self):
+        self.generate(rate='1000')
+        payment = Payment.objects.get(plot=self.small, year=2025)
+        LedgerService.add_payment(payment, 1000, date=date(2025, 3, 1))
+
+        response = self.generate(rate='1200', overwrite=True)
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 3))
+        payment.refresh_from_db()
+        self.assertEqual((payment.amount, payment.paid_total, payment.status), (Decimal('1200.00'), Decimal('1000.00'), 'partial'))
+
+    def test_rate_is_required_and_positive(self):
+        for data in ({}, {'rate': ''}, {'rate': 0}, {'rate': '-10'}, {'rate': 'abc'}):
+            response = self.generate(**data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(Payment.objects.exists())
+
+
+class ReconciliationTests(TestCase):
+    """Разбор выписок и сопоставление операций с начислениями"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Owner.objects.create(full_name='Кузнецова Мария Сергеевна')
+        cls.plot = Plot.objects.create(plot_number='15')
+        cls.other_plot = Plot.objects.create(plot_number='7б')
+        PlotOwner.objects.create(plot=cls.plot, owner=cls.owner, ownership_start=date(2020, 1, 1))
+        cls.old_payment = Payment.objects.create(plot=cls.plot, year=2023, amount=4000)
+        cls.payment = Payment.objects.create(plot=cls.plot, year=2024, amount=5000)
+        cls.other_payment = Payment.objects.create(plot=cls.other_plot, year=2024, amount=5000)
+
+    def row(self, purpose='', payer='', amount='5000.00'):
+        return {'purpose': purpose, 'payer': payer, 'amount': Decimal(amount)}
+
+    def test_match_by_plot_number_year_and_amount(self):
+        matcher = PaymentMatcher()
+        self.assertEqual(
+            matcher.match(self.row('Членский взнос уч. 15 за 2024 г.', 'Кузнецова М.С.')),
+            (self.payment, 1.0, 'plot_number')
+        )
+        # Без года - начисление с совпадающей суммой, иначе самое старое
+        self.assertEqual(matcher.match(self.row('Взнос участок №15'))[0], self.payment)
+        self.assertEqual(matcher.match(self.row('Взнос участок №15', amount='100'))[:2], (self.old_payment, 0.6))
+        self.assertEqual(matcher.match(self.row('Оплата за участок 7Б'))[0], self.other_payment)
+
+    def test_match_by_owner_name(self):
+        payment, score, method = PaymentMatcher().match(
+            self.row('Членский взнос', 'КУЗНЕЦОВА МАРИЯ СЕРГЕВНА', '4000')
+        )
+        self.assertEqual((payment, method), (self.old_payment, 'owner_name'))
+        self.assertGreaterEqual(score, ReconciliationService.AUTO_MATCH_SCORE)
+
+    def test_no_match(self):
+        self.assertEqual(PaymentMatcher().match(self.row('Возврат займа', 'ООО Ромашка')), (None, 0, ''))
+
+    def test_1c_statement(self):
+        content = '\n'.join([
+            '1CClientBankExchange',
+            'РасчСчет=40703810000000000001',
+            'СекцияДокумент=Платежное поручение',
+            'Номер=11', 'Дата=05.04.2024', 'Сумма=5000.00',
+            'Плательщик1=Кузнецова Мария Сергеевна', 'ПолучательСчет=40703810000000000001',
+            'НазначениеПлатежа=Взнос за 2024 год, участок 15',
+            'КонецДокумента',
+            'СекцияДокумент=Платежное поручение',
+            'Номер=12', 'Дата=06.04.2024', 'Сумма=100.00', 'ПолучательСчет=40703810000000000999',
+            'КонецДокумента',
+        ]).encode('cp1251')
+        statement_format, rows = BankStatementParser.parse(io.BytesIO(content))
+        self.assertEqual(statement_format, '1c')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['number'], rows[0]['date'], rows[0]['amount']), ('11', date(2024, 4, 5), Decimal('5000.00')))
+
+    def test_upload_deduplicate_and_apply(self):
+        content = (
+            'Дата;Сумма;Плательщик;Назначение платежа\n'
+            '05.04.2024;3 000,00;Иванов;Взнос уч. 7б 2024\n'
+            '06.04.2024;-500;Банк;Комиссия\n'
+        ).encode()
+        statement, report = ReconciliationService.upload_statement(io.BytesIO(content), 'april.csv')
+        self.assertEqual((report['total'], report['new'], report['matched']), (1, 1, 1))
+
+        _, report = ReconciliationService.upload_statement(io.BytesIO(content), 'april.csv')
+        self.assertEqual((report['new'], report['duplicates']), (0, 1))
+
+        self.assertEqual(ReconciliationService.apply(statement), {'applied': 1, 'payments': 1})
+        self.other_payment.refresh_from_db()
+        self.assertEqual((self.other_payment.paid_total, self.other_payment.status), (Decimal('3000.00'), 'partial'))
+        self.assertEqual(statement.transactions.get().status, 'applied')
+
+
+class PlotBalanceTests(TestCase):
+    """Сальдо участков и давность долга по журналу поступлений"""
+
+    def setUp(self):
+        self.year = timezone.localdate().year
+        self.plot = Plot.objects.create(plot_number='1')
+        self.other_plot = Plot.objects.create(plot_number='2')
+        self.old = Payment.objects.create(plot=self.plot, year=self.year - 3, amount=1000)
+        self.last = Payment.objects.create(plot=self.plot, year=self.year - 1, amount=2000)
+        self.current = Payment.objects.create(plot=self.plot, year=self.year, amount=3000)
+        Payment.objects.create(plot=self.other_plot, year=self.year, amount=500)
+
+    def balance(self, plot=None):
+        return PlotBalance.objects.get(plot=plot or self.plot)
+
+    def test_debt_buckets(self):
+        LedgerService.add_payment(self.last, 500, date=date(self.year, 1, 10))
+        balance = self.balance()
+        self.assertEqual(
+            (balance.charged_total, balance.paid_total, balance.debt),
+            (Decimal('6000.00'), Decimal('500.00'), Decimal('5500.00'))
+        )
+        self.assertEqual(
+            (balance.debt_current, balance.debt_1_year, balance.debt_2_years_plus),
+            (Decimal('3000.00'), Decimal('1500.00'), Decimal('1000.00'))
+        )
+        self.assertEqual((balance.oldest_debt_year, balance.as_of_year), (self.year - 3, self.year))
+
+        LedgerService.add_payment(self.old, 1000)
+        balance = self.balance()
+        self.assertEqual((balance.debt_2_years_plus, balance.oldest_debt_year), (Decimal('0.00'), self.year - 1))
+
+    def test_receipt_delete_restores_debt(self):
+        LedgerService.add_payment(self.current, 3000)
+        self.assertEqual(self.balance().debt_current, Decimal('0.00'))
+        self.current.transactions.get().delete()
+        self.current.refresh_from_db()
+        self.assertEqual((self.current.status, self.balance().debt_current), ('not_paid', Decimal('3000.00')))
+
+    def test_aging_filters(self):
+        response = APIClient().get('/api/payments/aging/', {'min_years': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['plot'] for row in response.data['results']], [self.plot.pk])
+        self.assertEqual(response.data['summary']['debt_2_years_plus'], Decimal('1000.00'))
+
+        response = APIClient().get('/api/payments/aging/', {'min_debt': 1000})
+        self.assertEqual([row['plot'] for row in response.data['results']], [self.plot.pk])
+        response = APIClient().get('/api/payments/aging/')
+        self.assertEqual(response.data['summary']['plots'], 2)
+        self.assertEqual(APIClient().get('/api/payments/aging/', {'min_years': 'x'}).status_code, 400)
+
+    def test_aging_rebuilds_balances_of_previous_year(self):
+        PlotBalance.objects.update(as_of_year=self.year - 1, debt_current=0)
+        LedgerService.aging()
+        self.assertEqual(self.balance().debt_current, Decimal('3000.00'))
+        self.assertFalse(PlotBalance.objects.exclude(as_of_year=self.year).exists())
+
+    def test_update_recalculates_status_from_ledger(self):
+        LedgerService.add_payment(self.current, 500)
+        client = APIClient()
+        response = client.patch(f'/api/payments/{self.current.pk}/', {'amount': '500'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'paid')
+        self.assertEqual(self.balance().debt_current, Decimal('0.00'))
+
+        # Статус не меняется вручную, пока в журнале есть поступления
+        response = client.patch(f'/api/payments/{self.current.pk}/', {'status': 'not_paid'}, format='json')
+        self.current.refresh_from_db()
+        self.assertEqual((response.data['status'], self.current.status), ('paid', 'paid'))
+
+        response = client.patch(f'/api/payments/{self.current.pk}/', {'amount': '800'}, format='json')
+        self.assertEqual(response.data['status'], 'partial')
+        self.assertEqual(self.balance().debt_current, Decimal('300.00'))
+
+    def test_queryset_delete_refreshes_balances_once(self):
+        with mock.patch.object(LedgerService, 'refresh_balances', wraps=LedgerService.refresh_balances) as refresh:
+            Payment.objects.filter(year=self.year).delete()
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(self.balance().debt_current, Decimal('0.00'))
+        self.assertEqual(self.balance(self.other_plot).charged_total, Decimal('0.00'))
 
-# Create your tests here.
+        with mock.patch.object(LedgerService, 'recalculate', wraps=LedgerService.recalculate) as recalculate:
+            LedgerService.add_payment(self.old, 100)
+            LedgerService.add_payment(self.last, 100)
+            recalculate.reset_mock()
+            PaymentTransaction.objects.all().delete()
+        self.assertEqual(recalculate.call_count, 1)
+        self.assertEqual(self.balance().paid_total, Decimal('0.00'))
@@ -2,15 +2,29 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db.models import Count, Q
-from .models import Payment
-from .serializers import PaymentSerializer, PaymentCreateSerializer
-from plots.models import Plot
+from .models import Payment, BankStatement, BankTransaction
+from .serializers import (
+    PaymentSerializer, PaymentCreateSerializer, PaymentTransactionSerializer, FastPaymentListSerializer,
+    PlotBalanceSerializer, BankStatementSerializer, BankTransactionSerializer
+)
+from .services import LedgerService, PaymentImportService, ChargeGenerationService
+from .reconciliation import ReconciliationService
+from plots.models import Plot, PlotOwner, current_owner_prefetch
+from plots.search import PlotSearchService
+from owners.models import Owner
+from sntacc.conditional import ConditionalGetMixin, conditional_get
+from sntacc.fastlist import FastListMixin
+from sntacc.selection import FieldSelectionMixin
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ConditionalGetMixin, FieldSelectionMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [AllowAny]
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+    conditional_models = (Payment, Plot, PlotOwner, Owner)
+    fast_serializer_class = FastPaymentListSerializer
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -25,12 +39,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         amount_max = self.request.query_params.get('amount_max', None)
         
         if search:
-            queryset = queryset.filter(
-                Q(plot__plot_number__icontains=search) |
-                Q(plot__address__icontains=search) |
-                Q(plot__plotowner__owner__full_name__icontains=search,
-                  plot__plotowner__ownership_end__isnull=True)
-            )
+            queryset = PlotSearchService.filter_queryset(queryset, search, field='plot_id')
         
         if year:
             queryset = queryset.filter(year=year)
@@ -53,14 +62,56 @@ class PaymentViewSet(viewsets.ModelViewSet):
         if amount_max:
             queryset = queryset.filter(amount__lte=amount_max)
         
-        return queryset.select_related('plot')  # Добавлен select_related только для plot
+        return queryset.select_related('plot').prefetch_related(current_owner_prefetch('plot__plotowner_set'))
 
     def get_serializer_class(self):
         if self.action == 'create':
             return PaymentCreateSerializer
         return PaymentSerializer
 
+    def perform_create(self, serializer):
+        payment = serializer.save()
+        # Статус "оплачен", выставленный вручную, фиксируется поступлением в журнале
+        LedgerService.settle([payment.pk])
+        self.recalculate(payment)
+
+    def perform_update(self, serializer):
+        old_plot_id = serializer.instance.plot_id
+        payment = serializer.save()
+        self.recalculate(payment)
+        if old_plot_id != payment.plot_id:
+            LedgerService.refresh_balances([old_plot_id])
+
+    def recalculate(self, payment):
+        """Статус, сумма поступлений и дата оплаты - всегда по журналу"""
+        LedgerService.recalculate([payment.pk])
+        payment.refresh_from_db(fields=['paid_total', 'status', 'date_paid', 'updated_at'])
+
+    @action(detail=True, methods=['get', 'post'], permission_classes=[AllowAny])
+    def transactions(self, request, pk=None):
+        """Поступления по начислению; POST добавляет поступление (частичная оплата)"""
+        payment = self.get_object()
+        if request.method == 'GET':
+            serializer = PaymentTransactionSerializer(payment.transactions.all(), many=True)
+            return Response(serializer.data)
+
+        serializer = PaymentTransactionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payment = LedgerService.add_payment(
+                payment,
+                amount=serializer.validated_data['amount'],
+                date=serializer.validated_data.get('date'),
+                source=serializer.validated_data.get('source', 'manual'),
+                comment=serializer.validated_data.get('comment', '')
+            )
+            return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @conditional_get(Payment, Plot)
     def statistics(self, request):
         """Статистика по платежам"""
         try:
@@ -94,13 +145,155 @@ class PaymentViewSet(viewsets.ModelViewSet):
         except (ValueError, TypeError):
             year = 2024
             
-        queryset = self.get_queryset().filter(year=year)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.fast_response(self.get_queryset().filter(year=year))
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def search(self, request):
         """Поиск платежей"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.fast_response(self.get_queryset())
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def aging(self, request):
+        """Задолженность участков по давности (?min_years=2&min_debt=1000)"""
+        try:
+            min_years = request.query_params.get('min_years')
+            min_debt = request.query_params.get('min_debt')
+            summary, balances = LedgerService.aging(
+                min_years=int(min_years) if min_years else None,
+                min_debt=float(min_debt) if min_debt else None
+            )
+        except (ValueError, TypeError):
+            return Response({'error': 'Некорректные параметры фильтра'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(balances)
+        if page is not None:
+            response = self.get_paginated_response(PlotBalanceSerializer(page, many=True).data)
+            response.data['summary'] = summary
+            return response
+        return Response({
+            'summary': summary,
+            'results': PlotBalanceSerializer(balances, many=True).data
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], url_path='import')
+    def import_payments(self, request):
+        """Массовый импорт платежей из CSV/XLSX"""
+        file_obj = request.FILES.get('file')
+        if not file_obj:
+            return Response({'error': 'Файл обязателен для загрузки'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            report = PaymentImportService.import_payments(
+                file_obj,
+                filename=file_obj.name,
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+            )
+            return Response(report)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def generate_charges(self, request):
+        """Начисление взносов за год всем участкам (dry_run - предпросмотр)"""
+        try:
+            year = request.data.get('year')
+            if not year:
+                return Response({'error': 'Укажите year'}, status=status.HTTP_400_BAD_REQUEST)
+            rate = request.data.get('rate')
+            if rate in (None, ''):
+                return Response({'error': 'Укажите rate'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            result = ChargeGenerationService.generate_charges(
+                year=year,
+                tariff=request.data.get('tariff', 'flat'),
+                rate=rate,
+                overrides=request.data.get('overrides'),
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true'),
+                overwrite=str(request.data.get('overwrite', '')).lower() in ('1', 'true')
+            )
+            return Response(result, status=status.HTTP_200_OK if result['dry_run'] else status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BankStatementViewSet(viewsets.ReadOnlyModelViewSet):
+    """Загрузка банковских выписок и сверка операций с платежами"""
+    queryset = BankStatement.objects.all()
+    serializer_class = BankStatementSerializer
+    permission_classes = [AllowAny]
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('uploaded_by').annotate(
+            transactions_count=Count('transactions'),
+            matched_count=Count('transactions', filter=Q(transactions__status='matched')),
+            applied_count=Count('transactions', filter=Q(transactions__status='applied'))
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def upload(self, request):
+        """Загрузка выписки (CSV или 1С) с автоматическим сопоставлением"""
+        file_obj = request.FILES.get('file')
+        if not file_obj:
+            return Response({'error': 'Файл обязателен для загрузки'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            statement, report = ReconciliationService.upload_statement(
+                file_obj,
+                name=file_obj.name,
+                user=request.user if request.user.is_authenticated else None
+            )
+            report['statement'] = self.get_serializer(self.get_queryset().get(pk=statement.pk)).data
+            return Response(report, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def transactions(self, request, pk=None):
+        """Операции выписки (фильтр ?status=)"""
+        queryset = self.get_object().transactions.select_related('payment__plot')
+        transaction_status = request.query_params.get('status')
+        if transaction_status:
+            queryset = queryset.filter(status=transaction_status)
+        return Response(BankTransactionSerializer(queryset, many=True).data)
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    def match(self, request, pk=None):
+        """Ручное сопоставление или пропуск операций: [{id, payment, status}]"""
+        statement = self.get_object()
+        try:
+            items = {int(item['id']): item for item in request.data.get('transactions', [])}
+            transactions = list(statement.transactions.filter(id__in=items).exclude(status='applied'))
+            for bank_transaction in transactions:
+                item = items[bank_transaction.id]
+                if item.get('status') == 'ignored':
+                    bank_transaction.status = 'ignored'
+                elif item.get('payment'):
+                    bank_transaction.payment = Payment.objects.get(pk=item['payment'])
+                    bank_transaction.status = 'matched'
+                    bank_transaction.match_score = 1
+                    bank_transaction.match_method = 'manual'
+                else:
+                    bank_transaction.payment = None
+                    bank_transaction.status = 'unmatched'
+            BankTransaction.objects.bulk_update(
+                transactions, ['payment', 'status', 'match_score', 'match_method']
+            )
+            return Response({'updated': len(transactions)})
+        except Payment.DoesNotExist:
+            return Response({'error': 'Платеж не найден'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    def apply(self, request, pk=None):
+        """Проведение сопоставленных операций (transaction_ids - только выбранные)"""
+        try:
+            result = ReconciliationService.apply(
+                self.get_object(),
+                transaction_ids=request.data.get('transaction_ids')
+            )
+            return Response(result)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,69 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Нагрузочный замер запущенного сервера: запросов в секунду и задержки при N параллельных клиентах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='+', help='Адреса для запросов (по кругу)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Параллельных клиентов')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность замера, секунд')
+        parser.add_argument('--header', action='append', default=[], help='Заголовок "Имя: значение"')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, секунд')
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options['header']:
+            name, _, value = header.partition(':')
+            headers[name.strip()] = value.strip()
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def client(offset):
+            urls = options['url']
+            index = offset
+            while time.perf_counter() < deadline:
+                request = urllib.request.Request(urls[index % len(urls)], headers=headers)
+                index += 1
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=options['timeout']) as response:
+                        response.read()
+                except (urllib.error.URLError, OSError) as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            raise CommandError(f'Ни одного успешного запроса: {errors[:1]}')
+
+        latencies.sort()
+        percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+        self.stdout.write(
+            f'Запросов: {len(latencies)}, ошибок: {len(errors)}, '
+            f'клиентов: {options["concurrency"]}, время: {elapsed:.1f} с'
+        )
+        self.stdout.write(
+            f'Задержка: median {statistics.median(latencies) * 1000:.1f} мс, '
+            f'p95 {percentile(0.95):.1f} мс, p99 {percentile(0.99):.1f} мс'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{len(latencies) / elapsed:.1f} запросов/с'))
@@ -0,0 +1,89 @@
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from owners.models import Owner
+from owners.serializers import OwnerSerializer, FastOwnerSerializer
+from payments.models import Payment
+from payments.serializers import PaymentSerializer, FastPaymentListSerializer
+from plots.models import Plot, PlotOwner, current_owner_prefetch
+from plots.serializers import PlotSerializer, FastPlotListSerializer
+from sntacc.renderers import ORJSONRenderer
+
+class Command(BaseCommand):
+    help = 'Сравнение скорости списков: ModelSerializer + JSONRenderer и values() + orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Число участков (и платежей)')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов замера (берется лучший)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        # Данные создаются в транзакции и откатываются после замеров
+        with transaction.atomic():
+            self.create_data(rows)
+            cases = [
+                ('plots', PlotSerializer, FastPlotListSerializer,
+                 lambda: Plot.objects.prefetch_related(current_owner_prefetch())),
+                ('payments', PaymentSerializer, FastPaymentListSerializer,
+                 lambda: Payment.objects.select_related('plot').prefetch_related(
+                     current_owner_prefetch('plot__plotowner_set')
+                 )),
+                ('owners', OwnerSerializer, FastOwnerSerializer,
+                 lambda: Owner.objects.prefetch_related(Prefetch(
+                     'plotowner_set',
+                     queryset=PlotOwner.objects.filter(ownership_end__isnull=True).select_related('plot'),
+                     to_attr='current_ownerships'
+                 ))),
+            ]
+            for name, serializer_class, fast_class, queryset in cases:
+                slow = self.measure(
+                    lambda: JSONRenderer().render(serializer_class(queryset(), many=True).data),
+                    options['repeat']
+                )
+                fast = self.measure(
+                    lambda: ORJSONRenderer().render(fast_class.serialize(queryset())),
+                    options['repeat']
+                )
+                self.stdout.write(
+                    f'{name}: ModelSerializer {slow:.3f} с ({rows / slow:.0f} строк/с), '
+                    f'values() {fast:.3f} с ({rows / fast:.0f} строк/с), ускорение x{slow / fast:.1f}'
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Замеры завершены, тестовые данные удалены'))
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def create_data(self, rows):
+        prefix = 'bench-'
+        plots = Plot.objects.bulk_create(
+            [Plot(plot_number=f'{prefix}{i}', address=f'Линия {i % 40}, дом {i}', area=6) for i in range(rows)],
+            batch_size=1000
+        )
+        owners = Owner.objects.bulk_create(
+            [Owner(full_name=f'Собственник {i}', phone=f'+7900{i:07d}', email=f'owner{i}@example.com')
+             for i in range(rows)],
+            batch_size=1000
+        )
+        PlotOwner.objects.bulk_create(
+            [PlotOwner(plot=plot, owner=owner, ownership_start=date(2020, 1, 1))
+             for plot, owner in zip(plots, owners)],
+            batch_size=1000
+        )
+        Payment.objects.bulk_create(
+            [Payment(plot=plot, year=2024, amount=Decimal('5000.00')) for plot in plots],
+            batch_size=1000
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from sntacc.synthetic import SyntheticDataGenerator
+
+class Command(BaseCommand):
+    help = 'Генерация синтетического СНТ: участки, собственники, платежи, документы, задачи, уведомления, аудит'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plots', type=int, default=1000, help='Число участков')
+        parser.add_argument('--years', type=int, default=3, help='Число лет начислений (по текущий год)')
+        parser.add_argument('--turnover', type=float, default=0.2, help='Доля участков со сменой владельца')
+        parser.add_argument('--documents', type=int, default=None, help='Число документов (по умолчанию plots/2)')
+        parser.add_argument('--tasks', type=int, default=None, help='Число задач (по умолчанию plots/10)')
+        parser.add_argument('--notifications', type=int, default=None, help='Число уведомлений (по умолчанию plots)')
+        parser.add_argument('--audit-rows', type=int, default=None, help='Записей аудита (по умолчанию plots*2)')
+        parser.add_argument('--users', type=int, default=3, help='Число пользователей')
+        parser.add_argument('--prefix', default='syn-', help='Префикс номеров и имен (для повторных запусков)')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(
+            plots=options['plots'],
+            years=options['years'],
+            turnover=options['turnover'],
+            documents=options['documents'],
+            tasks=options['tasks'],
+            notifications=options['notifications'],
+            audit_rows=options['audit_rows'],
+            users=options['users'],
+            prefix=options['prefix'],
+            seed=options['seed']
+        )
+        counts = generator.generate()
+        summary = ', '.join(f'{name}: {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Синтетические данные созданы ({summary})'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from plots.search import PlotSearchService
+
+class Command(BaseCommand):
+    help = 'Пересборка поискового индекса участков'
+
+    def handle(self, *args, **options):
+        count = PlotSearchService.refresh()
+        self.stdout.write(
+            self.style.SUCCESS(f'Поисковый индекс обновлен: {count} участков')
+        )
@@ -0,0 +1,82 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import CustomUser
+from sntacc.benchmarks import BenchmarkRunner
+from sntacc.synthetic import SyntheticDataGenerator
+
+class Command(BaseCommand):
+    help = 'Замеры горячих эндпоинтов API и отчетов ReportService с сохранением JSON-отчета'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plots', type=int, default=1000, help='Размер синтетического СНТ')
+        parser.add_argument('--years', type=int, default=3, help='Число лет начислений')
+        parser.add_argument('--existing', action='store_true', help='Замерять на текущих данных без генерации')
+        parser.add_argument('--rounds', type=int, default=5, help='Повторов каждого замера')
+        parser.add_argument('--warmup', type=int, default=1, help='Прогревочных вызовов')
+        parser.add_argument('--filter', default=None, help='Только замеры, имя которых содержит строку')
+        parser.add_argument('--output', default='benchmark-results.json', help='Файл JSON-отчета')
+        parser.add_argument('--compare', default=None, help='Базовый JSON-отчет для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимое замедление (доля)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Код ошибки при регрессии')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Не удалось прочитать базовый отчет: {e}')
+
+        # Тестовые данные и пользователь откатываются после замеров
+        with transaction.atomic():
+            dataset = {}
+            if not options['existing']:
+                dataset = SyntheticDataGenerator(
+                    plots=options['plots'], years=options['years'], prefix='bench-'
+                ).generate()
+                self.stdout.write(f'Сгенерировано: {dataset}')
+            user = CustomUser.objects.create_superuser(
+                'benchmark-runner', 'benchmark@example.com', None, role='admin'
+            )
+            runner = BenchmarkRunner(rounds=options['rounds'], warmup=options['warmup'], user=user)
+            results = runner.run(only=options['filter'], progress=self.print_result)
+            transaction.set_rollback(True)
+
+        report = BenchmarkRunner.report(results, dataset)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Отчет сохранен: {options["output"]}'))
+
+        if baseline is not None:
+            self.print_comparison(results, baseline, options)
+
+    def print_result(self, result):
+        stats = result['stats']
+        self.stdout.write(
+            f'{result["name"]:<28} median {stats["median"] * 1000:8.1f} мс  '
+            f'min {stats["min"] * 1000:8.1f} мс  SQL {stats["queries"]}'
+        )
+
+    def print_comparison(self, results, baseline, options):
+        rows = BenchmarkRunner.compare(results, baseline, options['threshold'])
+        self.stdout.write(f'Сравнение с {baseline.get("commit") or options["compare"]}:')
+        regressions = []
+        for name, old, new, change, regression in rows:
+            line = (
+                f'{name:<28} {old["median"] * 1000:8.1f} -> {new["median"] * 1000:8.1f} мс '
+                f'({change:+.0%}), SQL {old["queries"]} -> {new["queries"]}'
+            )
+            if regression:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессия производительности: {", ".join(regressions)}')
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owners', '0001_initial'),
+        ('plots', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plotowner',
+            index=models.Index(condition=models.Q(('ownership_end__isnull', True)), fields=['plot'], name='plotowner_current_idx'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:11
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# DDL поискового индекса на момент миграции: код приложения может меняться,
+# миграция - нет
+POSTGRESQL_INDEX_SQL = (
+    [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS plots_plotsearchdocument_trgm '
+        'ON plots_plotsearchdocument USING gin (document gin_trgm_ops)',
+    ],
+    [
+        'DROP INDEX IF EXISTS plots_plotsearchdocument_trgm',
+    ],
+)
+
+SQLITE_INDEX_SQL = (
+    [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS plots_plotsearchdocument_fts USING fts5("
+        "document, content='plots_plotsearchdocument', content_rowid='plot_id', tokenize='trigram')",
+        'CREATE TRIGGER IF NOT EXISTS plots_plotsearchdocument_ai AFTER INSERT ON plots_plotsearchdocument BEGIN '
+        'INSERT INTO plots_plotsearchdocument_fts(rowid, document) VALUES (new.plot_id, new.document); END',
+        'CREATE TRIGGER IF NOT EXISTS plots_plotsearchdocument_ad AFTER DELETE ON plots_plotsearchdocument BEGIN '
+        "INSERT INTO plots_plotsearchdocument_fts(plots_plotsearchdocument_fts, rowid, document) "
+        "VALUES ('delete', old.plot_id, old.document); END",
+        'CREATE TRIGGER IF NOT EXISTS plots_plotsearchdocument_au AFTER UPDATE ON plots_plotsearchdocument BEGIN '
+        "INSERT INTO plots_plotsearchdocument_fts(plots_plotsearchdocument_fts, rowid, document) "
+        "VALUES ('delete', old.plot_id, old.document); "
+        'INSERT INTO plots_plotsearchdocument_fts(rowid, document) VALUES (new.plot_id, new.document); END',
+        "INSERT INTO plots_plotsearchdocument_fts(plots_plotsearchdocument_fts) VALUES ('rebuild')",
+    ],
+    [
+        'DROP TRIGGER IF EXISTS plots_plotsearchdocument_ai',
+        'DROP TRIGGER IF EXISTS plots_plotsearchdocument_ad',
+        'DROP TRIGGER IF EXISTS plots_plotsearchdocument_au',
+        'DROP TABLE IF EXISTS plots_plotsearchdocument_fts',
+    ],
+)
+
+
+def index_sql(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        return POSTGRESQL_INDEX_SQL
+    if vendor == 'sqlite':
+        return SQLITE_INDEX_SQL
+    return ([], [])
+
+
+def build_document(plot, owner=None):
+    parts = [plot.plot_number, plot.address]
+    if owner:
+        parts += [owner.full_name, owner.phone, owner.email]
+        digits = re.sub(r'\D', '', owner.phone or '')
+        if digits:
+            parts.append(digits)
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def create_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor)[0]:
+        schema_editor.execute(sql)
+
+    Plot = apps.get_model('plots', 'Plot')
+    PlotOwner = apps.get_model('plots', 'PlotOwner')
+    PlotSearchDocument = apps.get_model('plots', 'PlotSearchDocument')
+
+    current_owners = {}
+    for ownership in PlotOwner.objects.filter(
+        ownership_end__isnull=True
+    ).select_related('owner').order_by('plot_id', '-ownership_start'):
+        current_owners.setdefault(ownership.plot_id, ownership.owner)
+
+    PlotSearchDocument.objects.bulk_create([
+        PlotSearchDocument(
+            plot_id=plot.pk,
+            document=build_document(plot, current_owners.get(plot.pk))
+        )
+        for plot in Plot.objects.all()
+    ], batch_size=500)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor)[1]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0002_plotowner_plotowner_current_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotSearchDocument',
+            fields=[
+                ('plot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='plots.plot', verbose_name='Участок')),
+                ('document', models.TextField(verbose_name='Поисковый текст')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ участка',
+                'verbose_name_plural': 'Поисковые документы участков',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
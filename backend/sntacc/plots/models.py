@@ -19,6 +19,9 @@ class Plot(models.Model):
     @property
     def current_owner(self):
         """Получить текущего владельца участка"""
+        # Использует предзагрузку current_owner_prefetch(), если она есть
+        if hasattr(self, 'current_ownerships'):
+            return self.current_ownerships[0].owner if self.current_ownerships else None
         try:
             plot_owner = self.plotowner_set.filter(
                 ownership_end__isnull=True
@@ -38,10 +41,51 @@ class PlotOwner(models.Model):
         verbose_name = "Владелец участка"
         verbose_name_plural = "Владельцы участков"
         ordering = ['-ownership_start']
+        indexes = [
+            # Текущий владелец: ownership_end IS NULL
+            models.Index(
+                fields=['plot'],
+                condition=models.Q(ownership_end__isnull=True),
+                name='plotowner_current_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.owner} - {self.plot}"
 
     @property
     def is_current_owner(self):
-        return self.ownership_end is None
\ No newline at end of file
+        return self.ownership_end is None
+
+class PlotSearchDocument(models.Model):
+    """Денормализованный поисковый документ участка (см. plots.search)"""
+    plot = models.OneToOneField(
+        Plot,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name="Участок"
+    )
+    document = models.TextField(verbose_name="Поисковый текст")
+
+    class Meta:
+        verbose_name = "Поисковый документ участка"
+        verbose_name_plural = "Поисковые документы участков"
+
+    def __str__(self):
+        return self.document
+
+
+
+def current_owner_prefetch(lookup='plotowner_set'):
+    """
+    Prefetch текущего владения для списков участков: Plot.current_owner
+    берет владельца из предзагрузки вместо запроса на каждую строку.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=PlotOwner.objects.filter(
+            ownership_end__isnull=True
+        ).select_related('owner').order_by('-ownership_start'),
+        to_attr='current_ownerships'
+    )
@@ -0,0 +1,271 @@
+import re
+from functools import lru_cache
+
+from django.db import connection, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Plot, PlotOwner, PlotSearchDocument
+
+SEARCH_TABLE = PlotSearchDocument._meta.db_table
+FTS_TABLE = f'{SEARCH_TABLE}_fts'
+
+
+def normalize(text):
+    """Приведение текста к виду, в котором он хранится в индексе"""
+    return ' '.join(str(text or '').lower().replace('ё', 'е').split())
+
+
+def trigrams(text):
+    trigram_set = set()
+    for word in text.split():
+        padded = f'  {word} '
+        trigram_set.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigram_set
+
+
+def similarity(query, document):
+    """Доля триграмм запроса, найденных в документе (аналог word_similarity)"""
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return 0
+    return len(query_trigrams & trigrams(document)) / len(query_trigrams)
+
+
+def fts_quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def like_quote(term):
+    return '%' + re.sub(r'([\\%_])', r'\\\1', term) + '%'
+
+
+@lru_cache(maxsize=None)
+def _table_exists(alias, database, table):
+    return table in connections[alias].introspection.table_names()
+
+
+def table_exists(table):
+    """
+    Наличие таблицы в текущей базе без запроса к схеме на каждый поиск:
+    результат кэшируется до следующего migrate (reset_table_cache).
+    """
+    return _table_exists(connection.alias, str(connection.settings_dict['NAME']), table)
+
+
+def reset_table_cache():
+    _table_exists.cache_clear()
+
+
+class PlotSearchService:
+    """
+    Поиск участков по денормализованному документу (номер, адрес и контакты
+    текущего владельца). PostgreSQL использует GIN-индекс pg_trgm,
+    SQLite - FTS5 с триграммным токенизатором, прочие СУБД - icontains.
+    Опечатки допускаются за счет сравнения по триграммам.
+    """
+    # Только для ранжированной выдачи search(); condition() как фильтр не ограничен
+    RESULTS_LIMIT = 500
+    FUZZY_THRESHOLD = 0.5
+    MIN_TERM_LENGTH = 3
+
+    @staticmethod
+    def build_document(plot, owner=None):
+        parts = [plot.plot_number, plot.address]
+        if owner:
+            parts += [owner.full_name, owner.phone, owner.email]
+            # Телефон также только цифрами: "8 (916) 123-45-67" -> "89161234567"
+            digits = re.sub(r'\D', '', owner.phone or '')
+            if digits:
+                parts.append(digits)
+        return normalize(' '.join(part for part in parts if part))
+
+    @staticmethod
+    def refresh(plot_ids=None):
+        """Пересборка поисковых документов указанных участков (None - всех)"""
+        plots = Plot.objects.all()
+        ownerships = PlotOwner.objects.filter(ownership_end__isnull=True)
+        if plot_ids is not None:
+            plot_ids = list(plot_ids)
+            plots = plots.filter(pk__in=plot_ids)
+            ownerships = ownerships.filter(plot_id__in=plot_ids)
+
+        current_owners = {}
+        for ownership in ownerships.select_related('owner').order_by('plot_id', '-ownership_start'):
+            current_owners.setdefault(ownership.plot_id, ownership.owner)
+
+        documents = [
+            PlotSearchDocument(
+                plot_id=plot.pk,
+                document=PlotSearchService.build_document(plot, current_owners.get(plot.pk))
+            )
+            for plot in plots.only('id', 'plot_number', 'address')
+        ]
+        PlotSearchDocument.objects.bulk_create(
+            documents,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['plot'],
+            update_fields=['document']
+        )
+        return len(documents)
+
+    @staticmethod
+    def refresh_for_owner(owner_id):
+        plot_ids = PlotOwner.objects.filter(
+            owner_id=owner_id,
+            ownership_end__isnull=True
+        ).values_list('plot_id', flat=True)
+        return PlotSearchService.refresh(plot_ids)
+
+    @staticmethod
+    def search(query, limit=None):
+        """Идентификаторы участков, упорядоченные по релевантности (не более limit)"""
+        query = normalize(query)
+        if not query:
+            return []
+        limit = limit or PlotSearchService.RESULTS_LIMIT
+
+        if connection.vendor == 'postgresql':
+            return PlotSearchService._search_postgresql(query, limit)
+        if connection.vendor == 'sqlite' and PlotSearchService._has_fts_table():
+            return PlotSearchService._search_sqlite(query, limit)
+        return PlotSearchService._search_fallback(query, limit)
+
+    @staticmethod
+    def _has_fts_table():
+        return table_exists(FTS_TABLE)
+
+    @staticmethod
+    def _postgresql_sql(query):
+        terms = query.split()
+        like_sql = ' AND '.join(['document LIKE %s'] * len(terms))
+        like_params = [like_quote(term) for term in terms]
+        # "<%" использует GIN-индекс и допускает опечатки
+        where_sql = f'({like_sql}) OR %s <%% document'
+        return like_sql, like_params, where_sql, like_params + [query]
+
+    @staticmethod
+    def _search_postgresql(query, limit):
+        like_sql, like_params, where_sql, where_params = PlotSearchService._postgresql_sql(query)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT plot_id FROM {SEARCH_TABLE} WHERE {where_sql} '
+                f'ORDER BY ({like_sql}) DESC, word_similarity(%s, document) DESC, plot_id '
+                f'LIMIT %s',
+                where_params + like_params + [query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _sqlite_sql(query):
+        """
+        Условия поиска в FTS5: (слова запроса не короче MIN_TERM_LENGTH,
+        точное совпадение, нечеткое совпадение), условие - (SQL, параметры)
+        для FROM ... WHERE. Короткие слова (номер участка "5") триграммы
+        не покрывают - по ним фильтруем LIKE.
+        """
+        terms = query.split()
+        long_terms = [term for term in terms if len(term) >= PlotSearchService.MIN_TERM_LENGTH]
+        short_terms = [term for term in terms if len(term) < PlotSearchService.MIN_TERM_LENGTH]
+        base_sql = (
+            f'FROM {FTS_TABLE} f JOIN {SEARCH_TABLE} d ON d.plot_id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s'
+            + ''.join(" AND d.document LIKE %s ESCAPE '\\'" for _ in short_terms)
+        )
+        short_params = [like_quote(term) for term in short_terms]
+
+        exact = (base_sql, [' AND '.join(fts_quote(t) for t in long_terms)] + short_params)
+        # Нечеткий поиск: любая из триграмм и доля совпадений не ниже порога
+        # (word_similarity регистрируется на соединении, см. plots.signals)
+        query_trigrams = sorted(t for t in trigrams(' '.join(long_terms)) if t.strip() == t)
+        fuzzy = None
+        if query_trigrams:
+            fuzzy = (
+                base_sql + ' AND word_similarity(%s, d.document) >= %s',
+                [' OR '.join(fts_quote(t) for t in query_trigrams)] + short_params
+                + [' '.join(long_terms), PlotSearchService.FUZZY_THRESHOLD]
+            )
+        return long_terms, exact, fuzzy
+
+    @staticmethod
+    def _search_sqlite(query, limit):
+        long_terms, exact, fuzzy = PlotSearchService._sqlite_sql(query)
+        if not long_terms:
+            return PlotSearchService._search_fallback(query, limit)
+
+        with connection.cursor() as cursor:
+            # Точное совпадение подстрок
+            cursor.execute(f'SELECT f.rowid {exact[0]} ORDER BY f.rank LIMIT %s', exact[1] + [limit])
+            results = [row[0] for row in cursor.fetchall()]
+            if len(results) >= limit or fuzzy is None:
+                return results
+
+            cursor.execute(
+                f'SELECT f.rowid {fuzzy[0]} '
+                f'ORDER BY word_similarity(%s, d.document) DESC, f.rowid LIMIT %s',
+                fuzzy[1] + [' '.join(long_terms), limit + len(results)]
+            )
+            found = set(results)
+            results += [row[0] for row in cursor.fetchall() if row[0] not in found]
+        return results[:limit]
+
+    @staticmethod
+    def _fallback_queryset(query):
+        condition = Q()
+        for term in query.split():
+            condition &= Q(document__contains=term)
+        return PlotSearchDocument.objects.filter(condition)
+
+    @staticmethod
+    def _search_fallback(query, limit):
+        return list(
+            PlotSearchService._fallback_queryset(query)
+            .order_by('plot_id')
+            .values_list('plot_id', flat=True)[:limit]
+        )
+
+    @staticmethod
+    def condition(query, field='pk'):
+        """
+        Условие "участок найден" для filter(): подзапрос к поисковому
+        индексу без ограничения RESULTS_LIMIT.
+        """
+        query = normalize(query)
+        lookup = f'{field}__in'
+        if not query:
+            return Q(**{lookup: []})
+
+        if connection.vendor == 'postgresql':
+            _, _, where_sql, where_params = PlotSearchService._postgresql_sql(query)
+            return Q(**{lookup: RawSQL(f'SELECT plot_id FROM {SEARCH_TABLE} WHERE {where_sql}', where_params)})
+
+        if connection.vendor == 'sqlite' and PlotSearchService._has_fts_table():
+            long_terms, exact, fuzzy = PlotSearchService._sqlite_sql(query)
+            if long_terms:
+                condition = Q(**{lookup: RawSQL(f'SELECT f.rowid {exact[0]}', exact[1])})
+                if fuzzy is not None:
+                    condition |= Q(**{lookup: RawSQL(f'SELECT f.rowid {fuzzy[0]}', fuzzy[1])})
+                return condition
+
+        return Q(**{lookup: PlotSearchService._fallback_queryset(query).values('plot_id')})
+
+    @staticmethod
+    def filter_queryset(queryset, query, field='pk', ranked=False):
+        """
+        Ограничение queryset найденными участками.
+
+        field - поле со ссылкой на участок ('pk' для Plot, 'plot_id' для Payment);
+        ranked=True упорядочивает результат по релевантности: первые
+        RESULTS_LIMIT по рангу, остальные найденные - после них.
+        """
+        queryset = queryset.filter(PlotSearchService.condition(query, field))
+        if ranked:
+            plot_ids = PlotSearchService.search(query)
+            if plot_ids:
+                queryset = queryset.order_by(Case(
+                    *[When(**{field: plot_id}, then=position) for position, plot_id in enumerate(plot_ids)],
+                    default=Value(len(plot_ids)),
+                    output_field=IntegerField()
+                ), field)
+        return queryset
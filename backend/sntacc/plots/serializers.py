@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from sntacc.fastlist import RowMapper, as_datetime, as_string
+from sntacc.selection import SelectableFieldsMixin
+from payments.models import PlotBalance
 from .models import Plot, PlotOwner
 
 class OwnerSerializer(serializers.Serializer):
@@ -14,14 +17,25 @@ class PlotOwnerSerializer(serializers.ModelSerializer):
         model = PlotOwner
         fields = ['id', 'owner', 'ownership_start', 'ownership_end', 'is_current_owner']
 
-class PlotSerializer(serializers.ModelSerializer):
+class PlotBalanceShortSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PlotBalance
+        fields = ['charged_total', 'paid_total', 'debt', 'debt_current',
+                 'debt_1_year', 'debt_2_years_plus', 'oldest_debt_year', 'updated_at']
+
+class PlotSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     current_owner = serializers.SerializerMethodField()
+    owners_history = PlotOwnerSerializer(source='plotowner_set', many=True, read_only=True)
+    balance = PlotBalanceShortSerializer(read_only=True, allow_null=True)
     
     class Meta:
         model = Plot
         fields = ['id', 'plot_number', 'address', 'area', 'current_owner', 
-                 'created_at', 'updated_at']
+                 'created_at', 'updated_at', 'owners_history', 'balance']
         read_only_fields = ['created_at', 'updated_at']
+        # ?expand=history - история владения, ?expand=balance - баланс участка
+        expandable_fields = {'history': 'owners_history', 'balance': 'balance'}
+        field_dependencies = {'current_owner': ['plotowner_set']}
     
     def get_current_owner(self, obj):
         try:
@@ -37,8 +51,62 @@ class PlotSerializer(serializers.ModelSerializer):
             print(f"Ошибка в get_current_owner: {e}")
         return None
 
-class PlotDetailSerializer(PlotSerializer):
-    owners_history = PlotOwnerSerializer(source='plotowner_set', many=True, read_only=True)
+class UnpaidPlotSerializer(PlotSerializer):
+    """Участок-должник за несколько лет (context: years, paid_years)"""
+    outstanding_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    unpaid_years = serializers.SerializerMethodField()
     
     class Meta(PlotSerializer.Meta):
-        fields = PlotSerializer.Meta.fields + ['owners_history']
\ No newline at end of file
+        fields = PlotSerializer.Meta.fields + ['outstanding_amount', 'unpaid_years']
+    
+    def get_unpaid_years(self, obj):
+        paid = self.context.get('paid_years', {}).get(obj.id, set())
+        return [year for year in self.context.get('years', []) if year not in paid]
+
+def current_owners_by_plot(plot_ids, blank_contacts=False):
+    """
+    Текущие владельцы участков одним запросом: {plot_id: {...}}.
+    plot_ids - список или подзапрос; blank_contacts заменяет пустые
+    телефон и email на '' (как PlotSerializer).
+    """
+    contact = as_string if blank_contacts else (lambda value: value)
+    owners = {}
+    for plot_id, owner_id, full_name, phone, email in PlotOwner.objects.filter(
+        plot_id__in=plot_ids,
+        ownership_end__isnull=True
+    ).order_by('plot_id', '-ownership_start').values_list(
+        'plot_id', 'owner_id', 'owner__full_name', 'owner__phone', 'owner__email'
+    ):
+        if plot_id not in owners:
+            owners[plot_id] = {
+                'id': owner_id,
+                'full_name': full_name,
+                'phone': contact(phone),
+                'email': contact(email)
+            }
+    return owners
+
+class FastPlotListSerializer:
+    """Список участков из values_list() (формат PlotSerializer без раскрытий)"""
+    expandable = ()
+
+    mapper = RowMapper([
+        ('id', 'id', None),
+        ('plot_number', 'plot_number', None),
+        ('address', 'address', None),
+        ('area', 'area', None),
+        ('current_owner', 'id', None),
+        ('created_at', 'created_at', as_datetime),
+        ('updated_at', 'updated_at', as_datetime),
+    ])
+
+    @classmethod
+    def serialize(cls, queryset, fields=None, expand=()):
+        if fields is None or 'current_owner' in fields:
+            owners = current_owners_by_plot(queryset.order_by().values('pk'), blank_contacts=True)
+        else:
+            owners = {}
+        data = [cls.mapper(row) for row in cls.mapper.rows(queryset)]
+        for item in data:
+            item['current_owner'] = owners.get(item['current_owner'])
+        return data
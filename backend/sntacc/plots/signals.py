@@ -0,0 +1,43 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from owners.models import Owner
+from .models import Plot, PlotOwner
+from .search import PlotSearchService, reset_table_cache, similarity
+
+
+@receiver(post_save, sender=Plot)
+def refresh_plot_search_document(sender, instance, raw=False, **kwargs):
+    """Обновление поискового документа при изменении участка"""
+    if not raw:
+        PlotSearchService.refresh([instance.pk])
+
+
+@receiver(post_save, sender=PlotOwner)
+@receiver(post_delete, sender=PlotOwner)
+def refresh_plot_owner_search_document(sender, instance, raw=False, origin=None, **kwargs):
+    """Смена владельца меняет контакты в поисковом документе участка"""
+    # При каскадном удалении участка документ удаляется вместе с ним
+    if raw or getattr(origin, 'model', type(origin)) is Plot:
+        return
+    PlotSearchService.refresh([instance.plot_id])
+
+
+@receiver(post_save, sender=Owner)
+def refresh_owner_search_documents(sender, instance, created=False, raw=False, **kwargs):
+    """Изменение ФИО или контактов владельца"""
+    if not raw and not created:
+        PlotSearchService.refresh_for_owner(instance.pk)
+
+
+@receiver(post_migrate)
+def reset_search_table_cache(sender, **kwargs):
+    """Миграции создают и удаляют FTS-таблицы - проверяем их наличие заново"""
+    reset_table_cache()
+
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    """Нечеткий поиск в SQLite: word_similarity как в pg_trgm, для отбора в запросе"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('word_similarity', 2, similarity, deterministic=True)
@@ -1,3 +1,110 @@
+from datetime import date
+from unittest import mock
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from owners.models import Owner
+from payments.models import Payment
+from payments.services import LedgerService
+from .models import Plot, PlotOwner
+from .search import PlotSearchService
+
+
+class PlotSearchTests(TestCase):
+    """Поиск участков как ранжированная выдача и как фильтр списков"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Owner.objects.create(full_name='Петров Петр', phone='8 (916) 123-45-67')
+        cls.plots = [
+            Plot.objects.create(plot_number=str(number), address=f'Лесная улица, {number}')
+            for number in range(1, 6)
+        ]
+        cls.other = Plot.objects.create(plot_number='10', address='Полевая улица')
+        PlotOwner.objects.create(plot=cls.other, owner=cls.owner, ownership_start=date(2020, 1, 1))
+        for plot in cls.plots + [cls.other]:
+            Payment.objects.create(plot=plot, year=2024, amount=1000)
+
+    def test_search_matches_owner_contacts(self):
+        self.assertEqual(PlotSearchService.search('петров'), [self.other.pk])
+        self.assertEqual(PlotSearchService.search('89161234567'), [self.other.pk])
+
+    def test_search_tolerates_typos(self):
+        found = PlotSearchService.search('лесноя')
+        self.assertEqual(set(found), {plot.pk for plot in self.plots})
+
+    def test_filter_is_not_limited_by_results_limit(self):
+        with mock.patch.object(PlotSearchService, 'RESULTS_LIMIT', 2):
+            self.assertEqual(len(PlotSearchService.search('лесная')), 2)
+            queryset = PlotSearchService.filter_queryset(Plot.objects.all(), 'лесная')
+            self.assertEqual(queryset.count(), 5)
+            queryset = PlotSearchService.filter_queryset(Plot.objects.all(), 'лесноя')
+            self.assertEqual(queryset.count(), 5)
+            queryset = PlotSearchService.filter_queryset(Payment.objects.all(), 'лесная', field='plot_id')
+            self.assertEqual(queryset.count(), 5)
+
+            response = APIClient().get('/api/payments/', {'search': 'лесная'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), 5)
+
+    def test_ranked_filter_keeps_all_matches(self):
+        with mock.patch.object(PlotSearchService, 'RESULTS_LIMIT', 2):
+            ranked = list(PlotSearchService.filter_queryset(Plot.objects.all(), 'лесная', ranked=True))
+        self.assertEqual(len(ranked), 5)
+        self.assertEqual([plot.pk for plot in ranked[:2]], PlotSearchService.search('лесная', limit=2))
+
+    def test_owner_list_search(self):
+        response = APIClient().get('/api/owners/', {'search': 'полевая'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data], [self.owner.pk])
+
+    def test_fts_table_check_is_cached(self):
+        PlotSearchService._has_fts_table()
+        with self.assertNumQueries(0):
+            PlotSearchService._has_fts_table()
+
+
+class UnpaidPlotsTests(TestCase):
+    """Отчет по участкам без оплаты за год или за несколько лет"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = Owner.objects.create(full_name='Сидоров Сидор')
+        cls.paid = Plot.objects.create(plot_number='1', address='Садовая')
+        cls.unpaid = Plot.objects.create(plot_number='2', address='Садовая')
+        cls.no_payments = Plot.objects.create(plot_number='3', address='Луговая')
+        PlotOwner.objects.create(plot=cls.unpaid, owner=owner, ownership_start=date(2020, 1, 1))
+        Payment.objects.create(plot=cls.paid, year=2023, amount=1000, status='not_paid')
+        Payment.objects.create(plot=cls.paid, year=2024, amount=1000, status='paid', date_paid=date(2024, 5, 1))
+        Payment.objects.create(plot=cls.unpaid, year=2023, amount=1000, status='not_paid')
+        partial = Payment.objects.create(plot=cls.unpaid, year=2024, amount=1500)
+        LedgerService.add_payment(partial, 600, date=date(2024, 6, 1))
+
+    def get(self, **params):
+        response = APIClient().get('/api/plots/unpaid_plots/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.data}
+
+    def test_single_year(self):
+        rows = self.get(year=2024)
+        self.assertEqual(set(rows), {self.unpaid.pk, self.no_payments.pk})
+        self.assertEqual(rows[self.unpaid.pk]['current_owner']['full_name'], 'Сидоров Сидор')
+        self.assertIsNone(rows[self.no_payments.pk]['current_owner'])
+
+    def test_several_years(self):
+        rows = self.get(years='2023,2024')
+        self.assertEqual(set(rows), {self.paid.pk, self.unpaid.pk, self.no_payments.pk})
+        self.assertEqual(rows[self.paid.pk]['unpaid_years'], [2023])
+        self.assertEqual(rows[self.paid.pk]['outstanding_amount'], '1000.00')
+        self.assertEqual(rows[self.unpaid.pk]['unpaid_years'], [2023, 2024])
+        # 1000 за 2023 и остаток 900 из 1500 за 2024
+        self.assertEqual(rows[self.unpaid.pk]['outstanding_amount'], '1900.00')
+        self.assertEqual(rows[self.no_payments.pk]['outstanding_amount'], '0.00')
+
+    def test_search(self):
+        self.assertEqual(set(self.get(year=2024, search='луговая')), {self.no_payments.pk})
 
-# Create your tests here.
+    def test_invalid_year(self):
+        response = APIClient().get('/api/plots/unpaid_plots/', {'years': '2024,abc'})
+        self.assertEqual(response.status_code, 400)
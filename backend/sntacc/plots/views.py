@@ -2,16 +2,27 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Q
+from decimal import Decimal
+from django.db.models import DecimalField, Exists, F, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
-from .models import Plot, PlotOwner
-from .serializers import PlotSerializer, PlotDetailSerializer
+from .models import Plot, PlotOwner, current_owner_prefetch
+from .serializers import PlotSerializer, UnpaidPlotSerializer, FastPlotListSerializer
+from .search import PlotSearchService
 from owners.models import Owner
+from payments.models import PlotBalance
+from sntacc.conditional import ConditionalGetMixin
+from sntacc.fastlist import FastListMixin
+from sntacc.selection import FieldSelectionMixin
 
-class PlotViewSet(viewsets.ModelViewSet):
+class PlotViewSet(ConditionalGetMixin, FieldSelectionMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Plot.objects.all()
     serializer_class = PlotSerializer
     permission_classes = [AllowAny]
+    # PlotBalance - для ?expand=balance
+    conditional_models = (Plot, PlotOwner, Owner, PlotBalance)
+    fast_serializer_class = FastPlotListSerializer
+    default_expand = {'retrieve': ['history']}
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -25,10 +36,7 @@ class PlotViewSet(viewsets.ModelViewSet):
         area_max = self.request.query_params.get('area_max', None)
         
         if search:
-            queryset = queryset.filter(
-                Q(plot_number__icontains=search) |
-                Q(address__icontains=search)
-            )
+            queryset = PlotSearchService.filter_queryset(queryset, search, ranked=True)
         
         if plot_number:
             queryset = queryset.filter(plot_number__icontains=plot_number)
@@ -48,12 +56,12 @@ class PlotViewSet(viewsets.ModelViewSet):
         if area_max:
             queryset = queryset.filter(area__lte=area_max)
         
-        return queryset  # Убран select_related('current_owner')
-
-    def get_serializer_class(self):
-        if self.action == 'retrieve':
-            return PlotDetailSerializer
-        return PlotSerializer
+        queryset = queryset.prefetch_related(current_owner_prefetch())
+        if 'history' in self.get_requested_expand():
+            queryset = queryset.prefetch_related(
+                Prefetch('plotowner_set', queryset=PlotOwner.objects.select_related('owner'))
+            )
+        return queryset
 
     @action(detail=True, methods=['post'], permission_classes=[AllowAny])
     def add_owner(self, request, pk=None):
@@ -92,32 +100,63 @@ class PlotViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def unpaid_plots(self, request):
-        """Получить список участков с неоплаченными платежами"""
+        """
+        Получить список участков с неоплаченными платежами
+
+        year - год (по умолчанию 2024); years=2022,2023,2024 - несколько лет,
+        тогда для каждого участка возвращаются неоплаченные годы и сумма долга.
+        """
         from payments.models import Payment
-        from django.db.models import Q
         
-        year = request.query_params.get('year', 2024)
+        try:
+            years = [int(y) for y in request.query_params.get('years', '').split(',') if y.strip()]
+            year = int(request.query_params.get('year', 2024))
+        except (ValueError, TypeError):
+            return Response({'error': 'Некорректный год'}, status=status.HTTP_400_BAD_REQUEST)
         search = request.query_params.get('search', None)
         
-        unpaid_plots = Plot.objects.filter(
-            ~Q(payment__year=year, payment__status='paid')
-        ).distinct()
+        # Анти-join: участок без оплаченного платежа за год (индекс plot, year)
+        unpaid_condition = Q()
+        for unpaid_year in years or [year]:
+            unpaid_condition |= ~Exists(Payment.objects.filter(
+                plot=OuterRef('pk'), year=unpaid_year, status='paid'
+            ))
+        unpaid_plots = Plot.objects.filter(unpaid_condition).prefetch_related(
+            current_owner_prefetch()
+        )
+        
+        context = self.get_serializer_context()
+        if years:
+            # Долг - остаток начислений за вычетом поступлений (частичные оплаты)
+            outstanding = Payment.objects.filter(
+                plot=OuterRef('pk'), year__in=years
+            ).exclude(status='paid').order_by().values('plot').annotate(
+                total=Sum(F('amount') - F('paid_total'))
+            ).values('total')
+            unpaid_plots = unpaid_plots.annotate(
+                outstanding_amount=Coalesce(
+                    Subquery(outstanding), Value(Decimal('0')), output_field=DecimalField()
+                )
+            )
         
         # Применяем поиск
         if search:
-            unpaid_plots = unpaid_plots.filter(
-                Q(plot_number__icontains=search) |
-                Q(address__icontains=search) |
-                Q(plotowner__owner__full_name__icontains=search,
-                  plotowner__ownership_end__isnull=True)
-            )
+            unpaid_plots = PlotSearchService.filter_queryset(unpaid_plots, search)
+        
+        if years:
+            # Оплаченные годы - только участков из ответа
+            paid_years = {}
+            for plot_id, paid_year in Payment.objects.filter(
+                year__in=years, status='paid', plot__in=unpaid_plots.values('pk')
+            ).values_list('plot_id', 'year'):
+                paid_years.setdefault(plot_id, set()).add(paid_year)
+            context.update({'years': years, 'paid_years': paid_years})
         
-        serializer = self.get_serializer(unpaid_plots, many=True)
+        serializer_class = UnpaidPlotSerializer if years else self.get_serializer_class()
+        serializer = serializer_class(unpaid_plots, many=True, context=context)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def search(self, request):
         """Поиск участков"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.fast_response(self.get_queryset())
\ No newline at end of file
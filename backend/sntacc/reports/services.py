@@ -5,10 +5,12 @@ from datetime import datetime
 from django.conf import settings
 from django.http import HttpResponse
 from django.core.paginator import Paginator
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
 from .models import GeneratedReport, ReportTemplate
-from plots.models import Plot
+from plots.models import Plot, current_owner_prefetch
 from owners.models import Owner
-from payments.models import Payment
+from payments.models import Payment, PaymentTransaction
 
 class ReportService:
     @staticmethod
@@ -17,22 +19,22 @@ class ReportService:
         if year is None:
             year = datetime.now().year
             
-        # Получаем данные по платежам
-        payments = Payment.objects.filter(year=year).select_related('plot__current_owner')
-        
-        # Статистика по статусам
+        # Статистика по статусам одним агрегирующим запросом
         stats = {}
-        for payment in payments:
-            status = payment.status
-            if status not in stats:
-                stats[status] = {'count': 0, 'amount': 0}
-            stats[status]['count'] += 1
-            stats[status]['amount'] += float(payment.amount)
+        for row in Payment.objects.filter(year=year).values('status').annotate(
+            count=Count('id'), amount=Sum('amount'), paid=Sum('paid_total')
+        ):
+            stats[row['status']] = {
+                'count': row['count'],
+                'amount': float(row['amount'] or 0),
+                'paid_amount': float(row['paid'] or 0)
+            }
         
         # Общая статистика
         total_plots = Plot.objects.count()
         paid_count = stats.get('paid', {}).get('count', 0)
-        paid_amount = stats.get('paid', {}).get('amount', 0)
+        # Поступления учитываются и по частично оплаченным начислениям
+        paid_amount = sum(item['paid_amount'] for item in stats.values())
         
         report_data = {
             'year': year,
@@ -57,7 +59,7 @@ class ReportService:
         unpaid_payments = Payment.objects.filter(
             year=year, 
             status__in=['not_paid', 'partial']
-        ).select_related('plot__current_owner')
+        ).select_related('plot').prefetch_related(current_owner_prefetch('plot__plotowner_set'))
         
         debtors = []
         total_debt = 0
@@ -65,17 +67,16 @@ class ReportService:
         for payment in unpaid_payments:
             owner = payment.plot.current_owner
             if owner:
-                debt_amount = float(payment.amount)
-                if payment.status == 'partial':
-                    # Для частичной оплаты нужно вычесть оплаченную часть
-                    # Пока считаем полную сумму как долг
-                    pass
+                # Долг - остаток начисления за вычетом поступлений
+                debt_amount = float(payment.debt)
                 
                 debtors.append({
                     'plot_number': payment.plot.plot_number,
                     'owner_name': owner.full_name,
                     'owner_phone': owner.phone,
                     'owner_email': owner.email,
+                    'charged_amount': float(payment.amount),
+                    'paid_amount': float(payment.paid_total),
                     'debt_amount': debt_amount,
                     'status': payment.get_status_display()
                 })
@@ -99,29 +100,23 @@ class ReportService:
         if end_date is None:
             end_date = datetime.now()
             
-        # Получаем оплаченные платежи за период
-        paid_payments = Payment.objects.filter(
-            date_paid__range=[start_date, end_date],
-            status='paid'
-        ).select_related('plot')
-        
-        monthly_data = {}
-        total_income = 0
-        
-        for payment in paid_payments:
-            month_key = payment.date_paid.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'month': month_key,
-                    'count': 0,
-                    'amount': 0
-                }
-            monthly_data[month_key]['count'] += 1
-            monthly_data[month_key]['amount'] += float(payment.amount)
-            total_income += float(payment.amount)
+        # Поступления за период из журнала (включая частичные оплаты),
+        # сгруппированные по месяцам в базе
+        monthly = PaymentTransaction.objects.filter(
+            date__range=[start_date, end_date]
+        ).annotate(month=TruncMonth('date')).values('month').annotate(
+            count=Count('id'), amount=Sum('amount')
+        ).order_by('month')
         
-        # Сортируем по месяцам
-        sorted_data = sorted(monthly_data.values(), key=lambda x: x['month'])
+        sorted_data = [
+            {
+                'month': row['month'].strftime('%Y-%m'),
+                'count': row['count'],
+                'amount': float(row['amount'])
+            }
+            for row in monthly
+        ]
+        total_income = sum(item['amount'] for item in sorted_data)
         
         report_data = {
             'period_start': start_date.isoformat(),
@@ -0,0 +1,147 @@
+import platform
+import statistics
+import subprocess
+import time
+
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reports.services import ReportService
+from .instrumentation import QueryTimer
+
+# Горячие эндпоинты: (имя замера, имя url, функция -> параметры запроса)
+ENDPOINTS = [
+    ('plots_list', 'plot-list', lambda: {}),
+    ('plots_list_expanded', 'plot-list', lambda: {'expand': 'history,balance'}),
+    ('plots_search', 'plot-search', lambda: {'search': 'Иванов'}),
+    ('plots_unpaid', 'plot-unpaid-plots', lambda: {'year': timezone.localdate().year}),
+    ('payments_list', 'payment-list', lambda: {}),
+    ('payments_by_year', 'payment-by-year', lambda: {'year': timezone.localdate().year}),
+    ('payments_statistics', 'payment-statistics', lambda: {}),
+    ('payments_aging', 'payment-aging', lambda: {}),
+    ('owners_list', 'owner-list', lambda: {}),
+    ('documents_list', 'document-list', lambda: {}),
+    ('documents_statistics', 'document-statistics', lambda: {}),
+    ('tasks_list', 'task-list', lambda: {}),
+    ('audit_recent', 'auditlog-recent', lambda: {}),
+]
+
+# Методы ReportService: (имя замера, функция)
+REPORTS = [
+    ('report_payment_summary', lambda: ReportService.generate_payment_summary()),
+    ('report_debt', lambda: ReportService.generate_debt_report()),
+    ('report_financial', lambda: ReportService.generate_financial_report()),
+]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BenchmarkRunner:
+    """
+    Набор замеров в духе pytest-benchmark без внешних зависимостей:
+    каждый случай прогревается warmup раз, затем выполняется rounds раз;
+    в результат идут min/max/mean/median/stddev (секунды) и число
+    SQL-запросов одного вызова. Результат сохраняется в JSON и
+    сравнивается с базовым файлом предыдущего коммита.
+    """
+
+    def __init__(self, rounds=5, warmup=1, user=None):
+        self.rounds = rounds
+        self.warmup = warmup
+        self.client = APIClient()
+        if user is not None:
+            self.client.force_authenticate(user)
+
+    def cases(self):
+        for name, url_name, params in ENDPOINTS:
+            yield name, 'api', self.endpoint_case(url_name, params)
+        for name, func in REPORTS:
+            yield name, 'reports', func
+
+    def endpoint_case(self, url_name, params):
+        url = reverse(url_name)
+
+        def call():
+            response = self.client.get(url, params())
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: HTTP {response.status_code}')
+            return response
+        return call
+
+    def measure(self, func):
+        for _ in range(self.warmup):
+            func()
+        # Число запросов считается через execute_wrapper: журнал
+        # connection.queries при DEBUG ограничен и может быть заполнен
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            func()
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return {
+            'min': min(timings),
+            'max': max(timings),
+            'mean': statistics.fmean(timings),
+            'median': statistics.median(timings),
+            'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'rounds': len(timings),
+            'queries': queries.count,
+        }
+
+    def run(self, only=None, progress=None):
+        """only - подстрока имени для выбора замеров; progress(result) - после каждого"""
+        results = []
+        for name, group, func in self.cases():
+            if only and only not in name:
+                continue
+            result = {'name': name, 'group': group, 'stats': self.measure(func)}
+            results.append(result)
+            if progress:
+                progress(result)
+        return results
+
+    @staticmethod
+    def report(results, dataset=None):
+        return {
+            'commit': current_commit(),
+            'datetime': timezone.now().isoformat(),
+            'machine_info': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'database': connection.vendor,
+            },
+            'dataset': dataset or {},
+            'benchmarks': results,
+        }
+
+    @staticmethod
+    def compare(results, baseline, threshold=0.2):
+        """
+        Сравнение медиан с базовым отчетом: [(имя, было, стало, изменение,
+        регрессия)]. Регрессия - замедление больше threshold (доля) или
+        рост числа SQL-запросов.
+        """
+        previous = {item['name']: item['stats'] for item in baseline.get('benchmarks', [])}
+        rows = []
+        for result in results:
+            old = previous.get(result['name'])
+            if old is None:
+                continue
+            new = result['stats']
+            change = (new['median'] - old['median']) / old['median'] if old['median'] else 0.0
+            regression = change > threshold or new['queries'] > old['queries']
+            rows.append((result['name'], old, new, change, regression))
+        return rows
@@ -0,0 +1,99 @@
+import hashlib
+from functools import wraps
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from audit.models import TableVersion
+
+# СУБД, для которых миграция audit создает триггеры счетчиков изменений
+VERSIONED_VENDORS = ('sqlite', 'postgresql')
+
+
+def table_versions(models):
+    """
+    Версии таблиц одним запросом: [(модель, версия, время изменения)].
+    Версию увеличивает триггер в транзакции изменения (audit.TableVersion),
+    поэтому ее видно сразу после коммита, включая пакетные операции.
+    """
+    labels = sorted({model._meta.label_lower for model in models})
+    versions = list(
+        TableVersion.objects.filter(label__in=labels)
+        .order_by('label')
+        .values_list('label', 'version', 'updated_at')
+    )
+    if len(versions) != len(labels):
+        missing = set(labels) - {row[0] for row in versions}
+        raise ImproperlyConfigured(
+            f"Нет счетчика изменений для {', '.join(sorted(missing))}: добавьте триггер миграцией audit"
+        )
+    return versions
+
+
+def last_modified_timestamp(versions):
+    timestamps = [row[2].timestamp() for row in versions if row[2] is not None]
+    return int(max(timestamps)) if timestamps else None
+
+
+def conditional_response(request, models, get_response):
+    """
+    Условный GET: ETag по версиям таблиц, от которых зависит ответ.
+
+    Если клиент прислал совпадающий If-None-Match, возвращается 304 без
+    выборки и сериализации данных - стоимость запроса одно чтение по
+    первичному ключу таблицы счетчиков. Версии читаются до выборки данных:
+    изменение между ними дает лишний 200, но не устаревший 304.
+    """
+    if request.method not in ('GET', 'HEAD') or connection.vendor not in VERSIONED_VENDORS:
+        return get_response()
+
+    versions = table_versions(models)
+    key = repr((
+        [row[:2] for row in versions], request.get_full_path(), request.META.get('HTTP_ACCEPT', '')
+    ))
+    etag = '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+    last_modified = last_modified_timestamp(versions)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит ответ, но перепроверяет его при каждом обращении
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional_get(*models):
+    """
+    Декоратор метода ViewSet: ответ кешируется клиентом по ETag.
+    Без аргументов используются conditional_models представления.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            return conditional_response(
+                request,
+                models or self.conditional_models,
+                lambda: view_method(self, request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """Условный GET для list/retrieve: conditional_models - модели ответа"""
+    conditional_models = ()
+
+    @conditional_get()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
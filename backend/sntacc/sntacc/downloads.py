@@ -0,0 +1,171 @@
+import asyncio
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_etag(stat):
+    """ETag по времени изменения и размеру файла (как у nginx)"""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Разбор заголовка Range для одного диапазона.
+
+    Возвращает (start, end) включительно, None если заголовок не поддерживается
+    (отдаем файл целиком) и False если диапазон неудовлетворим.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Последние N байт: bytes=-500
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path, start, length):
+    """Потоковое чтение части файла"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def aiter_file_range(path, start, length):
+    """Асинхронное чтение части файла: чтение с диска в пуле потоков, цикл событий свободен"""
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def is_asgi_request(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def accel_redirect_path(path):
+    """Внутренний путь nginx для файла или None, если каталог не опубликован"""
+    if not settings.SENDFILE_NGINX:
+        return None
+    real_path = os.path.realpath(path)
+    for root, location in settings.SENDFILE_NGINX_LOCATIONS.items():
+        root = os.path.realpath(root)
+        if real_path.startswith(root + os.sep):
+            relative = os.path.relpath(real_path, root).replace(os.sep, '/')
+            return location.rstrip('/') + '/' + quote(relative)
+    return None
+
+
+def content_disposition(filename, as_attachment=True):
+    """
+    Заголовок Content-Disposition. ASCII-имя - в кавычках с экранированием
+    обратной косой черты и кавычек (RFC 6266), остальные - в filename* (RFC 5987).
+    """
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+    escaped = filename.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{disposition}; filename="{escaped}"'
+
+
+def serve_file(request, path, filename=None, content_type=None, as_attachment=True):
+    """
+    Отдача файла с поддержкой условных запросов, Range и X-Accel-Redirect.
+
+    ETag/Last-Modified позволяют клиенту не скачивать неизмененный файл (304).
+    Если включен SENDFILE_NGINX и файл лежит в опубликованном каталоге,
+    передача делегируется nginx, и воркер освобождается сразу. Иначе
+    файл отдается потоком, с ответом 206 на запросы Range (докачка).
+    Под ASGI поток асинхронный: медленный клиент не занимает поток воркера.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    filename = filename or os.path.basename(path)
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    accel_path = accel_redirect_path(path)
+    if accel_path:
+        # nginx сам обработает Range и условные заголовки
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_path
+    else:
+        size = stat.st_size
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header:
+            # If-Range: диапазон применяется, только если файл не изменился
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+                byte_range = parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        iter_range = aiter_file_range if is_asgi_request(request) else iter_file_range
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                iter_range(path, start, length),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        elif is_asgi_request(request):
+            response = StreamingHttpResponse(aiter_file_range(path, 0, size), content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition(filename, as_attachment)
+    return response
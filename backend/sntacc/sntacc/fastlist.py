@@ -0,0 +1,94 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Преобразования значений в тот же вид, что дают поля DRF
+_datetime_field = serializers.DateTimeField()
+
+
+def as_decimal(value):
+    # DecimalField (COERCE_DECIMAL_TO_STRING): база уже округляет до decimal_places
+    return None if value is None else str(value)
+
+
+def as_float(value):
+    return None if value is None else float(value)
+
+
+def as_date(value):
+    return None if value is None else value.isoformat()
+
+
+def as_datetime(value):
+    return None if value is None else _datetime_field.to_representation(value)
+
+
+def as_string(value):
+    return value or ''
+
+
+class RowMapper:
+    """
+    Скомпилированное преобразование строки values_list() в словарь ответа.
+
+    columns - [(ключ ответа, путь для values_list, преобразование или None)].
+    По описанию один раз собирается функция вида
+    lambda row: {'id': row[0], 'created_at': c1(row[1])}, без обхода
+    полей сериализатора на каждой строке.
+    """
+
+    def __init__(self, columns):
+        self.fields = [path for _, path, _ in columns]
+        namespace = {}
+        items = []
+        for index, (key, _, converter) in enumerate(columns):
+            if converter is None:
+                items.append(f'{key!r}: row[{index}]')
+            else:
+                name = f'c{index}'
+                namespace[name] = converter
+                items.append(f'{key!r}: {name}(row[{index}])')
+        self.map = eval('lambda row: {' + ', '.join(items) + '}', namespace)
+
+    def rows(self, queryset, *extra_fields):
+        """
+        Кортежи строк queryset (без предзагрузок и select_related);
+        extra_fields добавляются в конец строки.
+        """
+        return queryset.prefetch_related(None).select_related(None).values_list(
+            *self.fields, *extra_fields
+        )
+
+    def __call__(self, row):
+        return self.map(row)
+
+
+class FastListMixin:
+    """
+    Быстрый список: fast_serializer_class строит ответ из values_list()
+    вместо ModelSerializer. Результат совпадает с обычным сериализатором.
+    При включенной пагинации используется обычный путь.
+
+    serialize(queryset, fields=None, expand=()) получает выбранные поля
+    (FieldSelectionMixin); раскрытия, которых нет в expandable быстрого
+    сериализатора, отдаются обычным сериализатором.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return self.fast_response(self.filter_queryset(self.get_queryset()))
+
+    def get_fast_serializer_kwargs(self):
+        return {}
+
+    def fast_response(self, queryset):
+        kwargs = self.get_fast_serializer_kwargs()
+        expand = set(kwargs.get('expand') or ())
+        if not expand <= set(getattr(self.fast_serializer_class, 'expandable', ())):
+            return Response(self.get_serializer(queryset, many=True).data)
+        data = self.fast_serializer_class.serialize(queryset, **kwargs)
+        fields = kwargs.get('fields')
+        if fields is not None:
+            data = [{key: value for key, value in item.items() if key in fields} for item in data]
+        return Response(data)
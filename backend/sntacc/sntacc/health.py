@@ -0,0 +1,15 @@
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+
+
+def health_view(request):
+    """
+    Проверка для healthcheck контейнера и балансировщика: воркер отвечает
+    и база доступна (SELECT 1 через постоянное соединение воркера).
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError as e:
+        return JsonResponse({'status': 'error', 'database': str(e)}, status=503)
+    return JsonResponse({'status': 'ok', 'database': connection.vendor})
@@ -0,0 +1,266 @@
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм: время в секундах и число SQL-запросов
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+
+class QueryTimer:
+    """Обертка connection.execute_wrapper: число запросов и время в базе"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Под ASGI запросы одного HTTP-запроса могут идти из разных потоков sync_to_async
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.duration += elapsed
+                self.count += 1
+
+
+# Замер текущего HTTP-запроса. sync_to_async копирует контекст в поток,
+# поэтому запросы к базе из async-представлений попадают в тот же замер
+current_timer = ContextVar('instrumentation_timer', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper каждого соединения: передает запрос текущему замеру"""
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+connection_created.connect(on_connection_created)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    """
+    Гистограммы по эндпоинтам ((метод, имя представления) -> метрика)
+    в памяти процесса. У каждого воркера gunicorn свой реестр.
+    """
+    METRICS = {
+        'request_duration_seconds': ('Полное время обработки запроса', DURATION_BUCKETS),
+        'db_duration_seconds': ('Время выполнения SQL-запросов', DURATION_BUCKETS),
+        'render_duration_seconds': (
+            'Время рендеринга ответа: Response.render() в JSON, без работы сериализаторов DRF '
+            '(serializer.data считается в представлении и входит в app)',
+            DURATION_BUCKETS,
+        ),
+        'db_queries': ('Число SQL-запросов на запрос', QUERY_BUCKETS),
+    }
+
+    def __init__(self, prefix='sntacc'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in self.METRICS}
+
+    def observe(self, method, view, values):
+        with self.lock:
+            for name, value in values.items():
+                histogram = self.histograms[name].get((method, view))
+                if histogram is None:
+                    histogram = self.histograms[name][(method, view)] = Histogram(self.METRICS[name][1])
+                histogram.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in self.METRICS}
+
+    def render(self):
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self.lock:
+            for name, (description, _) in self.METRICS.items():
+                metric = f'{self.prefix}_{name}'
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} histogram')
+                for (method, view), histogram in sorted(self.histograms[name].items()):
+                    labels = f'method="{method}",view="{_escape(view)}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """
+    Замеры каждого запроса: число SQL-запросов и время в базе, время
+    рендеринга ответа DRF и полное время.
+
+    render - только Response.render() (dict/list -> JSON байты). Сериализаторы
+    DRF (serializer.data, FastListMixin) выполняются в представлении до
+    рендеринга, поэтому их время не входит в render, а попадает в app (и в db
+    для ленивых запросов). Значения отдаются в
+    заголовке Server-Timing и копятся в гистограммах по эндпоинтам для
+    /api/metrics/.
+
+    Ставится первым в MIDDLEWARE, чтобы полное время включало остальные
+    middleware. Запросы сверх INSTRUMENTATION_QUERY_WARNING пишутся в лог -
+    так видны новые N+1.
+
+    SQL-запросы считает execute_wrapper, установленный на каждое соединение
+    (record_query), по замеру из contextvar: под ASGI соединения живут в
+    потоках sync_to_async, и контекст запроса переходит туда вместе с вызовом.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'INSTRUMENTATION_ENABLED', True)
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.query_warning = getattr(settings, 'INSTRUMENTATION_QUERY_WARNING', 50)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        # Соединения, открытые до подключения сигнала (например, проверками при запуске)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        timer = QueryTimer()
+        request._instrumentation = {'render_started': None, 'render_finished': None}
+        return timer, current_timer.set(timer), time.perf_counter()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        timer, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, started)
+
+    def finish(self, request, response, timer, started):
+        total = time.perf_counter() - started
+
+        marks = request._instrumentation
+        render = 0.0
+        if marks['render_started'] is not None and marks['render_finished'] is not None:
+            render = marks['render_finished'] - marks['render_started']
+
+        view = self.view_name(request)
+        registry.observe(request.method, view, {
+            'request_duration_seconds': total,
+            'db_duration_seconds': timer.duration,
+            'render_duration_seconds': render,
+            'db_queries': timer.count,
+        })
+        if timer.count > self.query_warning:
+            logger.warning(
+                'Много SQL-запросов: %s %s (%s) - %d запросов, %.1f мс в базе',
+                request.method, request.path, view, timer.count, timer.duration * 1000
+            )
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"',
+                f'render;dur={render * 1000:.1f};desc="Response.render only (no serializers)"',
+                f'app;dur={max(total - timer.duration - render, 0) * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response рендерится сразу после этого вызова
+        marks = getattr(request, '_instrumentation', None)
+        if marks is not None:
+            marks['render_started'] = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: marks.update(render_finished=time.perf_counter())
+            )
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match._func_path
+
+
+def metrics_view(request):
+    """
+    Метрики в формате Prometheus. Доступ - с токеном METRICS_TOKEN
+    (Authorization: Bearer) или напрямую к backend с METRICS_ALLOWED_IPS.
+    За прокси REMOTE_ADDR - адрес nginx, поэтому проксированные запросы
+    (с X-Forwarded-For) по адресу не пропускаются.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+
+    if not authorized:
+        allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+        proxied = 'HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_X_REAL_IP' in request.META
+        if proxied or request.META.get('REMOTE_ADDR') not in allowed:
+            return HttpResponseForbidden('Метрики доступны только локально или по токену')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,187 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_list_param(request, name):
+    """'a,b, c' -> ['a', 'b', 'c']; None, если параметра нет"""
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SelectableFieldsMixin:
+    """
+    Выбор полей сериализатора: fields - оставить только перечисленные,
+    expand - включить поля из Meta.expandable_fields ({имя в expand: поле}),
+    которые по умолчанию не отдаются.
+
+    Meta.field_dependencies ({поле: [пути модели]}) описывает, какие колонки
+    и связи нужны SerializerMethodField и свойствам модели, - по нему
+    FieldSelectionMixin сужает запрос.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = set(expand or ())
+        for name, field_name in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name not in expand:
+                self.fields.pop(field_name, None)
+        if fields is not None:
+            for field_name in list(self.fields):
+                if field_name not in fields:
+                    self.fields.pop(field_name)
+
+
+def serializer_sources(serializer):
+    """
+    Пути модели, которые читает сериализатор: список корней ('title',
+    'category', 'plotowner_set') или None, если поле с неизвестными
+    зависимостями не позволяет сузить запрос.
+    """
+    dependencies = getattr(getattr(serializer, 'Meta', None), 'field_dependencies', {})
+    sources = set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in dependencies:
+            sources.update(path.split('__')[0].split('.')[0] for path in dependencies[name])
+        elif isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            return None
+        else:
+            sources.add(field.source.split('.')[0])
+    return sources
+
+
+def _model_field(model, name):
+    """Поле модели по имени или по имени обратного менеджера (plotowner_set)"""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for relation in model._meta.related_objects:
+            if relation.get_accessor_name() == name:
+                return relation
+        raise
+
+
+def _select_related_paths(tree, prefix=''):
+    paths = []
+    for name, children in tree.items():
+        path = prefix + name
+        nested = _select_related_paths(children, path + '__')
+        paths.extend(nested or [path])
+    return paths
+
+
+def prune_queryset(queryset, serializer):
+    """
+    Сужение queryset под выбранные поля сериализатора: лишние
+    select_related/prefetch_related убираются, недостающие связи вложенных
+    сериализаторов добавляются, колонки ограничиваются через only().
+    """
+    sources = serializer_sources(serializer)
+    if sources is None:
+        return queryset
+
+    model = queryset.model
+    relations = set()
+    columns = {model._meta.pk.name}
+    for source in sources:
+        try:
+            field = _model_field(model, source)
+        except FieldDoesNotExist:
+            # Свойство модели без описанных зависимостей
+            return queryset
+        if field.is_relation:
+            relations.add(source)
+            if field.concrete and not field.many_to_many:
+                columns.add(source)
+        elif field.concrete:
+            columns.add(source)
+
+    # Уже настроенные представлением связи оставляем только нужные
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        kept = [path for path in _select_related_paths(select_related) if path.split('__')[0] in relations]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+
+    prefetches = []
+    covered = set(kept) if isinstance(select_related, dict) else set()
+    for lookup in queryset._prefetch_related_lookups:
+        through = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+        if through.split('__')[0] in relations:
+            prefetches.append(lookup)
+            # Prefetch с to_attr не заполняет сам менеджер связи
+            covered.add(lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup)
+    queryset = queryset.prefetch_related(None)
+
+    # Вложенные сериализаторы без настроенной загрузки связи
+    for name, field in serializer.fields.items():
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.BaseSerializer) or field.write_only:
+            continue
+        source = field.source.split('.')[0]
+        if any(path.split('__')[0] == source for path in covered) or source not in relations:
+            continue
+        model_field = _model_field(model, source)
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetches.append(source)
+        else:
+            queryset = queryset.select_related(source)
+
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    # select_related по обратной OneToOne требует связь в only()
+    if isinstance(queryset.query.select_related, dict):
+        columns.update(queryset.query.select_related)
+    return queryset.only(*columns)
+
+
+class FieldSelectionMixin:
+    """
+    ?fields= и ?expand= для ViewSet: сериализатор отдает только выбранные
+    поля, а запрос загружает только нужные колонки и связи.
+    Действует на GET; сериализатор должен наследовать SelectableFieldsMixin.
+    """
+    # Поля, раскрытые по умолчанию для действий: {'retrieve': ['history']}
+    default_expand = {}
+
+    def get_requested_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return parse_list_param(self.request, 'fields')
+
+    def get_requested_expand(self):
+        expand = list(self.default_expand.get(self.action, []))
+        if self.request.method in SAFE_METHODS:
+            expand += parse_list_param(self.request, 'expand') or []
+        return expand
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SelectableFieldsMixin):
+            kwargs.setdefault('fields', self.get_requested_fields())
+            kwargs.setdefault('expand', self.get_requested_expand())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_fast_serializer_kwargs(self):
+        kwargs = super().get_fast_serializer_kwargs()
+        kwargs.update(fields=self.get_requested_fields(), expand=self.get_requested_expand())
+        return kwargs
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.request.method in SAFE_METHODS and issubclass(serializer_class, SelectableFieldsMixin):
+            serializer = serializer_class(
+                context=self.get_serializer_context(),
+                fields=self.get_requested_fields(),
+                expand=self.get_requested_expand()
+            )
+            queryset = prune_queryset(queryset, serializer)
+        return queryset
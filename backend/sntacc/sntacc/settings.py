@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sntacc.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,24 +73,68 @@ WSGI_APPLICATION = 'sntacc.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# База данных: SQLite по умолчанию, PostgreSQL - DB_ENGINE=postgresql.
+# CONN_MAX_AGE держит соединение открытым между запросами одного воркера
+# (без него каждый запрос заново подключается к базе), CONN_HEALTH_CHECKS
+# проверяет его перед повторным использованием - после перезапуска базы
+# или обрыва соединения запрос не падает, а переподключается.
+# Под ASGI (GUNICORN_ASGI) синхронный код выполняется в потоках sync_to_async,
+# и постоянное соединение не переиспользуется, а остается открытым в потоке -
+# по умолчанию соединение закрывается после каждого запроса.
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+DB_CONN_MAX_AGE = config(
+    'DB_CONN_MAX_AGE',
+    default=0 if config('GUNICORN_ASGI', default=False, cast=bool) else 600,
+    cast=int
+)
+
+if DB_ENGINE == 'postgresql':
+    # Через pgbouncer в режиме transaction pooling серверные курсоры
+    # (QuerySet.iterator()) не работают
+    DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='sntacc_db'),
+            'USER': config('DB_USER', default='sntacc_user'),
+            'PASSWORD': config('DB_PASSWORD', default='sntacc_pass'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
+    }
+else:
+    # Обертка над sqlite3: WAL и PRAGMA на каждом соединении (sntacc/sqlite/base.py)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'sntacc.sqlite',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'PRAGMAS': {
+                'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+                'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+                'cache_size': config('SQLITE_CACHE_SIZE', default=-64 * 1024, cast=int),
+            },
+            'OPTIONS': {
+                # Блокировка записи берется в начале транзакции: иначе при
+                # повышении блокировки чтения до записи SQLite сразу отвечает
+                # "database is locked", не дожидаясь busy_timeout
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
-
 
-#DATABASES = {
-#    'default': {
-#        'ENGINE': 'django.db.backends.postgresql',
-#        'NAME': config('DB_NAME', default='sntacc_db'),
-#        'USER': config('DB_USER', default='sntacc_user'),
-#        'PASSWORD': config('DB_PASSWORD', default='sntacc_pass'),
-#        'HOST': config('DB_HOST', default='localhost'),
-#        'PORT': config('DB_PORT', default='5432'),
-#    }
-#}
+# Записи аудита и попыток входа пишутся одним фоновым потоком пачками,
+# чтобы не конкурировать за блокировку записи SQLite с запросами
+DB_WRITE_QUEUE = config('DB_WRITE_QUEUE', default=DB_ENGINE != 'postgresql', cast=bool)
+DB_WRITE_QUEUE_BATCH = config('DB_WRITE_QUEUE_BATCH', default=100, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,17 +176,87 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+BACKUP_ROOT = os.path.join(BASE_DIR, 'backups')
+
+# Загрузка документов: одним запросом (multipart, ограничение nginx 10M)
+# и частями (documents.services.DocumentUploadService)
+DOCUMENT_MAX_UPLOAD_SIZE = config('DOCUMENT_MAX_UPLOAD_SIZE', default=10 * 1024 * 1024, cast=int)
+DOCUMENT_CHUNKED_MAX_SIZE = config('DOCUMENT_CHUNKED_MAX_SIZE', default=500 * 1024 * 1024, cast=int)
+DOCUMENT_UPLOAD_CHUNK_SIZE = config('DOCUMENT_UPLOAD_CHUNK_SIZE', default=5 * 1024 * 1024, cast=int)
+DOCUMENT_UPLOAD_TEMP_DIR = config('DOCUMENT_UPLOAD_TEMP_DIR', default=os.path.join(BASE_DIR, 'uploads'))
+DOCUMENT_UPLOAD_EXPIRY_HOURS = config('DOCUMENT_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+# Миниатюры изображений и первой страницы PDF (documents.thumbnails):
+# длинная сторона в пикселях и число фоновых потоков генерации
+DOCUMENT_THUMBNAIL_SIZE = config('DOCUMENT_THUMBNAIL_SIZE', default=320, cast=int)
+DOCUMENT_THUMBNAIL_WORKERS = config('DOCUMENT_THUMBNAIL_WORKERS', default=2, cast=int)
+DOCUMENT_THUMBNAILS_ASYNC = config('DOCUMENT_THUMBNAILS_ASYNC', default=True, cast=bool)
+# Текст PDF, DOCX, XLSX и TXT для полнотекстового поиска (documents.extraction):
+# фоновые потоки и ограничение длины текста одного файла в символах
+DOCUMENT_TEXT_WORKERS = config('DOCUMENT_TEXT_WORKERS', default=1, cast=int)
+DOCUMENT_TEXT_EXTRACTION_ASYNC = config('DOCUMENT_TEXT_EXTRACTION_ASYNC', default=True, cast=bool)
+DOCUMENT_TEXT_MAX_LENGTH = config('DOCUMENT_TEXT_MAX_LENGTH', default=1000000, cast=int)
+# SHA-256 загружаемых файлов считается при приеме запроса (хранение по содержимому)
+FILE_UPLOAD_HANDLERS = [
+    'documents.storage.HashingMemoryFileUploadHandler',
+    'documents.storage.HashingTemporaryFileUploadHandler',
+]
+
+# Отдача файлов через nginx (X-Accel-Redirect): каталог -> internal location
+SENDFILE_NGINX = config('SENDFILE_NGINX', default=False, cast=bool)
+SENDFILE_NGINX_LOCATIONS = {
+    BACKUP_ROOT: '/protected/backups/',
+    MEDIA_ROOT: '/protected/media/',
+}
+
+# Кеш: Redis (общий для всех воркеров gunicorn) или память процесса для разработки
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'sntacc',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Статистика документов сбрасывается при изменении документов; срок - на
+# случай пакетных изменений в обход сигналов и сдвига окна "за 30 дней"
+DOCUMENT_STATISTICS_CACHE_TIMEOUT = config('DOCUMENT_STATISTICS_CACHE_TIMEOUT', default=300, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Замеры запросов (sntacc.instrumentation): Server-Timing и метрики Prometheus
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+# Порог числа SQL-запросов, после которого запрос пишется в лог как подозрительный
+INSTRUMENTATION_QUERY_WARNING = config('INSTRUMENTATION_QUERY_WARNING', default=50, cast=int)
+# Адреса, с которых доступен /api/metrics/ при обращении к backend напрямую (не через nginx)
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+# Токен для сбора метрик с любого адреса: Authorization: Bearer <токен>
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# JSON-рендерер API: orjson (быстрее на больших списках) или стандартный DRF
+API_JSON_RENDERER = config('API_JSON_RENDERER', default='orjson')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'sntacc.renderers.ORJSONRenderer' if API_JSON_RENDERER == 'orjson'
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
         'rest_framework.permissions.AllowAny',
@@ -170,4 +285,11 @@ EMAIL_PORT = config('EMAIL_PORT', default=465, cast=int)
 EMAIL_USE_SSL = config('EMAIL_USE_SSL', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
-DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@snt.ru')
\ No newline at end of file
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@snt.ru')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
+# Сколько уведомлений массовой рассылки отправляется одновременно
+NOTIFICATION_SEND_CONCURRENCY = config('NOTIFICATION_SEND_CONCURRENCY', default=10, cast=int)
+# Отправка в фоновых потоках после ответа 202 (notifications.services)
+NOTIFICATION_SEND_ASYNC = config('NOTIFICATION_SEND_ASYNC', default=True, cast=bool)
+NOTIFICATION_SEND_WORKERS = config('NOTIFICATION_SEND_WORKERS', default=2, cast=int)
\ No newline at end of file
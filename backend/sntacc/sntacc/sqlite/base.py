@@ -0,0 +1,33 @@
+from django.db.backends.sqlite3 import base
+
+# Значения по умолчанию для режима WAL на одном сервере; переопределяются
+# ключом PRAGMAS в настройках базы
+DEFAULT_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот
+    'journal_mode': 'WAL',
+    # В WAL fsync только на контрольных точках: коммит не ждет диск,
+    # при сбое питания теряются лишь последние транзакции, база цела
+    'synchronous': 'NORMAL',
+    # Ждать освобождения блокировки вместо немедленного "database is locked"
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite с настройками для работы нескольких воркеров с одной базой:
+    PRAGMA выполняются при каждом новом соединении.
+    """
+
+    def get_pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.get_pragmas().items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
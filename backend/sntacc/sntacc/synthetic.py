@@ -0,0 +1,273 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from audit.models import AuditLog
+from documents.models import Document, DocumentCategory, DocumentTag
+from documents.search import DocumentSearchService
+from documents.services import DocumentStatisticsService
+from notifications.models import Notification, NotificationTemplate
+from owners.models import Owner
+from payments.models import Payment, PaymentTransaction
+from payments.services import LedgerService
+from plots.models import Plot, PlotOwner
+from plots.search import PlotSearchService
+from tasks.models import Reminder, Task
+
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Волков', 'Соколов']
+FIRST_NAMES = ['Иван', 'Петр', 'Сергей', 'Алексей', 'Дмитрий', 'Николай', 'Андрей', 'Михаил']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич', 'Николаевич', 'Андреевич']
+CATEGORIES = ['Договоры', 'Протоколы собраний', 'Квитанции', 'Акты']
+TAGS = [('важное', '#dc3545'), ('архив', '#6c757d'), ('бухгалтерия', '#28a745')]
+AUDIT_ACTIONS = ['create', 'update', 'view', 'export', 'login']
+
+
+class SyntheticDataGenerator:
+    """
+    Синтетическое СНТ для тестов и замеров: участки, собственники со сменой
+    владельцев, начисления за несколько лет с поступлениями в журнале,
+    документы, задачи, уведомления и журнал аудита.
+
+    Данные вставляются через bulk_create, после чего одним проходом
+    пересобираются поисковый индекс и сальдо участков. prefix делает
+    номера и имена уникальными - генератор можно запускать повторно,
+    чтобы нарастить базу. seed фиксирует случайные значения.
+    """
+    BATCH_SIZE = 1000
+
+    def __init__(self, plots=100, years=3, turnover=0.2, documents=None, tasks=None,
+                 notifications=None, audit_rows=None, users=3, prefix='', seed=0):
+        self.plots = plots
+        self.years = years
+        self.turnover = turnover
+        self.documents = plots // 2 if documents is None else documents
+        self.tasks = max(plots // 10, 1) if tasks is None else tasks
+        self.notifications = plots if notifications is None else notifications
+        self.audit_rows = plots * 2 if audit_rows is None else audit_rows
+        self.users = users
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.today = timezone.localdate()
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.BATCH_SIZE)
+
+    def person_name(self):
+        return ' '.join([
+            self.random.choice(LAST_NAMES),
+            self.random.choice(FIRST_NAMES),
+            self.random.choice(MIDDLE_NAMES)
+        ])
+
+    def generate(self):
+        """Создание данных; возвращает число созданных записей по видам"""
+        with transaction.atomic():
+            users = self.create_users()
+            plots = self.create_plots()
+            owners = self.create_owners(plots)
+            payments, transactions = self.create_payments(plots)
+            documents = self.create_documents(plots, owners, users)
+            tasks = self.create_tasks(users)
+            notifications = self.create_notifications(plots)
+            audit_rows = self.create_audit(users, plots)
+
+            plot_ids = [plot.pk for plot in plots]
+            PlotSearchService.refresh(plot_ids)
+            LedgerService.refresh_balances(plot_ids)
+            DocumentSearchService.refresh([document.pk for document in documents])
+            DocumentStatisticsService.invalidate()
+
+        return {
+            'users': len(users),
+            'plots': len(plots),
+            'owners': len(owners),
+            'payments': len(payments),
+            'transactions': len(transactions),
+            'documents': len(documents),
+            'tasks': len(tasks),
+            'notifications': len(notifications),
+            'audit_rows': len(audit_rows),
+        }
+
+    def create_users(self):
+        roles = [role for role, _ in CustomUser.ROLE_CHOICES]
+        return self.bulk_create(CustomUser, [
+            CustomUser(
+                username=f'{self.prefix}user{i}',
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                email=f'{self.prefix}user{i}@example.com',
+                role=roles[i % len(roles)],
+                password=make_password(None)
+            )
+            for i in range(self.users)
+        ])
+
+    def create_plots(self):
+        return self.bulk_create(Plot, [
+            Plot(
+                plot_number=f'{self.prefix}{i + 1}',
+                address=f'Линия {i % 40 + 1}, участок {i + 1}',
+                area=self.random.choice([4, 6, 6, 8, 10, 12])
+            )
+            for i in range(self.plots)
+        ])
+
+    def create_owners(self, plots):
+        """Текущий владелец у каждого участка, у доли turnover - предыдущий"""
+        start = date(self.today.year - self.years - 5, 1, 1)
+        history = []
+        for plot in plots:
+            if self.random.random() < self.turnover:
+                changed = start + timedelta(days=self.random.randint(365, 365 * (self.years + 4)))
+                history.append((plot, start, changed))
+                history.append((plot, changed, None))
+            else:
+                history.append((plot, start, None))
+
+        owners = self.bulk_create(Owner, [
+            Owner(
+                full_name=self.person_name(),
+                phone=f'+7900{self.random.randint(0, 9999999):07d}',
+                email=f'{self.prefix}owner{i}@example.com'
+            )
+            for i in range(len(history))
+        ])
+        self.bulk_create(PlotOwner, [
+            PlotOwner(plot=plot, owner=owner, ownership_start=started, ownership_end=ended)
+            for owner, (plot, started, ended) in zip(owners, history)
+        ])
+        return owners
+
+    def create_payments(self, plots):
+        """
+        Начисления за years лет по площади участка. Старые годы чаще
+        оплачены; оплаченные и частичные суммы записываются в журнал.
+        """
+        first_year = self.today.year - self.years + 1
+        payments = []
+        for plot in plots:
+            for year in range(first_year, self.today.year + 1):
+                amount = Decimal(plot.area * 800)
+                roll = self.random.random() + (self.today.year - year) * 0.15
+                if roll > 0.35:
+                    paid = amount
+                elif roll > 0.25:
+                    paid = (amount / 2).quantize(Decimal('0.01'))
+                else:
+                    paid = Decimal('0')
+                payments.append(Payment(
+                    plot=plot,
+                    year=year,
+                    amount=amount,
+                    paid_total=paid,
+                    status=LedgerService.status_for(amount, paid),
+                    date_paid=date(year, self.random.randint(3, 11), self.random.randint(1, 28)) if paid else None
+                ))
+        payments = self.bulk_create(Payment, payments)
+        transactions = self.bulk_create(PaymentTransaction, [
+            PaymentTransaction(
+                payment=payment,
+                amount=payment.paid_total,
+                date=payment.date_paid,
+                source='migration'
+            )
+            for payment in payments if payment.paid_total
+        ])
+        return payments, transactions
+
+    def create_documents(self, plots, owners, users):
+        categories = [DocumentCategory.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+        tags = [DocumentTag.objects.get_or_create(name=name, defaults={'color': color})[0] for name, color in TAGS]
+        types = [value for value, _ in Document.DOCUMENT_TYPE_CHOICES]
+        documents = self.bulk_create(Document, [
+            Document(
+                title=f'Документ {self.prefix}{i + 1}',
+                category=self.random.choice(categories),
+                document_type=self.random.choice(types),
+                file=f'documents/synthetic/{self.prefix}{i + 1}.pdf',
+                file_size=self.random.randint(10_000, 5_000_000),
+                file_type='pdf',
+                status='active',
+                related_plot=self.random.choice(plots) if plots else None,
+                related_owner=self.random.choice(owners) if owners else None,
+                created_by=self.random.choice(users) if users else None
+            )
+            for i in range(self.documents)
+        ])
+        Through = Document.tags.through
+        self.bulk_create(Through, [
+            Through(document_id=document.pk, documenttag_id=tag.pk)
+            for document in documents
+            for tag in self.random.sample(tags, self.random.randint(0, len(tags)))
+        ])
+        return documents
+
+    def create_tasks(self, users):
+        now = timezone.now()
+        statuses = [value for value, _ in Task.STATUS_CHOICES]
+        priorities = [value for value, _ in Task.PRIORITY_CHOICES]
+        tasks = self.bulk_create(Task, [
+            Task(
+                title=f'Задача {self.prefix}{i + 1}',
+                description='Синтетическая задача',
+                assigned_to=self.random.choice(users) if users else None,
+                created_by=self.random.choice(users) if users else None,
+                priority=self.random.choice(priorities),
+                status=self.random.choice(statuses),
+                due_date=now + timedelta(days=self.random.randint(-30, 60))
+            )
+            for i in range(self.tasks)
+        ])
+        self.bulk_create(Reminder, [
+            Reminder(task=task, remind_at=task.due_date - timedelta(days=1), is_sent=task.due_date < now)
+            for task in tasks
+        ])
+        return tasks
+
+    def create_notifications(self, plots):
+        if not plots:
+            return []
+        template, _ = NotificationTemplate.objects.get_or_create(
+            name='Напоминание о задолженности',
+            defaults={
+                'type': 'email',
+                'subject': 'Задолженность по взносам',
+                'body': 'Уважаемый собственник, по участку имеется задолженность.'
+            }
+        )
+        statuses = [value for value, _ in Notification.STATUS_CHOICES]
+        notifications = []
+        for i in range(self.notifications):
+            plot = plots[i % len(plots)]
+            status = self.random.choice(statuses)
+            notifications.append(Notification(
+                template=template,
+                plot=plot,
+                recipient_email=f'{self.prefix}owner{i}@example.com',
+                subject=template.subject,
+                message=template.body,
+                status=status,
+                sent_at=timezone.now() if status == 'sent' else None
+            ))
+        return self.bulk_create(Notification, notifications)
+
+    def create_audit(self, users, plots):
+        now = timezone.now()
+        return self.bulk_create(AuditLog, [
+            AuditLog(
+                user=self.random.choice(users) if users else None,
+                action=self.random.choice(AUDIT_ACTIONS),
+                model_name='Plot',
+                object_id=str(plot.pk),
+                object_repr=f'Участок {plot.plot_number}',
+                ip_address='127.0.0.1',
+                timestamp=now - timedelta(minutes=self.random.randint(0, 60 * 24 * 90))
+            )
+            for plot in (self.random.choice(plots) for _ in range(self.audit_rows if plots else 0))
+        ])
@@ -0,0 +1,110 @@
+import os
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from .synthetic import SyntheticDataGenerator
+
+
+def router_endpoints(patterns=None):
+    """
+    GET-эндпоинты всех ViewSet из роутеров: [(имя url, класс ViewSet,
+    действие, detail)]. Дубли с суффиксом формата (.json) пропускаются.
+    """
+    endpoints = []
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver):
+            endpoints.extend(router_endpoints(pattern.url_patterns))
+            continue
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if not actions or 'get' not in actions or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        viewset = pattern.callback.cls
+        lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+        endpoints.append((pattern.name, viewset, actions['get'], lookup in pattern.pattern.regex.groupindex))
+    return endpoints
+
+
+class QueryCountHarness:
+    """
+    Проверка N+1 для всех GET-эндпоинтов роутеров: число SQL-запросов
+    list/detail/отчетов не должно зависеть от объема данных.
+
+    База заполняется SyntheticDataGenerator (seed_size участков), каждый
+    эндпоинт вызывается и замеряется, затем данные наращиваются в
+    growth_factor раз и замер повторяется - число запросов должно совпасть.
+    Размер можно увеличить переменной окружения QUERY_COUNT_SEED_SIZE.
+
+    Атрибуты тестового класса:
+      skip - имена url, которые не проверяются (отдача файлов и т.п.);
+      params - {имя url: функция(harness) -> параметры запроса};
+      allowed_growth - {имя url: допустимый прирост числа запросов}.
+    """
+    seed_size = 10
+    growth_factor = 3
+    skip = set()
+    params = {}
+    allowed_growth = {}
+
+    def seed(self, plots, prefix):
+        return SyntheticDataGenerator(plots=plots, prefix=prefix, seed=len(prefix)).generate()
+
+    def endpoint_url(self, name, viewset, detail):
+        if not detail:
+            return reverse(name)
+        obj = viewset.queryset.model.objects.order_by('pk').first()
+        if obj is None:
+            return None
+        lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+        return reverse(name, kwargs={lookup: getattr(obj, viewset.lookup_field)})
+
+    def count_queries(self, client, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        return response, len(queries)
+
+    def assertQueryCountsStable(self):
+        size = int(os.environ.get('QUERY_COUNT_SEED_SIZE', self.seed_size))
+        self.seed(size, 'a-')
+
+        user = CustomUser.objects.create_superuser('harness', 'harness@example.com', 'harness', role='admin')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        # Адреса и параметры фиксируются до наращивания данных: detail
+        # проверяется на одном и том же объекте
+        endpoints = []
+        for name, viewset, action, detail in router_endpoints():
+            if name in self.skip:
+                continue
+            url = self.endpoint_url(name, viewset, detail)
+            if url is None:
+                continue
+            params = self.params[name](self) if name in self.params else {}
+            # Прогрев: кеши ContentType, сессии и т.п. не должны попасть в замер
+            client.get(url, params)
+            endpoints.append((name, url, params))
+
+        before = {}
+        for name, url, params in endpoints:
+            response, count = self.count_queries(client, url, params)
+            with self.subTest(endpoint=name, url=url):
+                self.assertEqual(response.status_code, 200, f'{url}: {response.status_code}')
+            before[name] = count
+
+        self.seed(size * (self.growth_factor - 1), 'b-')
+
+        for name, url, params in endpoints:
+            response, count = self.count_queries(client, url, params)
+            with self.subTest(endpoint=name, url=url):
+                self.assertEqual(response.status_code, 200, f'{url}: {response.status_code}')
+                self.assertLessEqual(
+                    count, before[name] + self.allowed_growth.get(name, 0),
+                    f'{url}: {before[name]} SQL-запросов на {size} участках, '
+                    f'{count} - на {size * self.growth_factor} (N+1)'
+                )
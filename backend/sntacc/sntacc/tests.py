@@ -0,0 +1,249 @@
+import re
+from datetime import date
+
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, LoginAttempt
+from accounts.security import SecurityService
+from audit.models import AuditLog, TableVersion
+from audit.services import AuditService
+from owners.models import Owner
+from payments.models import Payment, PlotBalance
+from payments.services import LedgerService
+from plots.models import Plot, PlotOwner
+from .benchmarks import ENDPOINTS, REPORTS, BenchmarkRunner
+from .downloads import content_disposition
+from .synthetic import SyntheticDataGenerator
+from .testing import QueryCountHarness
+from .writer import WriteQueue, write_queue
+
+
+class EndpointQueryCountTests(QueryCountHarness, TestCase):
+    """Число SQL-запросов эндпоинтов API не растет вместе с данными"""
+    skip = {
+        # Отдача файлов: синтетические документы и резервные копии без файлов
+        'document-download',
+        'backup-download',
+        'generatedreport-download',
+    }
+    params = {
+        # Год по умолчанию (2024) может не попасть в синтетические данные
+        'plot-unpaid-plots': lambda self: {'year': timezone.localdate().year},
+        'document-by-plot': lambda self: {'plot_id': Plot.objects.order_by('pk').first().pk},
+        'document-by-owner': lambda self: {'owner_id': Owner.objects.order_by('pk').first().pk},
+        'auditlog-user-logs': lambda self: {'user_id': CustomUser.objects.order_by('pk').first().pk},
+        'document-search': lambda self: {'q': 'документ'},
+    }
+    allowed_growth = {
+        # Первый замер - из кеша; новые данные сбрасывают его, и статистика
+        # считается заново одним запросом
+        'document-statistics': 1,
+    }
+
+    def test_query_count_independent_of_data_size(self):
+        self.assertQueryCountsStable()
+
+
+class BenchmarkRunnerTests(TestCase):
+    """Набор замеров проходит на маленьком СНТ и находит регрессии"""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(plots=10).generate()
+        cls.user = CustomUser.objects.create_superuser('bench', 'bench@example.com', 'bench', role='admin')
+
+    def test_all_benchmarks_run(self):
+        results = BenchmarkRunner(rounds=1, warmup=0, user=self.user).run()
+        self.assertEqual(len(results), len(ENDPOINTS) + len(REPORTS))
+        for result in results:
+            self.assertGreater(result['stats']['queries'], 0, result['name'])
+
+    def test_compare_flags_regressions(self):
+        stats = {'min': 0.01, 'max': 0.01, 'mean': 0.01, 'median': 0.01, 'stddev': 0.0, 'rounds': 1, 'queries': 2}
+        baseline = {'benchmarks': [
+            {'name': 'slower', 'stats': stats},
+            {'name': 'more_queries', 'stats': stats},
+            {'name': 'same', 'stats': stats},
+        ]}
+        results = [
+            {'name': 'slower', 'stats': {**stats, 'median': 0.02}},
+            {'name': 'more_queries', 'stats': {**stats, 'queries': 12}},
+            {'name': 'same', 'stats': stats},
+            {'name': 'new', 'stats': stats},
+        ]
+        flagged = {name: regression for name, _, _, _, regression in BenchmarkRunner.compare(results, baseline)}
+        self.assertEqual(flagged, {'slower': True, 'more_queries': True, 'same': False})
+
+
+class ConditionalGetTests(TestCase):
+    """ETag по счетчикам изменений: 304 без выборки, сброс после любой записи"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plot = Plot.objects.create(plot_number='1')
+        Payment.objects.create(plot=cls.plot, year=2024, amount=1000)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def etag(self, url='/api/plots/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified(self):
+        etag = self.etag()
+        # Одно чтение счетчиков, без выборки участков
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/plots/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.etag('/api/plots/?plot_number=1'), etag)
+
+    def test_invalidated_by_writes(self):
+        etags = {self.etag()}
+        writes = [
+            lambda: Plot.objects.create(plot_number='2'),
+            lambda: Plot.objects.filter(pk=self.plot.pk).update(address='Лесная'),
+            lambda: Plot.objects.bulk_update([Plot(pk=self.plot.pk, area=6)], ['area']),
+            lambda: Owner.objects.create(full_name='Иванов Иван'),
+            lambda: Plot.objects.filter(plot_number='2').delete(),
+        ]
+        for write in writes:
+            write()
+            etag = self.etag()
+            self.assertNotIn(etag, etags)
+            etags.add(etag)
+
+    def test_plot_balance_dependency(self):
+        plots_etag = self.etag()
+        statistics_etag = self.etag('/api/payments/statistics/?year=2024')
+        # Поступление меняет только Payment.paid_total и PlotBalance (bulk_update / upsert)
+        LedgerService.add_payment(Payment.objects.get(), 500)
+        self.assertNotEqual(self.etag(), plots_etag)
+        self.assertNotEqual(self.etag('/api/payments/statistics/?year=2024'), statistics_etag)
+
+        PlotBalance.objects.update(debt=0)
+        plots_etag = self.etag()
+        PlotBalance.objects.update(debt=500)
+        self.assertNotEqual(self.etag(), plots_etag)
+
+    def test_ownership_change(self):
+        plot_version = TableVersion.objects.get(label='plots.plot').version
+        owner = Owner.objects.create(full_name='Петров Петр')
+        etag = self.etag()
+        PlotOwner.objects.create(plot=self.plot, owner=owner, ownership_start=date(2024, 1, 1))
+        # Сброс - по счетчику plots.plotowner, сама таблица участков не пишется
+        self.assertNotEqual(self.etag(), etag)
+        self.assertEqual(TableVersion.objects.get(label='plots.plot').version, plot_version)
+
+    def test_versions_survive_flush(self):
+        TableVersion.objects.all().delete()
+        TableVersion.create_missing()
+        self.assertEqual(
+            set(TableVersion.objects.values_list('label', flat=True)),
+            {'plots.plot', 'plots.plotowner', 'owners.owner', 'payments.payment', 'payments.plotbalance'}
+        )
+        self.assertEqual(self.client.get('/api/plots/').status_code, 200)
+
+
+class InstrumentationTests(TestCase):
+    """Server-Timing и /api/metrics/: запросы считаются и под ASGI, доступ к метрикам"""
+
+    def setUp(self):
+        Plot.objects.create(plot_number='1')
+
+    def timing(self, response):
+        return dict(
+            (match.group(1), match.group(2))
+            for match in re.finditer(r'(\w+);dur=([\d.]+)', response['Server-Timing'])
+        )
+
+    def query_count(self, response):
+        return int(re.search(r'"(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_sync_request_counts_queries(self):
+        response = APIClient().get('/api/plots/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.query_count(response), 0)
+        self.assertEqual(set(self.timing(response)), {'db', 'render', 'app', 'total'})
+
+    async def test_async_request_counts_queries(self):
+        response = await AsyncClient().get('/api/plots/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.query_count(response), 0)
+
+    def test_metrics_render_histogram(self):
+        APIClient().get('/api/plots/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('render_duration_seconds', response.content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'], METRICS_TOKEN='')
+    def test_metrics_denied_behind_proxy(self):
+        # За nginx REMOTE_ADDR - адрес прокси, внешний клиент виден только в заголовках
+        response = self.client.get('/api/metrics/', HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/metrics/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        response = self.client.get('/api/metrics/', HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            '/api/metrics/', HTTP_X_FORWARDED_FOR='203.0.113.5', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer токен')
+        self.assertEqual(response.status_code, 403)
+
+
+class WriteQueueTests(TestCase):
+    """Пакет очереди записи с ошибочной строкой сохраняется по одному"""
+
+    def test_failed_batch_written_row_by_row(self):
+        batch = [
+            AuditLog(action='create', object_repr='первая'),
+            AuditLog(action=None, object_repr='ошибочная'),
+            AuditLog(action='update', object_repr='вторая'),
+        ]
+        with self.assertLogs('sntacc.writer', 'WARNING') as logs:
+            WriteQueue().write(batch)
+        self.assertEqual(
+            set(AuditLog.objects.values_list('object_repr', flat=True)), {'первая', 'вторая'}
+        )
+        self.assertEqual(len(logs.records), 2)
+
+
+@override_settings(DB_WRITE_QUEUE=True)
+class WriteQueueThreadTests(TransactionTestCase):
+    """Вне транзакции аудит уходит в фоновый поток, попытки входа пишутся сразу"""
+
+    def test_audit_deferred_login_attempt_synchronous(self):
+        self.assertIsNone(AuditService.log_action(action='other', object_repr='в очереди'))
+        write_queue.flush()
+        self.assertTrue(AuditLog.objects.filter(object_repr='в очереди').exists())
+
+        SecurityService.log_login_attempt(None, '192.0.2.1', 'test', success=False)
+        self.assertEqual(LoginAttempt.objects.filter(ip_address='192.0.2.1').count(), 1)
+        self.assertEqual(SecurityService.get_failed_attempts('192.0.2.1'), 1)
+
+
+class ContentDispositionTests(TestCase):
+    """Имя файла в Content-Disposition не ломает заголовок"""
+
+    def test_quoted_ascii_name(self):
+        self.assertEqual(content_disposition('act.pdf'), 'attachment; filename="act.pdf"')
+        self.assertEqual(
+            content_disposition('a"b\\c.pdf', as_attachment=False),
+            'inline; filename="a\\"b\\\\c.pdf"'
+        )
+
+    def test_non_ascii_name(self):
+        self.assertEqual(
+            content_disposition('акт "1".pdf'),
+            "attachment; filename*=utf-8''%D0%B0%D0%BA%D1%82%20%221%22.pdf"
+        )
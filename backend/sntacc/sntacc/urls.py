@@ -3,12 +3,15 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from plots.views import PlotViewSet
 from owners.views import OwnerViewSet
-from payments.views import PaymentViewSet
+from payments.views import PaymentViewSet, BankStatementViewSet
+from sntacc.health import health_view
+from sntacc.instrumentation import metrics_view
 
 router = DefaultRouter()
 router.register(r'plots', PlotViewSet)
 router.register(r'owners', OwnerViewSet)
 router.register(r'payments', PaymentViewSet)
+router.register(r'bank-statements', BankStatementViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -20,4 +23,6 @@ urlpatterns = [
     path('api/audit/', include('audit.urls')),
     path('api/tasks/', include('tasks.urls')),
     path('api/documents/', include('documents.urls')),
+    path('api/metrics/', metrics_view, name='metrics'),
+    path('api/health/', health_view, name='health'),
 ]
\ No newline at end of file
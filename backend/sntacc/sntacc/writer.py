@@ -0,0 +1,106 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """
+    Очередь записи служебных строк (журнал аудита) одним фоновым потоком.
+    Поток забирает накопившиеся объекты и сохраняет их одной транзакцией
+    через bulk_create, поэтому параллельные запросы не ждут блокировку
+    записи SQLite ради строки журнала. Если пакет не записался, объекты
+    сохраняются по одному - ошибочная строка не теряет остальные.
+
+    Через очередь пишется только то, что не читается сразу после записи:
+    попытки входа пишутся синхронно, по ним считается блокировка IP.
+
+    Если вызывающий код находится в транзакции или очередь выключена
+    (DB_WRITE_QUEUE), объект сохраняется сразу: запись остается частью
+    транзакции и откатывается вместе с ней.
+    """
+
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'DB_WRITE_QUEUE', False)
+
+    def put(self, instance):
+        """Сохранить объект модели; возвращает сохраненный объект или None, если запись отложена"""
+        if not self.enabled or connection.in_atomic_block:
+            instance.save(force_insert=True)
+            return instance
+        self.ensure_started()
+        self.queue.put(instance)
+        return None
+
+    def ensure_started(self):
+        # После fork воркера gunicorn поток родителя не существует
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.queue = queue.Queue()
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='db-write-queue', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.write(batch)
+                for _ in batch:
+                    self.queue.task_done()
+        finally:
+            connection.close()
+
+    def write(self, batch):
+        by_model = defaultdict(list)
+        for instance in batch:
+            by_model[type(instance)].append(instance)
+        try:
+            with transaction.atomic():
+                for model, instances in by_model.items():
+                    model.objects.bulk_create(instances)
+            return
+        except Exception as e:
+            logger.warning('Ошибка записи пакета очереди (%s объектов), запись по одному: %s', len(batch), e)
+
+        for instance in batch:
+            # bulk_create мог проставить pk до отката
+            instance.pk = None
+            instance._state.adding = True
+            try:
+                with transaction.atomic():
+                    instance.save(force_insert=True)
+            except Exception as e:
+                logger.error('Ошибка записи %s из очереди: %s', type(instance).__name__, e)
+
+    def flush(self):
+        """Дождаться записи всех поставленных объектов"""
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.join()
+
+
+write_queue = WriteQueue(batch_size=getattr(settings, 'DB_WRITE_QUEUE_BATCH', 100))
+atexit.register(write_queue.flush)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from sntacc.selection import SelectableFieldsMixin
 from .models import Task, Reminder
 from accounts.models import CustomUser
 
@@ -13,7 +14,13 @@ class UserSerializer(serializers.ModelSerializer):
         data['full_name'] = f"{instance.first_name} {instance.last_name}".strip() or instance.username
         return data
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskReminderSerializer(serializers.ModelSerializer):
+    """Напоминание внутри задачи (без вложенной задачи)"""
+    class Meta:
+        model = Reminder
+        fields = ['id', 'reminder_type', 'remind_at', 'is_sent', 'created_at']
+
+class TaskSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     assigned_to = UserSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
     assigned_to_id = serializers.PrimaryKeyRelatedField(
@@ -24,15 +31,19 @@ class TaskSerializer(serializers.ModelSerializer):
     )
     is_overdue = serializers.SerializerMethodField()
     days_until_due = serializers.SerializerMethodField()
+    reminders = TaskReminderSerializer(source='reminder_set', many=True, read_only=True)
     
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'assigned_to', 'assigned_to_id', 
             'created_by', 'priority', 'status', 'due_date', 'completed_at',
-            'created_at', 'updated_at', 'is_overdue', 'days_until_due'
+            'created_at', 'updated_at', 'is_overdue', 'days_until_due', 'reminders'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'completed_at']
+        # ?expand=reminders - напоминания задачи
+        expandable_fields = {'reminders': 'reminders'}
+        field_dependencies = {'is_overdue': ['due_date', 'status'], 'days_until_due': ['due_date']}
     
     def get_is_overdue(self, obj):
         return obj.is_overdue()
@@ -5,9 +5,10 @@ from rest_framework.permissions import AllowAny
 from django.utils import timezone
 from django.db.models import Q
 from .models import Task, Reminder
+from sntacc.selection import FieldSelectionMixin
 from .serializers import TaskSerializer, TaskCreateSerializer, ReminderSerializer
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all().select_related('assigned_to', 'created_by')
     serializer_class = TaskSerializer
     permission_classes = [AllowAny]
@@ -121,7 +122,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         })
 
 class ReminderViewSet(viewsets.ModelViewSet):
-    queryset = Reminder.objects.all().select_related('task')
+    queryset = Reminder.objects.all().select_related('task__assigned_to', 'task__created_by')
     serializer_class = ReminderSerializer
     permission_classes = [AllowAny]
 
@@ -150,7 +151,7 @@ class ReminderViewSet(viewsets.ModelViewSet):
         reminders = Reminder.objects.filter(
             remind_at__gte=timezone.now(),
             is_sent=False
-        ).select_related('task').order_by('remind_at')
+        ).select_related('task__assigned_to', 'task__created_by').order_by('remind_at')
         
         serializer = self.get_serializer(reminders, many=True)
         return Response(serializer.data)
\ No newline at end of file
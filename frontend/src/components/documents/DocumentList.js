@@ -594,7 +594,12 @@ const DocumentList = () => {
                         sx={{ fontSize: isMobile ? '0.75rem' : '0.875rem' }}
                       >
                         <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
-                          <Avatar sx={{ width: 32, height: 32, bgcolor: 'transparent' }}>
+                          <Avatar
+                            variant="rounded"
+                            src={document.thumbnail_url || undefined}
+                            imgProps={{ loading: 'lazy' }}
+                            sx={{ width: 32, height: 32, bgcolor: 'transparent' }}
+                          >
                             {getFileIcon(document)}
                           </Avatar>
                           <Box>
@@ -124,7 +124,7 @@ const UnpaidPlotsList = () => {
         amount: notificationData.amount,
       });
       
-      alert(`Отправлено ${response.data.sent} из ${response.data.total} уведомлений`);
+      alert(response.data.message);
       setSelectedPlots([]);
     } catch (err) {
       setError('Ошибка при отправке уведомлений: ' + (err.response?.data?.detail || err.message));
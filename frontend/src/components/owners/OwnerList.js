@@ -105,8 +105,8 @@ const OwnerList = () => {
     
     if (filters.plotNumber) {
       filtered = filtered.filter(owner =>
-        owner.plots_history && owner.plots_history.some(plotHistory =>
-          plotHistory.plot.plot_number.toLowerCase().includes(filters.plotNumber.toLowerCase())
+        owner.current_plots && owner.current_plots.some(plot =>
+          plot.plot_number.toLowerCase().includes(filters.plotNumber.toLowerCase())
         )
       );
     }
@@ -287,10 +287,10 @@ const OwnerList = () => {
                         {owner.email}
                       </Typography>
                     )}
-                    {owner.plots_history && owner.plots_history.length > 0 && (
+                    {owner.current_plots && owner.current_plots.length > 0 && (
                       <Box sx={{ mt: 1 }}>
                         <Typography variant="caption" color="textSecondary">
-                          Участки: {owner.plots_history.length}
+                          Участки: {owner.current_plots.map(plot => plot.plot_number).join(', ')}
                         </Typography>
                       </Box>
                     )}
@@ -468,7 +468,7 @@ const OwnerList = () => {
                       </TableCell>
                       <TableCell>
                         <Chip 
-                          label={owner.plots_history?.length || 0} 
+                          label={owner.current_plots?.length || 0} 
                           color="primary" 
                           size="small"
                         />
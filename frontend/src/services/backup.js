@@ -12,6 +12,9 @@ export const backupService = {
     responseType: 'blob'
   }),
   
+  // Восстановление из резервной копии (apps, models, plot_id, prune)
+  restoreBackup: (id, data = {}) => api.post(`/backup/backups/${id}/restore/`, data),
+  
   // Удаление файла резервной копии
   deleteBackupFile: (id) => api.post(`/backup/backups/${id}/delete_file/`),
   
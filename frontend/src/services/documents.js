@@ -1,5 +1,61 @@
 import api from './api';
 
+// Файлы больше лимита одного запроса (nginx, 10MB) загружаются частями
+const SINGLE_UPLOAD_LIMIT = 10 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
+
+const sha256Hex = async (blob) => {
+  if (!window.crypto?.subtle) {
+    return '';
+  }
+  const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Загрузка частями с докачкой: после обрыва связи продолжаем с offset сервера
+const uploadChunked = async (data, onProgress) => {
+  const { file, ...fields } = data;
+  const { data: upload } = await api.post('/documents/uploads/', {
+    ...fields,
+    filename: file.name,
+    total_size: file.size,
+  });
+
+  let offset = upload.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + upload.chunk_size);
+    try {
+      const response = await api.put(`/documents/uploads/${upload.id}/`, chunk, {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${offset + chunk.size - 1}/${file.size}`,
+          'X-Chunk-SHA256': await sha256Hex(chunk),
+        },
+      });
+      offset = response.data.offset;
+      retries = 0;
+      if (onProgress) {
+        onProgress(Math.round((offset / file.size) * 100));
+      }
+    } catch (error) {
+      if (retries >= CHUNK_RETRIES) {
+        throw error;
+      }
+      retries += 1;
+      await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+      try {
+        const { data: status } = await api.get(`/documents/uploads/${upload.id}/`);
+        offset = status.offset;
+      } catch (statusError) {
+        // Связи все еще нет: повторим ту же часть
+      }
+    }
+  }
+
+  return api.post(`/documents/uploads/${upload.id}/finalize/`);
+};
+
 export const documentService = {
   // Получение документов
   getDocuments: (params = {}) => {
@@ -8,10 +64,14 @@ export const documentService = {
   },
   
   // Создание документа
-  createDocument: async (data) => {
+  createDocument: async (data, onProgress) => {
     try {
       console.log('Отправка данных документа:', data);
       
+      if (data.file && data.file.size > SINGLE_UPLOAD_LIMIT) {
+        return await uploadChunked(data, onProgress);
+      }
+      
       const formData = new FormData();
       
       // Добавляем все поля
@@ -103,6 +163,9 @@ export const documentService = {
   // Документы по участку
   getDocumentsByPlot: (plotId) => api.get(`/documents/by_plot/?plot_id=${plotId}`),
   
+  // Полнотекстовый поиск: q, category, document_type, plot, limit
+  searchDocuments: (params = {}) => api.get('/documents/search/', { params }),
+  
   // Документы по собственнику
   getDocumentsByOwner: (ownerId) => api.get(`/documents/by_owner/?owner_id=${ownerId}`),
   